@@ -232,6 +232,12 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
 
+# Outbound HTTP: seconds to connect and to wait for a response, and the
+# connections kept alive per upstream host
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+
 # Open AI Settings
 OPENAI_COMPLETIONS_API_TYPE = os.environ.get(
     "OPENAI_COMPLETIONS_API_TYPE", "open_ai")
@@ -254,14 +260,64 @@ OPENAI_EMBEDDINGS_API_VERSION = os.environ.get(
     "OPENAI_EMBEDDINGS_API_VERSION", None)
 OPENAI_EMBEDDINGS_MODEL = os.environ.get(
     "OPENAI_EMBEDDINGS_MODEL", None)
+# Completions can take minutes, so they get a longer read timeout
+OPENAI_READ_TIMEOUT = float(os.environ.get("OPENAI_READ_TIMEOUT", 120))
+
+# OpenAI rate limits, shared by all workers on a host through lock files
+# in OPENAI_RATE_LIMIT_DIR
+OPENAI_RATE_LIMIT_ENABLED = bool(int(os.environ.get(
+    'OPENAI_RATE_LIMIT_ENABLED', 0 if TESTING else 1)))
+OPENAI_RATE_LIMIT_DIR = os.environ.get(
+    'OPENAI_RATE_LIMIT_DIR', '/tmp/lumian-openai-ratelimit')
+OPENAI_CHAT_RPM = int(os.environ.get('OPENAI_CHAT_RPM', 3500))
+OPENAI_CHAT_TPM = int(os.environ.get('OPENAI_CHAT_TPM', 90000))
+OPENAI_EMBEDDINGS_RPM = int(os.environ.get('OPENAI_EMBEDDINGS_RPM', 3000))
+OPENAI_EMBEDDINGS_TPM = int(os.environ.get(
+    'OPENAI_EMBEDDINGS_TPM', 1000000))
+
+# Embeds client: "pinecone" or "local" for the in-process NumPy index
+EMBEDS_CLIENT = os.environ.get("EMBEDS_CLIENT", "pinecone")
 
 # Pinecone Settings
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 PINECONE_REGION = os.environ.get("PINECONE_REGION")
 PINECONE_INDEX = os.environ.get("PINECONE_INDEX")
-PINECONE_DIMENSIONS = int(os.environ.get("PINECONE_DIMENSIONS"))
+PINECONE_DIMENSIONS = int(os.environ.get("PINECONE_DIMENSIONS", 1536))
 PINECONE_USER = os.environ.get("PINECONE_USER", None)
 
+# LLM response cache, off unless LLM_CACHE_ENABLED=1. Only embeddings and
+# batch chat requests (summaries and concise transcripts, which run at
+# temperature 0) are cached. Set
+# LLM_CACHE_BACKEND to
+# django.core.cache.backends.db.DatabaseCache (and LLM_CACHE_LOCATION to a
+# table name) to share the cache across instances through Postgres.
+LLM_CACHE_ENABLED = bool(int(os.environ.get('LLM_CACHE_ENABLED', 0)))
+LLM_CACHE_BACKEND = os.environ.get(
+    'LLM_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache')
+LLM_CACHE_LOCATION = os.environ.get(
+    'LLM_CACHE_LOCATION', '/tmp/lumian-llm-cache')
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'llm': {
+        'BACKEND': LLM_CACHE_BACKEND,
+        'LOCATION': LLM_CACHE_LOCATION,
+        'TIMEOUT': LLM_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': LLM_CACHE_MAX_ENTRIES,
+        },
+    },
+}
+
+# Seconds AppSettings are cached in-process before checking for changes
+APP_SETTINGS_CACHE_TTL = int(os.environ.get(
+    'APP_SETTINGS_CACHE_TTL', 0 if TESTING else 30))
+
 # Synthesis settings
 SYNTHESIS_TASK_TIMEOUT = int(os.environ.get('SYNTHESIS_TASK_TIMEOUT', 10))
 
@@ -269,6 +325,9 @@ SYNTHESIS_TASK_TIMEOUT = int(os.environ.get('SYNTHESIS_TASK_TIMEOUT', 10))
 RECALL_API_KEY = os.environ.get("RECALL_API_KEY")
 RECALL_TRANSCRIPT_PROVIDER = os.environ.get("RECALL_TRANSCRIPT_PROVIDER")
 ASSEMBLY_API_KEY = os.environ.get("ASSEMBLY_API_KEY")
+# Audio uploads can take minutes, so they get a longer read timeout
+ASSEMBLY_UPLOAD_READ_TIMEOUT = float(os.environ.get(
+    "ASSEMBLY_UPLOAD_READ_TIMEOUT", 600))
 
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
@@ -8,6 +8,7 @@ from google.cloud.tasks_v2.services.cloud_tasks.transports \
 from google.cloud.tasks_v2.types import HttpMethod
 from google.protobuf.duration_pb2 import Duration
 import logging
+import threading
 from typing import Optional
 
 from app import settings
@@ -36,31 +37,62 @@ class GCloudClient(GCloudClientInterface):
         self.location = location
         self.queue_name = queue_name
         self.service_name = service_name
-        self.tasks_client = CloudTasksClient()
-
-        if service_url_override:
-            self.service_url = service_url_override
-        else:
-            self.run_client = ServicesClient()
-            self.service_url = self._get_cloud_run_service_url()
+        self.service_url_override = service_url_override
+
+        # The API clients and the service URL are resolved on first use so
+        # constructing this client does not block on Google API calls
+        self._lock = threading.Lock()
+        self._tasks_client = None
+        self._run_client = None
+        self._service_url = None
+
+    @property
+    def tasks_client(self) -> CloudTasksClient:
+        with self._lock:
+            if self._tasks_client is None:
+                self._tasks_client = CloudTasksClient()
+        return self._tasks_client
+
+    @property
+    def service_url(self) -> str:
+        """The service URL, looked up once and cached until invalidated."""
+        if self.service_url_override:
+            return self.service_url_override
+        with self._lock:
+            if self._service_url is None:
+                self._service_url = self._get_cloud_run_service_url()
+        return self._service_url
+
+    def _invalidate_service_url(self) -> None:
+        """Drop the cached service URL so the next task looks it up again."""
+        with self._lock:
+            self._service_url = None
 
     def _get_cloud_run_service_url(self) -> str:
         """Generate the Cloud Run service URL."""
+        if self._run_client is None:
+            self._run_client = ServicesClient()
         name = (f"projects/{self.project_id}/locations/{self.location}/"
                 f"services/{self.service_name}")
-        response = self.run_client.get_service(name=name)
+        response = self._run_client.get_service(name=name)
         return response.uri
 
     def create_task(self, path: str, payload: dict,
                     timeout_minutes: Optional[int] = -1):
         """Create a Google Cloud Task for a given service."""
+        try:
+            service_url = self.service_url
+        except exceptions.GoogleAPICallError as error:
+            logger.exception("Error resolving service URL", exc_info=error)
+            return None
+
         parent = self.tasks_client.queue_path(self.project_id,
                                               self.location,
                                               self.queue_name)
         task = {
             "http_request": {
                 "http_method": HttpMethod.POST,
-                "url": f"{self.service_url}/{path}",
+                "url": f"{service_url}/{path}",
                 "headers": {
                     "Content-Type": "application/json",
                     "X-Task-Caller": "background-task"
@@ -83,23 +115,34 @@ class GCloudClient(GCloudClientInterface):
             return response.name
         except exceptions.GoogleAPICallError as error:
             logger.exception("Error creating task", exc_info=error)
+            self._invalidate_service_url()
             return None
 
 
 class GCloudEmulatorClient(GCloudClientInterface):
     def __init__(self, channel: grpc.Channel, service_url: str) -> None:
-        transport = CloudTasksGrpcTransport(channel=channel)
-        self.client = CloudTasksClient(transport=transport)
-        self._create_queue()
+        self.channel = channel
         self.service_url = service_url
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def client(self) -> CloudTasksClient:
+        """The emulator client, creating the queue on first use."""
+        with self._lock:
+            if self._client is None:
+                transport = CloudTasksGrpcTransport(channel=self.channel)
+                self._client = CloudTasksClient(transport=transport)
+                self._create_queue()
+        return self._client
 
     def _create_queue(self):
         parent = 'projects/dev/locations/here'
         self.queue_name = parent + '/queues/test'
 
         try:
-            self.client.create_queue(queue={'name': self.queue_name},
-                                     parent=parent)
+            self._client.create_queue(queue={'name': self.queue_name},
+                                      parent=parent)
         except exceptions.AlreadyExists:
             pass
 
@@ -128,25 +171,42 @@ class GCloudMockClient(GCloudClientInterface):
         return ""
 
 
-if settings.TESTING:
-    # Use a mock client for testing - technically should be injected
-    client = GCloudMockClient()
-
-elif settings.DEPLOY_MODE == settings.ModeEnum.local or \
-     settings.DEPLOY_MODE == settings.ModeEnum.github:
-    # Use a local emulator for development
-    channel = grpc.insecure_channel(settings.GCLOUD_EMULATOR_URL)
-    client = GCloudEmulatorClient(
-        channel=channel,
-        service_url=settings.GCLOUD_EMULATOR_SERVICE_URL
-    )
-
-else:
-    # Use Google Cloud Tasks for deployment
-    client = GCloudClient(
-        project_id=settings.GCLOUD_PROJECT_ID,
-        location=settings.GCLOUD_LOCATION,
-        queue_name=settings.GCLOUD_QUEUE_NAME,
-        service_name=settings.GCLOUD_API_SERVICE_NAME,
-        service_url_override=settings.GCLOUD_API_SERVICE_URL,
-    )
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GCloudClientInterface:
+    """Cloud Tasks client provider. The client is created on first use so
+    importing this module makes no network calls"""
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            _client = _create_client()
+    return _client
+
+
+def _create_client() -> GCloudClientInterface:
+    if settings.TESTING:
+        # Use a mock client for testing - technically should be injected
+        return GCloudMockClient()
+
+    elif settings.DEPLOY_MODE == settings.ModeEnum.local or \
+            settings.DEPLOY_MODE == settings.ModeEnum.github:
+        # Use a local emulator for development
+        channel = grpc.insecure_channel(settings.GCLOUD_EMULATOR_URL)
+        return GCloudEmulatorClient(
+            channel=channel,
+            service_url=settings.GCLOUD_EMULATOR_SERVICE_URL
+        )
+
+    else:
+        # Use Google Cloud Tasks for deployment
+        return GCloudClient(
+            project_id=settings.GCLOUD_PROJECT_ID,
+            location=settings.GCLOUD_LOCATION,
+            queue_name=settings.GCLOUD_QUEUE_NAME,
+            service_name=settings.GCLOUD_API_SERVICE_NAME,
+            service_url_override=settings.GCLOUD_API_SERVICE_URL,
+        )
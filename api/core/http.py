@@ -0,0 +1,45 @@
+import threading
+from typing import Dict, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import settings
+
+
+Timeout = Union[float, Tuple[float, float]]
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """Keep-alive session that applies a default (connect, read) timeout
+    to every request made without an explicit one"""
+
+    def __init__(self, timeout: Timeout, pool_maxsize: int) -> None:
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+
+def get_session(name: str, read_timeout: float = None) -> requests.Session:
+    """Return the shared session for an upstream, creating it on first use.
+    Requests to the same upstream reuse pooled TLS connections."""
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = TimeoutSession(
+                timeout=(settings.HTTP_CONNECT_TIMEOUT,
+                         read_timeout or settings.HTTP_READ_TIMEOUT),
+                pool_maxsize=settings.HTTP_POOL_MAXSIZE)
+    return _sessions[name]
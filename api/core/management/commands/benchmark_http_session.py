@@ -0,0 +1,76 @@
+"""
+Django command to benchmark pooled keep-alive sessions against a new
+connection per request, using a local HTTP stand-in for the upstream APIs
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import statistics
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from core.http import TimeoutSession
+
+
+class _UpstreamStandIn(BaseHTTPRequestHandler):
+    """Answers every request with a small JSON body over HTTP/1.1"""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, so without TCP_NODELAY
+    # a kept-alive connection stalls on delayed ACKs
+    disable_nagle_algorithm = True
+    response = b'{"id": "bot", "status": "ok"}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.response)))
+        self.end_headers()
+        self.wfile.write(self.response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """Django command to benchmark outbound HTTP connection reuse."""
+    help = 'Compare per-call latency with and without a pooled session.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500)
+
+    def _measure(self, func, repeat) -> list:
+        """Return the milliseconds taken by each call of func."""
+        func()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def _report(self, label, timings):
+        self.stdout.write(
+            f'{label:<22} mean {statistics.mean(timings):>7.3f} ms  '
+            f'p50 {statistics.median(timings):>7.3f} ms')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _UpstreamStandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/bot/'
+        session = TimeoutSession(timeout=(5, 30), pool_maxsize=10)
+        try:
+            bare = self._measure(
+                lambda: requests.get(url, timeout=(5, 30)).json(),
+                options['repeat'])
+            pooled = self._measure(
+                lambda: session.get(url).json(), options['repeat'])
+        finally:
+            session.close()
+            server.shutdown()
+
+        self.stdout.write(f"{options['repeat']} GET requests "
+                          '(localhost, excludes TLS and network latency)')
+        self._report('new connection', bare)
+        self._report('pooled session', pooled)
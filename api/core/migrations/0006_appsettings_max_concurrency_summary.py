@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_remove_appsettings_llm_summary_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appsettings',
+            name='max_concurrency_summary',
+            field=models.IntegerField(default=4, help_text='Max parallel LLM requests when summarizing chunks.'),
+        ),
+    ]
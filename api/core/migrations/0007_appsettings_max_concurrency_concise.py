@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_appsettings_max_concurrency_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appsettings',
+            name='max_concurrency_concise',
+            field=models.IntegerField(default=4, help_text='Max parallel LLM requests per transcript when generating concise transcripts. Set to 1 to run serially.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_appsettings_max_concurrency_concise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appsettings',
+            name='max_concurrency_query',
+            field=models.IntegerField(default=4, help_text='Max parallel LLM requests when answering project queries.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_appsettings_max_concurrency_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appsettings',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented on save so other workers reload settings.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_appsettings_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appsettings',
+            name='single_call_max_tokens_summary',
+            field=models.IntegerField(default=2000, help_text='Transcripts with at most this many tokens are summarized in a single LLM request. Set to 0 to always chunk.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_appsettings_single_call_max_tokens_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appsettings',
+            name='max_input_tokens_summary',
+            field=models.IntegerField(default=2500, help_text='Max tokens of notes in one request when reducing chunk summaries to the final summary.'),
+        ),
+    ]
@@ -1,3 +1,8 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -84,9 +89,14 @@ class AppSettings(models.Model):
     chunk_min_tokens_query = models.IntegerField(
         default=400,
         help_text="Minimum tokens in a chunk for query context.")
+    single_call_max_tokens_summary = models.IntegerField(
+        default=2000,
+        help_text=("Transcripts with at most this many tokens are summarized "
+                   "in a single LLM request. Set to 0 to always chunk."))
     max_input_tokens_summary = models.IntegerField(
         default=2500,
-        help_text="NOTE: Currently unused.")
+        help_text=("Max tokens of notes in one request when reducing chunk "
+                   "summaries to the final summary."))
     max_input_tokens_concise = models.IntegerField(
         default=2500,
         help_text="NOTE: Currently unused.")
@@ -96,10 +106,41 @@ class AppSettings(models.Model):
     max_input_tokens_metadata = models.IntegerField(
         default=3600,
         help_text="Max input tokens for LLM when generating metadata.")
+    max_concurrency_summary = models.IntegerField(
+        default=4,
+        help_text="Max parallel LLM requests when summarizing chunks.")
+    max_concurrency_concise = models.IntegerField(
+        default=4,
+        help_text=("Max parallel LLM requests per transcript when generating "
+                   "concise transcripts. Set to 1 to run serially."))
+    max_concurrency_query = models.IntegerField(
+        default=4,
+        help_text="Max parallel LLM requests when answering project queries.")
+
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on save so other workers reload settings.")
+
+    # In-process cache shared by get(), cleared by the post_save signal
+    _cache_lock = threading.Lock()
+    _cached = None
+    _cached_at = 0.0
 
     def save(self, *args, **kwargs):
         self.pk = 1
+        # Bump the version in the database so concurrent saves never
+        # write the same value
+        if self._state.adding and \
+                not AppSettings.objects.filter(pk=self.pk).exists():
+            self.version = 1
+        else:
+            self.version = models.F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
         super(AppSettings, self).save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
 
     @classmethod
     def load(cls):
@@ -108,7 +149,33 @@ class AppSettings(models.Model):
 
     @classmethod
     def get(cls):
-        return AppSettings.objects.first()
+        """Return the settings, cached for APP_SETTINGS_CACHE_TTL seconds.
+        After the TTL only the version column is read and the row is
+        reloaded if another worker has saved it. Each caller gets its own
+        copy, so changes to it never leak into the shared cache."""
+        now = time.monotonic()
+        with cls._cache_lock:
+            cached, cached_at = cls._cached, cls._cached_at
+        if cached is not None:
+            if now - cached_at < settings.APP_SETTINGS_CACHE_TTL:
+                return copy.copy(cached)
+            version = cls.objects.filter(pk=cached.pk) \
+                .values_list('version', flat=True).first()
+            if version == cached.version:
+                with cls._cache_lock:
+                    cls._cached_at = now
+                return copy.copy(cached)
+
+        obj = AppSettings.objects.first()
+        with cls._cache_lock:
+            cls._cached, cls._cached_at = obj, now
+        return copy.copy(obj)
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop the cached settings so the next get() reloads them"""
+        with cls._cache_lock:
+            cls._cached, cls._cached_at = None, 0.0
 
     def __str__(self):
         return "App Settings"
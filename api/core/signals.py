@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import AppSettings
+
+
+@receiver(post_save, sender=AppSettings)
+@receiver(post_delete, sender=AppSettings)
+def clear_app_settings_cache(sender, instance, **kwargs):
+    return _clear_app_settings_cache(sender, instance, **kwargs)
+
+
+# Necessary to create helper for mocking in tests
+def _clear_app_settings_cache(sender, instance, **kwargs):
+    """Reload settings in this worker. Other workers notice the bumped
+    version column once their cache TTL lapses"""
+    AppSettings.clear_cache()
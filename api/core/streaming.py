@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+from typing import Iterable, Iterator
+
+from django.db import connections
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+_END = object()
+
+
+def _close_iterator(iterator: Iterator):
+    """Close a generator and the DB connections of the current thread"""
+    try:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+    finally:
+        connections.close_all()
+
+
+def iterate_outside_event_loop(iterable: Iterable) -> Iterator:
+    """Iterate, stepping on a worker thread when called from an event loop.
+    Django 4.1 consumes streaming responses on the event loop thread under
+    ASGI, where the ORM refuses to run. Under WSGI this is a plain loop."""
+    iterator = iter(iterable)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        yield from iterator
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            item = executor.submit(next, iterator, _END).result()
+            if item is _END:
+                break
+            yield item
+    finally:
+        executor.submit(_close_iterator, iterator).result()
+        executor.shutdown()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets views accept `Accept: text/event-stream`. Streams are returned
+    as StreamingHttpResponse, so only error responses render here."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return format_event('error', data).encode()
+
+
+def format_event(event: str, data) -> str:
+    """Format a server-sent event with JSON data"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def event_stream_response(events: Iterable[dict]) -> StreamingHttpResponse:
+    """Stream {"event": ..., "data": ...} dicts as server-sent events,
+    sending each one as soon as it is produced"""
+    response = StreamingHttpResponse(
+        (format_event(event["event"], event["data"])
+         for event in iterate_outside_event_loop(events)),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
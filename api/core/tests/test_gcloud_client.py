@@ -0,0 +1,64 @@
+"""
+Test the Google Cloud Tasks client.
+"""
+from unittest.mock import DEFAULT, patch
+
+from django.test import SimpleTestCase
+from google.api_core import exceptions
+
+from core.gcloud_client import GCloudClient
+
+
+@patch('core.gcloud_client.CloudTasksClient')
+@patch('core.gcloud_client.ServicesClient')
+class GCloudClientTests(SimpleTestCase):
+    """Test lazy construction of the Cloud Tasks client."""
+
+    def _create_client(self, **kwargs):
+        return GCloudClient(project_id='project', location='location',
+                            queue_name='queue', service_name='service',
+                            **kwargs)
+
+    def test_construction_makes_no_api_calls(self, patched_run,
+                                             patched_tasks):
+        """Test that creating the client does not call Google APIs."""
+        self._create_client()
+
+        patched_run.assert_not_called()
+        patched_tasks.assert_not_called()
+
+    def test_service_url_cached(self, patched_run, patched_tasks):
+        """Test the service URL is looked up once across tasks."""
+        patched_run.return_value.get_service.return_value.uri = 'https://a'
+        client = self._create_client()
+
+        client.create_task(path='one', payload='')
+        client.create_task(path='two', payload='')
+
+        patched_run.return_value.get_service.assert_called_once()
+        call = patched_tasks.return_value.create_task.call_args
+        task = call.kwargs['request']['task']
+        self.assertEqual(task['http_request']['url'],
+                         'https://a/two')
+
+    def test_service_url_refreshed_after_failure(self, patched_run,
+                                                 patched_tasks):
+        """Test a failed task drops the cached service URL."""
+        patched_run.return_value.get_service.return_value.uri = 'https://a'
+        patched_tasks.return_value.create_task.side_effect = [
+            exceptions.GoogleAPICallError('error'), DEFAULT]
+        client = self._create_client()
+
+        client.create_task(path='one', payload='')
+        client.create_task(path='two', payload='')
+
+        self.assertEqual(
+            patched_run.return_value.get_service.call_count, 2)
+
+    def test_service_url_override(self, patched_run, patched_tasks):
+        """Test the override URL skips the service lookup."""
+        client = self._create_client(service_url_override='https://b')
+
+        client.create_task(path='one', payload='')
+
+        patched_run.assert_not_called()
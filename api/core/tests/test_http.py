@@ -0,0 +1,34 @@
+"""
+Test shared outbound HTTP sessions.
+"""
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.http import TimeoutSession, get_session
+
+
+@patch('requests.Session.request')
+class TimeoutSessionTests(SimpleTestCase):
+    """Test the keep-alive session defaults."""
+
+    def test_default_timeout_applied(self, patched_request):
+        """Test requests without a timeout use the session timeout."""
+        session = TimeoutSession(timeout=(1, 2), pool_maxsize=1)
+
+        session.get('https://example.com')
+
+        self.assertEqual(patched_request.call_args.kwargs['timeout'], (1, 2))
+
+    def test_explicit_timeout_kept(self, patched_request):
+        """Test an explicit timeout overrides the session timeout."""
+        session = TimeoutSession(timeout=(1, 2), pool_maxsize=1)
+
+        session.get('https://example.com', timeout=9)
+
+        self.assertEqual(patched_request.call_args.kwargs['timeout'], 9)
+
+    def test_session_shared_per_upstream(self, patched_request):
+        """Test the same session is returned for an upstream."""
+        self.assertIs(get_session('tests'), get_session('tests'))
+        self.assertIsNot(get_session('tests'), get_session('other-tests'))
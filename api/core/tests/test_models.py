@@ -1,10 +1,12 @@
 """
 Tests for models.
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from unittest.mock import patch
 
+from core.models import AppSettings
+
 
 @patch('project.signals._create_sample_project')
 class ModelTests(TestCase):
@@ -48,3 +50,64 @@ class ModelTests(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+
+@override_settings(APP_SETTINGS_CACHE_TTL=60)
+class AppSettingsCacheTests(TestCase):
+    """Test the in-process AppSettings cache."""
+
+    def setUp(self):
+        AppSettings.clear_cache()
+
+    def tearDown(self):
+        AppSettings.clear_cache()
+
+    def test_get_cached_within_ttl(self):
+        """Test repeated reads within the TTL do not query the database."""
+        AppSettings.get()
+        with self.assertNumQueries(0):
+            AppSettings.get()
+
+    def test_save_clears_cache(self):
+        """Test saving settings is visible to the next read."""
+        app_settings = AppSettings.load()
+        app_settings.chunk_min_tokens_query = 123
+        app_settings.save()
+
+        self.assertEqual(AppSettings.get().chunk_min_tokens_query, 123)
+
+    def test_reloads_when_version_changes(self):
+        """Test a save from another worker is picked up after the TTL."""
+        cached = AppSettings.get()
+        AppSettings.objects.filter(pk=cached.pk).update(
+            version=cached.version + 1, chunk_min_tokens_query=321)
+
+        with override_settings(APP_SETTINGS_CACHE_TTL=0):
+            self.assertEqual(AppSettings.get().chunk_min_tokens_query, 321)
+
+    def test_version_checked_after_ttl(self):
+        """Test an unchanged row is not reloaded after the TTL."""
+        cached = AppSettings.get()
+        with override_settings(APP_SETTINGS_CACHE_TTL=0):
+            with self.assertNumQueries(1):
+                self.assertEqual(AppSettings.get().version, cached.version)
+
+    def test_get_returns_copy(self):
+        """Test changing a returned instance does not touch the cache."""
+        first = AppSettings.get()
+        first.chunk_min_tokens_query = -1
+
+        self.assertNotEqual(AppSettings.get().chunk_min_tokens_query, -1)
+
+    def test_save_increments_version_in_database(self):
+        """Test saves from stale instances each bump the version."""
+        first = AppSettings.load()
+        second = AppSettings.objects.get(pk=first.pk)
+        start = first.version
+
+        first.save()
+        second.save()
+
+        self.assertEqual(second.version, start + 2)
+        self.assertEqual(
+            AppSettings.objects.get(pk=first.pk).version, start + 2)
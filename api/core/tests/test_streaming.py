@@ -0,0 +1,52 @@
+"""
+Test server-sent event streaming.
+"""
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from core.streaming import (
+    event_stream_response, format_event, iterate_outside_event_loop
+)
+
+
+class EventStreamTests(SimpleTestCase):
+    """Test streaming events to the client."""
+
+    def test_format_event(self):
+        """Test events are formatted with JSON data."""
+        self.assertEqual(format_event('token', {'text': 'a'}),
+                         'event: token\ndata: {"text": "a"}\n\n')
+
+    def test_event_stream_response(self):
+        """Test events are streamed as they are produced."""
+        response = event_stream_response(iter([
+            {'event': 'token', 'data': 'a'},
+            {'event': 'result', 'data': {'output': []}},
+        ]))
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'event: token\ndata: "a"\n\n'
+            'event: result\ndata: {"output": []}\n\n')
+
+    def test_iterate_in_caller_thread(self):
+        """Test iteration stays on the calling thread without a loop."""
+        threads = iterate_outside_event_loop(
+            threading.get_ident() for _ in range(2))
+
+        self.assertEqual(list(threads), [threading.get_ident()] * 2)
+
+    def test_iterate_outside_event_loop(self):
+        """Test iteration moves off the event loop thread."""
+        async def consume():
+            return list(iterate_outside_event_loop(
+                threading.get_ident() for _ in range(2)))
+
+        threads = asyncio.run(consume())
+
+        self.assertEqual(len(set(threads)), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
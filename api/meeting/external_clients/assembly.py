@@ -1,4 +1,3 @@
-import requests
 import time
 from retry import retry
 from requests.exceptions import (
@@ -12,7 +11,12 @@ from meeting.errors import (
     AssemblyAITimeoutException
 )
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from app.settings import ASSEMBLY_API_KEY
+from app.settings import (
+    ASSEMBLY_API_KEY,
+    ASSEMBLY_UPLOAD_READ_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+)
+from core.http import get_session
 
 import logging
 logger = logging.getLogger(__name__)
@@ -20,6 +24,10 @@ logger = logging.getLogger(__name__)
 BASE_URL = "https://api.assemblyai.com/v2"
 
 
+def _session():
+    return get_session('assembly')
+
+
 @retry(AssemblyAITimeoutException, tries=3, delay=3, backoff=2)
 def upload_file_to_assembly(file: InMemoryUploadedFile):
     headers = {
@@ -27,13 +35,15 @@ def upload_file_to_assembly(file: InMemoryUploadedFile):
     }
     url = BASE_URL + "/upload"
     try:
-        response = requests.post(url, headers=headers, data=file)
+        response = _session().post(
+            url, headers=headers, data=file,
+            timeout=(HTTP_CONNECT_TIMEOUT, ASSEMBLY_UPLOAD_READ_TIMEOUT))
         response.raise_for_status()
         upload_url = response.json()["upload_url"]
         return upload_url
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise AssemblyAITimeoutException(error_msg, status_code)
     except Exception as e:
         error_msg = f"Error occurred: {e}"
@@ -50,12 +60,12 @@ def start_audio_transcription(upload_url: str):
     }
     url = BASE_URL + "/transcript"
     try:
-        response = requests.post(url, json=data, headers=headers)
+        response = _session().post(url, json=data, headers=headers)
         response.raise_for_status()
         return response.json()['id']
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise AssemblyAITimeoutException(error_msg, status_code)
     except Exception as e:
         error_msg = f"Error occurred: {e}"
@@ -71,8 +81,8 @@ def get_audio_transcription(transcript_id: int):
     polling_endpoint = url.format(transcript_id)
     try:
         while True:
-            transcription_result = requests.get(polling_endpoint,
-                                                headers=headers).json()
+            transcription_result = _session().get(polling_endpoint,
+                                                  headers=headers).json()
 
             if transcription_result['status'] == 'completed':
                 transcript = transcription_result['text']
@@ -86,7 +96,7 @@ def get_audio_transcription(transcript_id: int):
             return transcript
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise AssemblyAITimeoutException(error_msg, status_code)
     except Exception as e:
         error_msg = f"Error occurred: {e}"
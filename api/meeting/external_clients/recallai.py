@@ -1,4 +1,3 @@
-import requests
 import time
 from retry import retry
 from urllib.parse import urlencode
@@ -23,6 +22,7 @@ from app.settings import (
     MICROSOFT_CLIENT_SECRET,
     MICROSOFT_REDIRECT_URL
 )
+from core.http import get_session
 import logging
 logger = logging.getLogger(__name__)
 
@@ -35,6 +35,10 @@ LIST_CALENDAR_EVENTS = "https://api.recall.ai/api/v2/calendar-events/"
 DELETE_CALENDAR_URL = "https://api.recall.ai/api/v2/calendars/{}/"
 
 
+def _session():
+    return get_session('recallai')
+
+
 @retry(RecallAITimeoutException, tries=3, delay=5, backoff=2)
 def add_bot_to_meeting(bot_name: str, meeting_url: str, join_at: str = None):
 
@@ -58,12 +62,12 @@ def add_bot_to_meeting(bot_name: str, meeting_url: str, join_at: str = None):
     try:
         # TODO: parse the correct error and show to UI
         # say invalid meeting, bot is not allowed in the meeting etc
-        response = requests.post(url, json=payload, headers=headers)
+        response = _session().post(url, json=payload, headers=headers)
         response.raise_for_status()
         return response.json()
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -86,11 +90,11 @@ def remove_bot_from_meeting(bot_id: str):
     }
 
     try:
-        response = requests.post(url, headers=headers)
+        response = _session().post(url, headers=headers)
         response.raise_for_status()
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error: {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -114,12 +118,12 @@ def get_meeting_transcript(bot_id: str):
     }
 
     try:
-        response = requests.get(url, headers=headers)
+        response = _session().get(url, headers=headers)
         response.raise_for_status()
         return response.json()
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -161,13 +165,13 @@ def create_calendar(refresh_token, calendar_app):
     }
 
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = _session().post(url, json=payload, headers=headers)
         response.raise_for_status()
         res = response.json()
         return res['id']
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection errro: {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -192,7 +196,7 @@ def retrieve_calendar(calendar_id):
 
     try:
         while True:
-            response = requests.get(url, headers=headers)
+            response = _session().get(url, headers=headers)
             response.raise_for_status()
             res = response.json()
             if not res['oauth_email']:
@@ -207,7 +211,7 @@ def retrieve_calendar(calendar_id):
         # TODO : check status and fetch reason in case of error
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection errro: {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -244,7 +248,7 @@ def list_calendar_events(calendar_id, schedule=False):
     }
 
     try:
-        response = requests.get(url, headers=headers)
+        response = _session().get(url, headers=headers)
         response.raise_for_status()
         res = response.json()
         events = []
@@ -273,7 +277,7 @@ def list_calendar_events(calendar_id, schedule=False):
         return events
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connection error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
@@ -296,11 +300,11 @@ def delete_calendar(calendar_id):
     }
 
     try:
-        response = requests.delete(url, headers=headers)
+        response = _session().delete(url, headers=headers)
         response.raise_for_status()
     except (Timeout, ConnectionError) as e:
         error_msg = f"Connectin error : {e}"
-        status_code = e.response.status_code
+        status_code = getattr(e.response, 'status_code', None)
         raise RecallAITimeoutException(error_msg, status_code)
     except HTTPError as e:
         error_msg = f"HTTP error occurred: {e}"
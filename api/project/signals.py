@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from django.urls import reverse
 from . import samples
 from .models import Project
+from app import settings
+from core.gcloud_client import get_client
 
 
 User = get_user_model()
@@ -28,3 +31,38 @@ def delete_projects_for_user(sender, instance, **kwargs):
 def _delete_projects_for_user(sender, instance, **kwargs):
     """Delete all projects for a user"""
     Project.objects.filter(user=instance).delete()
+
+
+@receiver(post_init, sender=Project)
+def remember_questions(sender, instance, **kwargs):
+    """Remember the saved questions, to tell when a save changes them.
+    They are unknown (None) when loaded with the field deferred."""
+    if instance.pk is None:
+        instance._saved_questions = []
+    elif 'questions' in instance.__dict__:
+        instance._saved_questions = list(instance.questions or [])
+    else:
+        instance._saved_questions = None
+
+
+@receiver(post_save, sender=Project)
+def generate_question_embeds(sender, instance, **kwargs):
+    _generate_question_embeds(sender, instance, **kwargs)
+
+
+# Necessary to create helper for mocking in tests
+def _generate_question_embeds(sender, instance, update_fields=None,
+                              **kwargs):
+    """Precompute embeddings for the project questions in the background,
+    only when a save changed them"""
+    if update_fields is not None and 'questions' not in update_fields:
+        return
+    questions = list(instance.questions or [])
+    changed = questions != getattr(instance, '_saved_questions', None)
+    instance._saved_questions = questions
+    if changed and not settings.TESTING:  # HACK for tests
+        get_client().create_task(
+            path=reverse('project:generate-question-embeds',
+                         args=[instance.id]),
+            payload=''
+        )
@@ -3,6 +3,9 @@ Tests for project management via the API.
 """
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from unittest.mock import patch
+
+from project import signals
 
 from project.models import Project
 from project.samples import load_content
@@ -47,3 +50,37 @@ class UserManagementTests(TestCase):
 
         user.delete()
         self.assertEqual(len(Project.objects.filter(user=user)), 0)
+
+
+@patch.object(signals.settings, 'TESTING', False)
+@patch('project.signals.get_client')
+class QuestionEmbedsSignalTests(TestCase):
+    """Test question embeds are only requested when questions change."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "a@b.com", 'sample123')
+
+    def test_task_only_on_question_change(self, patched_client):
+        create_task = patched_client.return_value.create_task
+        pjt = Project.objects.create(
+            title="Test Project", user=self.user, questions=['Why?'])
+        self.assertEqual(create_task.call_count, 1)
+
+        pjt.title = "Renamed"
+        pjt.save()
+        Project.objects.get(pk=pjt.pk).save()
+        self.assertEqual(create_task.call_count, 1)
+
+        pjt.questions = ['Why?', 'How?']
+        pjt.save()
+        self.assertEqual(create_task.call_count, 2)
+
+        pjt = Project.objects.get(pk=pjt.pk)
+        pjt.questions = []
+        pjt.save()
+        self.assertEqual(create_task.call_count, 3)
+
+    def test_no_task_without_questions(self, patched_client):
+        Project.objects.create(title="Test Project", user=self.user)
+        patched_client.return_value.create_task.assert_not_called()
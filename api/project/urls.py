@@ -11,5 +11,8 @@ router = DefaultRouter()
 router.register('', views.ProjectView)
 
 urlpatterns = [
+    path('<int:pk>/generate/question-embeds',
+         views.GenerateQuestionEmbedsView.as_view(),
+         name='generate-question-embeds'),
     path('', include(router.urls))
 ]
@@ -8,11 +8,13 @@ from rest_framework import (
     status
 )
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.db.models import Count, Min, Max
 from .models import Project
 from .serializers import (
     ProjectSerializer
 )
+from synthesis import usecases
 import logging
 logger = logging.getLogger(__name__)
 
@@ -63,3 +65,28 @@ class ProjectView(viewsets.ModelViewSet):
 
         message = "Project deleted successfully"
         return Response({'message': message}, status=status.HTTP_200_OK)
+
+
+class GenerateQuestionEmbedsView(APIView):
+    """Precompute embeddings for the questions of a project."""
+    # TODO: Figure out how to make authenticated calls from Google Cloud Tasks
+
+    def get_serializer(self, *args, **kwargs):
+        pass  # Don't need serialization
+
+    def get_serializer_class(self):
+        pass  # Don't need serialization
+
+    def post(self, request, pk):
+        try:
+            pjt = Project.objects.get(pk=pk)
+            result = usecases.create_question_embeds(pjt)
+            response = Response(result, status=status.HTTP_200_OK)
+        except Project.DoesNotExist:
+            response = Response(status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.exception(
+                f"Exception generating question embeds for Project={pk}",
+                exc_info=e)
+            response = Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return response
@@ -4,6 +4,7 @@ set -e
 
 python manage.py wait_for_db
 python manage.py migrate
+python manage.py createcachetable
 
 if [ $DEPLOY_MODE != "local" ]; then
     python manage.py collectstatic --noinput
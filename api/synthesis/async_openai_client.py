@@ -0,0 +1,256 @@
+import asyncio
+from functools import wraps
+import logging
+import random
+import openai
+from asgiref.sync import sync_to_async
+from openai.error import Timeout, RateLimitError
+from typing import Callable, List, Dict, Optional, Tuple, Type
+
+from .errors import OpenAITimeoutException, OpenAIRateLimitException
+from .interfaces import AsyncOpenAIClientInterface, RateLimiterInterface
+from .openai_client import (
+    OpenAIClientBase,
+    OpenAIPricing,
+    BATCH_TEMPERATURE,
+    DEFAULT_TEMPERATURE,
+    DEFAULT_MAX_TOKENS,
+    RETRY_TRIES,
+    RETRY_DELAY_TIMEOUT,
+    RETRY_DELAY_RATELIMIT,
+    RETRY_JITTER_RATELIMIT,
+    RETRY_BACKOFF,
+    _float32,
+    _retry_after,
+)
+from .utils import token_counts
+
+
+logger = logging.getLogger(__name__)
+
+
+def async_retry(exception: Type[Exception],
+                tries: int,
+                delay: float,
+                backoff: float,
+                jitter: Tuple[float, float] = (0, 0)) -> Callable:
+    """Retry a coroutine function on `exception`, sleeping without blocking
+    the event loop. Mirrors the arguments of the `retry` decorator."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            wait = delay
+            for attempt in range(1, tries + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except exception as e:
+                    if attempt == tries:
+                        raise
+                    logger.warning(f"{e}, retrying in {wait} seconds...")
+                    await asyncio.sleep(wait)
+                    wait = wait * backoff + random.uniform(*jitter)
+        return wrapper
+    return decorator
+
+
+class AsyncOpenAIClient(OpenAIClientBase, AsyncOpenAIClientInterface):
+    """asyncio implementation of the OpenAI client using the `acreate` API.
+    Request building, costs and caching are shared with OpenAIClient. The
+    cache and rate limiter block, so they are called through
+    sync_to_async."""
+
+    async def _asend(self,
+                     rate_limiter: Optional[RateLimiterInterface],
+                     estimate_tokens: Callable[[], int],
+                     acreate: Callable, **kwargs) -> dict:
+        """Send an OpenAI request once the rate limiter allows it."""
+        if rate_limiter is None:
+            return await acreate(**kwargs)
+        estimated_tokens = estimate_tokens()
+        await sync_to_async(rate_limiter.acquire,
+                            thread_sensitive=False)(estimated_tokens)
+        try:
+            response = await acreate(**kwargs)
+        except RateLimitError as e:
+            await sync_to_async(rate_limiter.throttle,
+                                thread_sensitive=False)(_retry_after(e))
+            raise
+        await sync_to_async(rate_limiter.record, thread_sensitive=False)(
+            estimated_tokens, response["usage"]["total_tokens"])
+        return response
+
+    async def _acreate_chat(self,
+                            messages: List[Dict[str, str]],
+                            params: dict,
+                            batch: bool = False) -> dict:
+        """Run a chat request, answering batch requests from the cache
+        when possible."""
+        key = None
+        if self._chat_cacheable(params, batch):
+            key = self._chat_cache_key(messages, params)
+            cached = await sync_to_async(self.cache.get)(key)
+            if cached is not None:
+                logger.debug(f"OpenAI chat cache hit: {key}")
+                return self._cached_chat_result(cached)
+
+        response = await self._asend(
+            self.chat_rate_limiter,
+            lambda: self._estimate_chat_tokens(messages, params),
+            openai.ChatCompletion.acreate,
+            messages=messages, **params)
+        ret_val = self._chat_result(response)
+
+        if key is not None:
+            await sync_to_async(self.cache.set)(
+                key, {"output": ret_val["output"],
+                      "tokens_used": ret_val["tokens_used"]})
+        return ret_val
+
+    async def _acreate_embeddings(
+            self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        """Generate embeddings for texts, only sending cache misses."""
+        embeds = {}
+        keys = {}
+        if self.cache is not None:
+            keys = {text: self._embeds_cache_key(text) for text in texts}
+            cached = await sync_to_async(self.cache.get_many)(
+                list(keys.values()))
+            embeds = self._embeds_from_cache(keys, cached)
+
+        misses = list(dict.fromkeys(
+            text for text in texts if text not in embeds))
+        tokens_used = 0
+        if misses:
+            params = self._build_embeddings_params()
+            result = await self._asend(self.embeds_rate_limiter,
+                                       lambda: sum(token_counts(misses)),
+                                       openai.Embedding.acreate,
+                                       input=misses, **params)
+            tokens_used = result["usage"]["total_tokens"]
+            for record in result['data']:
+                embeds[misses[record['index']]] = _float32(
+                    record['embedding'])
+
+            if self.cache is not None:
+                await sync_to_async(self.cache.set_many)(
+                    self._embeds_to_cache(keys, embeds, misses))
+        return [embeds[text] for text in texts], tokens_used
+
+    @async_retry(OpenAIRateLimitException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+                 jitter=RETRY_JITTER_RATELIMIT)
+    @async_retry(OpenAITimeoutException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
+    async def execute_chat_completion(self,
+                                      prompt: str,
+                                      model: str = None,
+                                      temperature: int = BATCH_TEMPERATURE,
+                                      max_tokens: int = DEFAULT_MAX_TOKENS,
+                                      ) -> dict:
+        """Execute an OpenAI completion and return the response."""
+        try:
+            params = self._build_completions_params(
+                model=model, temperature=temperature, max_tokens=max_tokens)
+
+            messages = [{"role": "user", "content": prompt}]
+            ret_val = {
+                "prompt": prompt,
+                **await self._acreate_chat(messages, params, batch=True)
+            }
+        except Timeout as e:
+            logger.exception("OpenAI Completion Timeout", exc_info=e)
+            raise OpenAITimeoutException(
+                detail="OpenAI could not complete the requests in time")
+        except RateLimitError as e:
+            logger.exception("OpenAI Completion hit Rate Limit", exc_info=e)
+            raise OpenAIRateLimitException(
+                detail="OpenAI rate limit exceeded, please try again later")
+
+        return ret_val
+
+    @async_retry(OpenAIRateLimitException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+                 jitter=RETRY_JITTER_RATELIMIT)
+    @async_retry(OpenAITimeoutException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
+    async def execute_chat(self, messages: List[Dict[str, str]],
+                           model: str = None,
+                           temperature: int = DEFAULT_TEMPERATURE,
+                           max_tokens: int = DEFAULT_MAX_TOKENS,
+                           ) -> dict:
+        """Execute an OpenAI chat and return the response."""
+        try:
+            params = self._build_completions_params(
+                model=model, temperature=temperature, max_tokens=max_tokens)
+            ret_val = {
+                "prompt": messages[-1]["content"],
+                **await self._acreate_chat(messages, params)
+            }
+        except Timeout as e:
+            logger.exception("OpenAI Completion Timeout", exc_info=e)
+            raise OpenAITimeoutException(
+                detail="OpenAI could not complete the requests in time")
+        except RateLimitError as e:
+            logger.exception("OpenAI Completion hit Rate Limit", exc_info=e)
+            raise OpenAIRateLimitException(
+                detail="OpenAI rate limit exceeded, please try again later")
+
+        return ret_val
+
+    @async_retry(OpenAIRateLimitException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+                 jitter=RETRY_JITTER_RATELIMIT)
+    @async_retry(OpenAITimeoutException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
+    async def execute_embeds(self, text: str) -> dict:
+        """Generate embedding vector for the input text"""
+        try:
+            embeds, tokens_used = await self._acreate_embeddings([text])
+            cost = self._calculate_cost(tokens_used, OpenAIPricing.EMBEDDINGS)
+
+            ret_val = {
+                "embedding": embeds[0],
+                "tokens_used": tokens_used,
+                "cost": cost
+            }
+        except Timeout as e:
+            logger.exception("OpenAI Embedding Timeout", exc_info=e)
+            raise OpenAITimeoutException(
+                detail="OpenAI could not complete the requests in time")
+        except RateLimitError as e:
+            logger.exception("OpenAI Embedding hit Rate Limit", exc_info=e)
+            raise OpenAIRateLimitException(
+                detail="OpenAI rate limit exceeded, please try again later")
+
+        return ret_val
+
+    @async_retry(OpenAIRateLimitException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+                 jitter=RETRY_JITTER_RATELIMIT)
+    @async_retry(OpenAITimeoutException, tries=RETRY_TRIES,
+                 delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
+    async def execute_embeds_batch(self,
+                                   request_list: List[str],
+                                   object_id: int = None,
+                                   object_desc: str = None,
+                                   start_index: int = 0,
+                                   ) -> dict:
+        """
+        Generate embedding vectors for the input strings in request_list
+        """
+        try:
+            embeds, tokens_used = await self._acreate_embeddings(
+                request_list)
+            ret_val = self._embeds_batch_result(
+                request_list, embeds, tokens_used,
+                object_id, object_desc, start_index)
+        except Timeout as e:
+            logger.exception("OpenAI Embedding Batch Timeout", exc_info=e)
+            raise OpenAITimeoutException(
+                detail="OpenAI could not complete the requests in time")
+        except RateLimitError as e:
+            logger.exception("OpenAI Embedding Batch Rate Limit", exc_info=e)
+            raise OpenAIRateLimitException(
+                detail="OpenAI rate limit exceeded, please try again later")
+
+        return ret_val
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from typing import Awaitable, Callable, List, Optional, Union
+from .domains import (
+    SynthesisResult,
+    SynthesisResultOutput,
+    EmbedsResult,
+    QueryEmbedsResult
+)
+from .interfaces import (
+    AsyncOpenAIClientInterface, AsyncSynthesisInterface, EmbedsClientInterface
+)
+from .prompts import (
+    SUMMARY_CHUNK_PROMPT_TEMPLATE,
+    SUMMARY_PROMPT_TEMPLATE,
+    CONCISE_PROMPT_TEMPLATE,
+)
+from .summary_tree import SummaryTree
+from .synthesis import (
+    SynthesisBase,
+    EMBEDS_MAX_INPUT_TOKENS,
+    EMBEDS_MAX_REQUEST_TOKENS,
+    EMBEDS_MAX_REQUEST_INPUTS,
+    EMBEDS_PIPELINE_DEPTH,
+)
+from .utils import (
+    split_indexed_lines_into_chunks,
+    split_indexed_transcript_lines_into_chunks,
+)
+from core.models import AppSettings
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _gather_in_order(func: Callable[..., Awaitable],
+                           items: list,
+                           max_concurrency: int) -> list:
+    """Await func for every item with at most max_concurrency running at
+    once and return the results in the same order as items"""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(item):
+        async with semaphore:
+            return await func(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+class AsyncSynthesis(SynthesisBase, AsyncSynthesisInterface):
+    """asyncio variant of Synthesis for use with AsyncOpenAIClient.
+    Independent LLM calls are awaited together with asyncio.gather, so one
+    event loop can drive many syntheses. Settings and embeds client calls
+    block, so they run through sync_to_async."""
+
+    def __init__(self,
+                 openai_client: AsyncOpenAIClientInterface,
+                 embeds_client: EmbedsClientInterface):
+        self.openai_client = openai_client
+        self.embeds_client = embeds_client
+
+    async def summarize_transcript(
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> SynthesisResult:
+        """Summarize an indexed transcript and return reference indices
+        for phrases and sentences in the final summary"""
+        app_settings = await sync_to_async(AppSettings.get)()
+        if self._fits_single_call(indexed_transcript, line_tokens,
+                                  app_settings):
+            return self._single_call_summary(
+                await self._openai_summarize_full(
+                    indexed_transcript, app_settings.llm_summary_final),
+                indexed_transcript.count("\n") + 1)
+
+        chunks = split_indexed_lines_into_chunks(
+            indexed_transcript, app_settings.chunk_min_tokens_summary,
+            line_tokens)
+
+        async def summarize_chunk(text: str) -> dict:
+            return await self._openai_summarize_chunk(
+                text, app_settings.llm_summary_chunk)
+
+        chunk_results = await _gather_in_order(
+            summarize_chunk,
+            ["\n".join(chunk) for chunk in chunks],
+            app_settings.max_concurrency_summary)
+
+        results, cost, _ = self._collect_chunk_results(
+            chunk_results, indexed_transcript.count("\n") + 1)
+        temp_result = await self._summarize_text(results, app_settings)
+        cost += temp_result['cost']
+
+        data: SynthesisResult = {
+            "output": temp_result['output'],
+            "prompt": temp_result["prompt"],
+            "cost": cost,
+            "metadata": self._get_empty_transcript_metadata(
+                cost=0, message='')
+        }
+        return data
+
+    async def _summarize_text(
+        self, notes: List[SynthesisResultOutput], app_settings: AppSettings
+    ) -> SynthesisResult:
+        """Reduce notes to a final summary with reference indices into the
+        transcript, awaiting the requests of each level together"""
+        async def summarize_full(text: str) -> dict:
+            return await self._openai_summarize_full(
+                text, app_settings.llm_summary_final)
+
+        tree = SummaryTree(notes, app_settings.max_input_tokens_summary)
+        while tree.chunks:
+            tree.reduce(await _gather_in_order(
+                summarize_full, tree.chunks,
+                app_settings.max_concurrency_summary))
+        return tree.result()
+
+    async def _openai_summarize_chunk(self, text: str, model: str) -> dict:
+        """Generate a summary for a chunk of the transcript."""
+        prompt = SUMMARY_CHUNK_PROMPT_TEMPLATE.format(text=text.strip())
+        return await self.openai_client.execute_chat_completion(
+            prompt, model=model)
+
+    async def _openai_summarize_full(self, text: str, model: str) -> dict:
+        """Generate a summary from a combined transcript summary."""
+        prompt = SUMMARY_PROMPT_TEMPLATE.format(text=text.strip())
+        return await self.openai_client.execute_chat_completion(
+            prompt, model=model)
+
+    async def concise_transcript(
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> SynthesisResult:
+        """Convert transcript to concise version and return reference indices
+        for phrases and sentences in the concise version"""
+        app_settings = await sync_to_async(AppSettings.get)()
+        chunks = split_indexed_transcript_lines_into_chunks(
+            indexed_transcript,
+            interviewee,
+            app_settings.chunk_min_tokens_concise,
+            line_tokens
+        )
+
+        async def concise_chunk(text: str) -> dict:
+            prompt = CONCISE_PROMPT_TEMPLATE.format(text=text.strip())
+            return await self.openai_client.execute_chat_completion(
+                prompt, model=app_settings.llm_concise)
+
+        chunk_results = await _gather_in_order(
+            concise_chunk,
+            ["\n".join(chunk) for chunk in chunks],
+            app_settings.max_concurrency_concise)
+        results, cost, prompts = self._collect_chunk_results(
+            chunk_results, indexed_transcript.count("\n") + 1)
+
+        separator = f"\n\n{'-' * 50}\n\n"
+        data: SynthesisResult = {
+            "output": results,
+            "prompt": separator.join(prompts),
+            "cost": cost
+        }
+        return data
+
+    async def embed_transcript(
+            self,
+            transcript_id: int,
+            transcript_title: str,
+            indexed_transcript: str,
+            interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> EmbedsResult:
+        """Generate embeds for the transcript"""
+        app_settings = await sync_to_async(AppSettings.get)()
+        chunks = split_indexed_transcript_lines_into_chunks(
+            indexed_transcript,
+            interviewee,
+            app_settings.chunk_min_tokens_query,
+            line_tokens
+        )
+        batches = self._create_batches_for_embeds(
+            ['\n'.join(chunk) for chunk in chunks],
+            EMBEDS_MAX_INPUT_TOKENS,
+            EMBEDS_MAX_REQUEST_TOKENS,
+            EMBEDS_MAX_REQUEST_INPUTS
+        )
+
+        # Batches are embedded concurrently and upserted in order as each
+        # one completes, with ids fixed by position as in Synthesis
+        semaphore = asyncio.Semaphore(EMBEDS_PIPELINE_DEPTH)
+
+        async def embed_batch(batch: List[str], start_index: int) -> dict:
+            async with semaphore:
+                return await self.openai_client.execute_embeds_batch(
+                    request_list=batch,
+                    object_id=transcript_id,
+                    object_desc=transcript_title,
+                    start_index=start_index
+                )
+
+        tasks = []
+        start_index = 0
+        for batch in batches:
+            tasks.append(asyncio.ensure_future(
+                embed_batch(batch, start_index)))
+            start_index += len(batch)
+
+        cost = 0
+        try:
+            for task in tasks:
+                result = await task
+                cost += result['cost']
+                await sync_to_async(self.embeds_client.upsert)(
+                    vectors=result['upsert_list'])
+        finally:
+            for task in tasks:
+                task.cancel()
+        return {'cost': cost}
+
+    async def embed_queries(self, queries: List[str]) -> QueryEmbedsResult:
+        """Generate embeds for the queries"""
+        if not queries:
+            return {"embeddings": [], "cost": 0}
+        result = await self.openai_client.execute_embeds_batch(
+            request_list=queries)
+        return {
+            "embeddings": [item[1] for item in result["upsert_list"]],
+            "cost": result["cost"]
+        }
+
+    async def query_transcript(
+            self,
+            transcript_id: int,
+            query: str,
+            query_embedding: Optional[List[float]] = None
+    ) -> SynthesisResult:
+        """Run query against the transcript"""
+        results = await self.query_transcript_batch(
+            transcript_id, [query], [query_embedding])
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+
+    async def query_transcript_batch(
+            self,
+            transcript_id: int,
+            queries: List[str],
+            query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Union[SynthesisResult, Exception]]:
+        """Run several queries against the transcript, awaiting the LLM
+        answers together. A failed answer gets its exception in place of
+        a result"""
+        if query_embeddings is None:
+            query_embeddings = [None] * len(queries)
+        embeddings = list(query_embeddings)
+        costs = [0] * len(queries)
+
+        missing = [i for i in range(len(queries)) if embeddings[i] is None]
+        if missing:
+            embed_result = await self.embed_queries(
+                [queries[i] for i in missing])
+            for i, embedding in zip(missing, embed_result['embeddings']):
+                embeddings[i] = embedding
+                costs[i] += embed_result['cost'] / len(missing)
+
+        search_results = await sync_to_async(self.embeds_client.search_many)(
+            transcript_id, embeddings)
+        app_settings = await sync_to_async(AppSettings.get)()
+
+        async def answer(query_and_search_result: tuple
+                         ) -> Union[dict, Exception]:
+            query, search_result = query_and_search_result
+            messages = self._query_messages(
+                query, search_result, app_settings.max_input_tokens_query)
+            try:
+                return await self.openai_client.execute_chat(
+                    messages, model=app_settings.llm_query)
+            except Exception as e:
+                logger.exception(f"Query '{query}' failed", exc_info=e)
+                return e
+
+        query_results = await _gather_in_order(
+            answer,
+            list(zip(queries, search_results)),
+            app_settings.max_concurrency_query)
+        return self._query_results(query_results, costs)
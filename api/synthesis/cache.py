@@ -0,0 +1,47 @@
+import logging
+from typing import Any, Dict, List, Optional
+from django.core.cache import BaseCache
+
+from .interfaces import CacheInterface
+
+
+logger = logging.getLogger(__name__)
+
+
+class DjangoCache(CacheInterface):
+    """Cache backed by a configured Django cache, such as the file based
+    or Postgres database caches, which handle TTL and size eviction"""
+
+    def __init__(self, cache: BaseCache):
+        self.cache = cache
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if absent"""
+        try:
+            return self.cache.get(key)
+        except Exception as e:
+            # A cache failure should never fail the request it fronts
+            logger.exception("Cache read failed", exc_info=e)
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store value under key"""
+        try:
+            self.cache.set(key, value)
+        except Exception as e:
+            logger.exception("Cache write failed", exc_info=e)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Return a dict of the cached values found for keys"""
+        try:
+            return self.cache.get_many(keys)
+        except Exception as e:
+            logger.exception("Cache read failed", exc_info=e)
+            return {}
+
+    def set_many(self, data: Dict[str, Any]):
+        """Store every key-value pair in data"""
+        try:
+            self.cache.set_many(data)
+        except Exception as e:
+            logger.exception("Cache write failed", exc_info=e)
@@ -0,0 +1,78 @@
+from itertools import chain
+from typing import List, Optional
+
+import numpy as np
+
+
+class CitationMatrix:
+    """Sparse boolean matrix in CSR form. Row i cites the columns
+    `indices[indptr[i]:indptr[i + 1]]`, kept sorted and unique.
+
+    A summary level cites the notes of the level below it, so composing
+    the levels with `compose` maps every note of any level straight to
+    transcript lines in O(nnz log nnz) array operations."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray,
+                 n_cols: int):
+        self.indptr = indptr
+        self.indices = indices
+        self.n_cols = n_cols
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_lists(cls, rows: List[Optional[List[int]]],
+                   n_cols: int) -> 'CitationMatrix':
+        """Build the matrix from a list of cited columns per row"""
+        rows = [row or () for row in rows]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64,
+                              count=len(rows))
+        row_ids = np.repeat(np.arange(len(rows), dtype=np.int64), lengths)
+        cols = np.fromiter(chain.from_iterable(rows), dtype=np.int64,
+                           count=int(lengths.sum()))
+        if len(cols) and (cols.min() < 0 or cols.max() >= n_cols):
+            raise IndexError(
+                f"Citation out of range for {n_cols} cited rows")
+        return cls._from_coordinates(row_ids, cols, len(rows), n_cols)
+
+    @classmethod
+    def _from_coordinates(cls, row_ids: np.ndarray, cols: np.ndarray,
+                          n_rows: int, n_cols: int) -> 'CitationMatrix':
+        """Build the matrix from (row, col) pairs, dropping duplicates"""
+        # Sorting then masking repeats is much faster than np.unique here
+        keys = np.sort(row_ids * max(n_cols, 1) + cols)
+        if len(keys):
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        row_ids = keys // max(n_cols, 1)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_ids, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, keys % max(n_cols, 1), n_cols)
+
+    def compose(self, other: 'CitationMatrix') -> 'CitationMatrix':
+        """Return the boolean product self @ other: row i cites every
+        column of `other` cited by the rows that row i of self cites"""
+        starts = other.indptr[self.indices]
+        lengths = other.indptr[self.indices + 1] - starts
+        total = int(lengths.sum())
+        # Position of every gathered column within its row of `other`
+        offsets = np.arange(total) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths)
+        cols = other.indices[np.repeat(starts, lengths) + offsets]
+        row_ids = np.repeat(
+            np.repeat(np.arange(self.n_rows), np.diff(self.indptr)),
+            lengths)
+        return self._from_coordinates(row_ids, cols, self.n_rows,
+                                      other.n_cols)
+
+    def to_lists(self) -> List[List[int]]:
+        """Return the cited columns of every row as lists"""
+        indices = self.indices.tolist()
+        indptr = self.indptr.tolist()
+        return [indices[start:end]
+                for start, end in zip(indptr[:-1], indptr[1:])]
@@ -1,4 +1,5 @@
 from typing import (
+    Any,
     TypedDict,
     List,
     Optional
@@ -52,3 +53,17 @@ class SynthesisResponse(TypedDict):
 class EmbedsResult(TypedDict):
     """Result model for Embeds"""
     cost: float
+
+
+class QueryEmbedsResult(TypedDict):
+    """Result model for query embeddings"""
+    embeddings: List[List[float]]
+    cost: float
+
+
+class StreamEvent(TypedDict):
+    """Event model for streamed results. `event` is "token", "sentence" or
+    "result", and `data` holds the token text, a sentence output or the
+    final result respectively"""
+    event: str
+    data: Any
@@ -1,10 +1,15 @@
 import abc
-from typing import List, Dict
-from .domains import SynthesisResult, EmbedsResult
+from typing import Any, Iterator, List, Dict, Optional, Union
+from .domains import (
+    SynthesisResult, EmbedsResult, QueryEmbedsResult, StreamEvent
+)
 
 
 class OpenAIClientInterface(abc.ABC):
     """Interface for OpenAI Client"""
+    # Name of the model embeddings are generated with
+    embeddings_model: Optional[str] = None
+
     @abc.abstractmethod
     def execute_chat_completion(self, prompt: str,
                                 model: str,
@@ -23,6 +28,15 @@ class OpenAIClientInterface(abc.ABC):
         """Execute OpenAI API chat request and return the response."""
         pass
 
+    def execute_chat_stream(self, messages: List[Dict[str, str]],
+                            **kwargs) -> Iterator[dict]:
+        """Execute OpenAI API chat request, yielding {"delta": text} as the
+        output arrives and finally the response with "done" set. Clients
+        that can't stream yield the whole output as a single delta."""
+        response = self.execute_chat(messages, **kwargs)
+        yield {"delta": response["output"]}
+        yield {"done": True, **response}
+
     @abc.abstractmethod
     def execute_embeds(self, text: str) -> dict:
         """Generate embedding vector for the input text"""
@@ -38,6 +52,86 @@ class OpenAIClientInterface(abc.ABC):
         pass
 
 
+class AsyncOpenAIClientInterface(abc.ABC):
+    """Interface for an asyncio OpenAI Client"""
+    # Name of the model embeddings are generated with
+    embeddings_model: Optional[str] = None
+
+    @abc.abstractmethod
+    async def execute_chat_completion(self, prompt: str,
+                                      model: str,
+                                      temperature: int,
+                                      max_tokens: int,
+                                      ) -> dict:
+        """Execute OpenAI API completions request and return the response."""
+        pass
+
+    @abc.abstractmethod
+    async def execute_chat(self, messages: List[Dict[str, str]],
+                           model: str,
+                           temperature: int,
+                           max_tokens: int,
+                           ) -> dict:
+        """Execute OpenAI API chat request and return the response."""
+        pass
+
+    @abc.abstractmethod
+    async def execute_embeds(self, text: str) -> dict:
+        """Generate embedding vector for the input text"""
+        pass
+
+    @abc.abstractmethod
+    async def execute_embeds_batch(self, request_list: List[str],
+                                   object_id: int = None,
+                                   object_desc: str = None,
+                                   start_index: int = 0,
+                                   ) -> dict:
+        """Generate embedding vectors for the input strings in request_list"""
+        pass
+
+
+class RateLimiterInterface(abc.ABC):
+    """Interface for a requests and tokens per minute rate limiter"""
+    @abc.abstractmethod
+    def acquire(self, tokens: int):
+        """Block until a request using `tokens` tokens may be sent"""
+        pass
+
+    @abc.abstractmethod
+    def record(self, estimated_tokens: int, tokens_used: int):
+        """Report a successful request and the tokens it actually used"""
+        pass
+
+    @abc.abstractmethod
+    def throttle(self, retry_after: Optional[float] = None):
+        """Report a rate limit error, pausing requests for `retry_after`
+        seconds when the API provided it"""
+        pass
+
+
+class CacheInterface(abc.ABC):
+    """Interface for a key-value cache of API responses"""
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if absent"""
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any):
+        """Store value under key"""
+        pass
+
+    @abc.abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Return a dict of the cached values found for keys"""
+        pass
+
+    @abc.abstractmethod
+    def set_many(self, data: Dict[str, Any]):
+        """Store every key-value pair in data"""
+        pass
+
+
 class EmbedsClientInterface(abc.ABC):
     """Interface for Embeddings Client"""
     @abc.abstractmethod
@@ -50,6 +144,12 @@ class EmbedsClientInterface(abc.ABC):
         """Retrieve the closest embeds for the input embedding"""
         pass
 
+    @abc.abstractmethod
+    def search_many(self, id: int, embeddings: List[List[float]],
+                    limit: int = 5) -> List[dict]:
+        """Retrieve the closest embeds for each of the input embeddings"""
+        pass
+
     @abc.abstractmethod
     def delete(self, id: int):
         """Delete all embeds for the input id"""
@@ -60,7 +160,8 @@ class SynthesisInterface(abc.ABC):
 
     @abc.abstractmethod
     def summarize_transcript(
-            self, indexed_transcript: str, interviewee: str
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> SynthesisResult:
         """Summarize an indexed transcript and return reference indices
         for phrases and sentences in the final summary"""
@@ -68,7 +169,8 @@ class SynthesisInterface(abc.ABC):
 
     @abc.abstractmethod
     def concise_transcript(
-            self, indexed_transcript: str, interviewee: str
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> SynthesisResult:
         """Convert transcript to concise version and return reference indices
         for phrases and sentences in the concise version"""
@@ -80,16 +182,119 @@ class SynthesisInterface(abc.ABC):
             transcript_id: int,
             transcript_title: str,
             indexed_transcript: str,
-            interviewee: str
+            interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> EmbedsResult:
         """Generate embeds for the transcript"""
         pass
 
+    @abc.abstractmethod
+    def query_transcript_batch(
+            self,
+            transcript_id: int,
+            queries: List[str],
+            query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Union[SynthesisResult, Exception]]:
+        """Run several queries against the transcript. Embeddings, vector
+        searches and LLM answers are each issued together. A query whose
+        answer fails gets its exception in place of a result"""
+        pass
+
+    @abc.abstractmethod
+    def embed_queries(self, queries: List[str]) -> QueryEmbedsResult:
+        """Generate embeds for the queries"""
+        pass
+
+    def embeddings_model(self) -> str:
+        """Name of the model embed_queries uses, so stored embeddings can
+        be told apart from those of another model"""
+        return ""
+
     @abc.abstractmethod
     def query_transcript(
             self,
             transcript_id: int,
-            query: str
+            query: str,
+            query_embedding: Optional[List[float]] = None
+    ) -> SynthesisResult:
+        """Run query against the transcript. A precomputed embedding
+        of the query may be passed to skip embedding it again"""
+        pass
+
+    @abc.abstractmethod
+    def stream_query_transcript(
+            self,
+            transcript_id: int,
+            query: str,
+            query_embedding: Optional[List[float]] = None
+    ) -> Iterator[StreamEvent]:
+        """Run query against the transcript, yielding events as the answer
+        streams in and the complete result last"""
+        pass
+
+
+class AsyncSynthesisInterface(abc.ABC):
+    """Interface for the asyncio Synthesis pipeline, for async views"""
+
+    @abc.abstractmethod
+    async def summarize_transcript(
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> SynthesisResult:
+        """Summarize an indexed transcript and return reference indices
+        for phrases and sentences in the final summary"""
+        pass
+
+    @abc.abstractmethod
+    async def concise_transcript(
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> SynthesisResult:
+        """Convert transcript to concise version and return reference indices
+        for phrases and sentences in the concise version"""
+        pass
+
+    @abc.abstractmethod
+    async def embed_transcript(
+            self,
+            transcript_id: int,
+            transcript_title: str,
+            indexed_transcript: str,
+            interviewee: str,
+            line_tokens: Optional[List[int]] = None
+    ) -> EmbedsResult:
+        """Generate embeds for the transcript"""
+        pass
+
+    @abc.abstractmethod
+    async def query_transcript_batch(
+            self,
+            transcript_id: int,
+            queries: List[str],
+            query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Union[SynthesisResult, Exception]]:
+        """Run several queries against the transcript, awaiting the LLM
+        answers together. A query whose answer fails gets its exception in
+        place of a result"""
+        pass
+
+    @abc.abstractmethod
+    async def embed_queries(self, queries: List[str]) -> QueryEmbedsResult:
+        """Generate embeds for the queries"""
+        pass
+
+    def embeddings_model(self) -> str:
+        """Name of the model embed_queries uses, so stored embeddings can
+        be told apart from those of another model"""
+        return ""
+
+    @abc.abstractmethod
+    async def query_transcript(
+            self,
+            transcript_id: int,
+            query: str,
+            query_embedding: Optional[List[float]] = None
     ) -> SynthesisResult:
-        """Run query against the transcript"""
+        """Run query against the transcript. A precomputed embedding
+        of the query may be passed to skip embedding it again"""
         pass
@@ -0,0 +1,109 @@
+import logging
+from typing import List, Tuple
+import numpy as np
+
+from .interfaces import EmbedsClientInterface
+from .models import LocalEmbeds
+
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row of matrix to unit length, leaving zero rows as is"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _top_k(matrix: np.ndarray,
+           queries: np.ndarray,
+           limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the indices and cosine scores of the `limit` closest rows of
+    the normalized matrix for every query, using a single matmul"""
+    scores = _normalize(queries) @ matrix.T
+    limit = min(limit, matrix.shape[0])
+    if limit < matrix.shape[0]:
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    else:
+        top = np.tile(np.arange(matrix.shape[0]), (len(queries), 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return (np.take_along_axis(top, order, axis=1),
+            np.take_along_axis(top_scores, order, axis=1))
+
+
+class LocalEmbedsClient(EmbedsClientInterface):
+    """In-process vector index. Normalized float32 vectors are stored in
+    Postgres and searched by brute force, which is faster than a network
+    round trip for the few dozen vectors a transcript has"""
+
+    def upsert(self, vectors: List[dict]):
+        """Upsert the vectors into the index."""
+        logger.info(f"Upserting to local index: {len(vectors)} vectors")
+        objs = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                vector_id = vector['id']
+                values, metadata = vector['values'], vector['metadata']
+            else:
+                vector_id, values, metadata = vector
+            embedding = _normalize(np.asarray(values, dtype=np.float32))
+            objs.append(LocalEmbeds(
+                object_id=metadata['object_id'],
+                vector_id=vector_id,
+                metadata=metadata,
+                embedding=embedding.tobytes()))
+        LocalEmbeds.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['vector_id'],
+            update_fields=['object_id', 'metadata', 'embedding'])
+
+    def _load(self, id: int) -> Tuple[List[str], List[dict], np.ndarray]:
+        """Load the ids, metadata and vector matrix stored for object id"""
+        rows = LocalEmbeds.objects.filter(object_id=id).order_by(
+            'id').values_list('vector_id', 'metadata', 'embedding')
+        if not rows:
+            return [], [], np.empty((0, 0), dtype=np.float32)
+        vector_ids, metadata, blobs = zip(*rows)
+        matrix = np.frombuffer(
+            b''.join(bytes(blob) for blob in blobs),
+            dtype=np.float32).reshape(len(blobs), -1)
+        return list(vector_ids), list(metadata), matrix
+
+    def _search(self, id: int, embeddings: List[List[float]],
+                limit: int) -> List[dict]:
+        """Search the vectors of object id for every embedding."""
+        vector_ids, metadata, matrix = self._load(id)
+        if not vector_ids:
+            return [{"matches": [], "namespace": ""} for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32)
+        indices, scores = _top_k(matrix, queries, limit)
+        return [{
+            "matches": [{
+                "id": vector_ids[i],
+                "score": float(score),
+                "metadata": metadata[i],
+            } for i, score in zip(row_indices, row_scores)],
+            "namespace": "",
+        } for row_indices, row_scores in zip(indices, scores)]
+
+    def search(self, id: int, embedding: List[int], limit: int = 5) -> dict:
+        """Retrieve the closest embeds for the input embedding"""
+        logger.info(f"Executing local search for object with ID {id}")
+        return self._search(id, [embedding], limit)[0]
+
+    def search_many(self, id: int, embeddings: List[List[float]],
+                    limit: int = 5) -> List[dict]:
+        """Retrieve the closest embeds for each of the input embeddings"""
+        if not embeddings:
+            return []
+        logger.info(f"Executing local search of {len(embeddings)} queries "
+                    f"for object with ID {id}")
+        return self._search(id, embeddings, limit)
+
+    def delete(self, id: int):
+        """Delete all embeds for the input id."""
+        logger.info(f"Deleting local embeds for object with ID {id}")
+        LocalEmbeds.objects.filter(object_id=id).delete()
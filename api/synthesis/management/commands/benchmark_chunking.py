@@ -0,0 +1,70 @@
+"""
+Django command to benchmark token counting and chunking of indexed lines
+"""
+import time
+
+import tiktoken
+from django.core.management.base import BaseCommand
+
+from synthesis.utils import (
+    TOKEN_ENCODING,
+    split_indexed_lines_into_chunks,
+    split_text_into_multiple_lines_for_speaker,
+    token_counts,
+)
+
+
+DEFAULT_TRANSCRIPT = 'synthesis/tests/samples/transcript_full.txt'
+
+
+def _legacy_token_count(input: str) -> int:
+    """Token count as previously implemented, fetching the encoder per call"""
+    token_encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    return len(token_encoding.encode(input))
+
+
+class Command(BaseCommand):
+    """Django command to benchmark chunking throughput."""
+    help = 'Compare lines/sec for per-line and batched token counting.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DEFAULT_TRANSCRIPT)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--line-min-chars', type=int, default=90)
+        parser.add_argument('--chunk-min-tokens', type=int, default=2000)
+
+    def _measure(self, func, lines, repeat) -> float:
+        """Return the lines/sec achieved by func over repeat runs."""
+        func(lines)  # Warm up, loading the encoder outside the timed loop
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(lines)
+        elapsed = time.perf_counter() - start
+        return len(lines) * repeat / elapsed
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with open(options['file']) as file:
+            data = split_text_into_multiple_lines_for_speaker(
+                file.read(), options['line_min_chars'])
+        text = '\n'.join(
+            f"[{i}] {data[i]['text']}" for i in range(len(data)))
+        lines = text.split('\n')
+        chunk_min_tokens = options['chunk_min_tokens']
+        repeat = options['repeat']
+
+        results = {
+            'per-line token_count': self._measure(
+                lambda lines: [_legacy_token_count(line) for line in lines],
+                lines, repeat),
+            'batched token_counts': self._measure(
+                token_counts, lines, repeat),
+            'chunking (batched counts)': self._measure(
+                lambda lines: split_indexed_lines_into_chunks(
+                    text, chunk_min_tokens),
+                lines, repeat),
+        }
+
+        self.stdout.write(f'{len(lines)} lines x {repeat} runs')
+        for name, lines_per_sec in results.items():
+            self.stdout.write(f'{name:<28} {lines_per_sec:>12,.0f} lines/sec')
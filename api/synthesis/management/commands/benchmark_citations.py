@@ -0,0 +1,101 @@
+"""
+Django command to benchmark mapping summary citations back to transcript
+lines through a multi-level summary tree
+"""
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from synthesis.citations import CitationMatrix
+
+
+class Command(BaseCommand):
+    """Django command to benchmark citation composition."""
+    help = 'Compare set-based and CSR citation composition on synthetic trees.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=5000)
+        parser.add_argument('--levels', type=int, default=5)
+        parser.add_argument('--fan-in', type=int, default=4)
+        parser.add_argument('--citations', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _synthetic_tree(self, options) -> list:
+        """Return the citations of every level, from the first level of
+        notes citing transcript lines up to the final summary"""
+        rng = np.random.default_rng(0)
+        sizes = [options['lines']]
+        for _ in range(options['levels']):
+            sizes.append(max(1, sizes[-1] // options['fan_in']))
+
+        levels = []
+        for n_rows, n_cols in zip(sizes[1:], sizes):
+            counts = rng.integers(1, options['citations'] + 1, size=n_rows)
+            levels.append([
+                rng.integers(0, n_cols, size=count).tolist()
+                for count in counts
+            ])
+        return levels
+
+    def _compose_sets(self, levels: list) -> list:
+        """Map every final note to transcript lines one note at a time"""
+        references = levels[0]
+        for level in levels[1:]:
+            composed = []
+            for item in level:
+                temp = set()
+                for num in item:
+                    temp.update(references[num])
+                composed.append(list(temp))
+            references = composed
+        return references
+
+    def _to_matrices(self, levels: list) -> list:
+        """Convert the citations of every level to CitationMatrix"""
+        n_cols = max(max(row) for row in levels[0]) + 1
+        matrices = [CitationMatrix.from_lists(levels[0], n_cols)]
+        for level in levels[1:]:
+            matrices.append(
+                CitationMatrix.from_lists(level, matrices[-1].n_rows))
+        return matrices
+
+    def _compose_matrices(self, matrices: list) -> CitationMatrix:
+        """Map every final note to transcript lines by sparse products"""
+        references = matrices[0]
+        for matrix in matrices[1:]:
+            references = matrix.compose(references)
+        return references
+
+    def _measure(self, func, repeat) -> float:
+        """Return the mean milliseconds per call of func."""
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        levels = self._synthetic_tree(options)
+        matrices = self._to_matrices(levels)
+        if [sorted(refs) for refs in self._compose_sets(levels)] != \
+                self._compose_matrices(matrices).to_lists():
+            raise AssertionError('Composition results differ')
+
+        sets_ms = self._measure(lambda: self._compose_sets(levels),
+                                options['repeat'])
+        csr_ms = self._measure(
+            lambda: self._compose_matrices(
+                self._to_matrices(levels)).to_lists(),
+            options['repeat'])
+        compose_ms = self._measure(lambda: self._compose_matrices(matrices),
+                                   options['repeat'])
+
+        sizes = ' -> '.join(str(len(level)) for level in levels)
+        self.stdout.write(
+            f"{options['lines']} lines, {len(levels)} levels "
+            f"({sizes} notes)")
+        self.stdout.write(f'set per note             {sets_ms:>8.3f} ms')
+        self.stdout.write(f'CSR from lists to lists  {csr_ms:>8.3f} ms')
+        self.stdout.write(f'CSR compose only         {compose_ms:>8.3f} ms')
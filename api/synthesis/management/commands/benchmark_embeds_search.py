@@ -0,0 +1,97 @@
+"""
+Django command to benchmark the local embeds index against a Pinecone-style
+HTTP round trip served by a local stand-in
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand
+
+from synthesis.local_embeds_client import LocalEmbedsClient
+
+
+BENCHMARK_OBJECT_ID = -1
+
+
+class _PineconeStandIn(BaseHTTPRequestHandler):
+    """Answers every query with a fixed Pinecone-shaped response"""
+    response = b''
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.response)))
+        self.end_headers()
+        self.wfile.write(self.response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """Django command to benchmark vector search latency."""
+    help = 'Compare local index search with a Pinecone-style round trip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vectors', type=int, default=50)
+        parser.add_argument('--dimensions', type=int, default=1536)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=5)
+
+    def _measure(self, func, repeat) -> float:
+        """Return the mean milliseconds per call of func."""
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        rng = np.random.default_rng(0)
+        dimensions, limit = options['dimensions'], options['limit']
+        vectors = [
+            (f'{BENCHMARK_OBJECT_ID}-{n}',
+             rng.standard_normal(dimensions).tolist(),
+             {'text': f'Section {n}', 'object_id': BENCHMARK_OBJECT_ID})
+            for n in range(options['vectors'])
+        ]
+        query = rng.standard_normal(dimensions).tolist()
+
+        client = LocalEmbedsClient()
+        client.upsert(vectors)
+        try:
+            matches = client.search(BENCHMARK_OBJECT_ID, query, limit)
+            local_ms = self._measure(
+                lambda: client.search(BENCHMARK_OBJECT_ID, query, limit),
+                options['repeat'])
+        finally:
+            client.delete(BENCHMARK_OBJECT_ID)
+
+        _PineconeStandIn.response = json.dumps(matches).encode()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _PineconeStandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/query'
+        payload = {
+            'vector': query,
+            'filter': {'object_id': {'$eq': BENCHMARK_OBJECT_ID}},
+            'topK': limit,
+            'includeMetadata': True,
+        }
+        try:
+            remote_ms = self._measure(
+                lambda: requests.post(url, json=payload).json(),
+                options['repeat'])
+        finally:
+            server.shutdown()
+
+        self.stdout.write(
+            f"{options['vectors']} vectors x {dimensions} dims, top {limit}")
+        self.stdout.write(f'local index search    {local_ms:>8.3f} ms')
+        self.stdout.write(f'HTTP stand-in query   {remote_ms:>8.3f} ms '
+                          '(localhost, excludes real network latency)')
@@ -0,0 +1,107 @@
+"""
+Django command to benchmark splitting transcripts into indexed lines
+"""
+import re
+import time
+from typing import List
+
+from django.core.management.base import BaseCommand
+
+from synthesis.utils import split_text_into_multiple_lines_for_speaker
+
+
+DEFAULT_TRANSCRIPT = 'synthesis/tests/samples/transcript_full.txt'
+MAX_TRANSCRIPT_CHARS = 100000  # Matches Transcript.transcript max_length
+
+
+def _legacy_split(text: str, line_min_size: int) -> List[dict]:
+    """Line splitting as previously implemented, using str.find to
+    locate every line in the source text"""
+    paras = [txt for txt in re.split(r"\r?\n+|\r+", text.strip()) if txt]
+    start_loc, results = 0, []
+    for para in paras:
+        if len(para.split(": ")) <= 1:
+            continue
+        speech_parts = para.split(": ", 1)
+        speaker = speech_parts[0]
+        speech_text_words = re.split(r"(\W)", speech_parts[1].strip('"'))
+        start_loc += len(speaker)
+        temp_words, line_length = [], 0
+        n = len(speech_text_words)
+        for i in range(n):
+            string = speech_text_words[i]
+            temp_words.append(string)
+            line_length += len(string)
+            if (
+                line_length >= line_min_size and temp_words[-1] in
+                    [".", "?", "!"]
+            ) or i == n - 1:
+                sentence = ("".join(temp_words)).strip()
+                if len(sentence):
+                    start_loc = text.find(sentence, start_loc)
+                    results.append({
+                        "text": f"{speaker}: {sentence}",
+                        "start": start_loc,
+                        "end": start_loc + len(sentence),
+                    })
+                start_loc += line_length
+                temp_words, line_length = [], 0
+    return results
+
+
+def _fill_to_length(text: str, length: int) -> str:
+    """Repeat the paragraphs in text until it is close to length chars"""
+    paras = [para for para in text.strip().split('\n') if para.strip()]
+    result, size, i = [], 0, 0
+    while size + len(paras[i % len(paras)]) + 2 <= length:
+        result.append(paras[i % len(paras)])
+        size += len(result[-1]) + 2
+        i += 1
+    return '\n\n'.join(result)
+
+
+def _pathological(length: int) -> str:
+    """A transcript of short, repetitive sentences where str.find is prone
+    to matching later occurrences of a line"""
+    para = 'Jason: "We moved to the u.s. ' + 'It is the u.s. ' * 20 + '"'
+    return _fill_to_length(para, length)
+
+
+class Command(BaseCommand):
+    """Django command to benchmark line splitting."""
+    help = 'Compare the legacy and single-pass transcript line splitters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DEFAULT_TRANSCRIPT)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--line-min-chars', type=int, default=90)
+
+    def _measure(self, func, text, line_min_size, repeat) -> float:
+        """Return the mean seconds per call of func over repeat runs."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(text, line_min_size)
+        return (time.perf_counter() - start) / repeat
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with open(options['file']) as file:
+            sample = _fill_to_length(file.read(), MAX_TRANSCRIPT_CHARS)
+        inputs = {
+            'sample': sample,
+            'pathological': _pathological(MAX_TRANSCRIPT_CHARS),
+        }
+        line_min_size = options['line_min_chars']
+        repeat = options['repeat']
+
+        for name, text in inputs.items():
+            legacy = self._measure(
+                _legacy_split, text, line_min_size, repeat)
+            current = self._measure(
+                split_text_into_multiple_lines_for_speaker,
+                text, line_min_size, repeat)
+            self.stdout.write(
+                f'{name:<14} {len(text):>7} chars  '
+                f'legacy {legacy * 1000:>9.2f} ms  '
+                f'single-pass {current * 1000:>9.2f} ms  '
+                f'({legacy / current:.1f}x)')
@@ -0,0 +1,56 @@
+"""
+Django command to benchmark how long a worker takes to boot
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+
+# Runs in a fresh interpreter, the way a uwsgi worker loads the app. The URL
+# conf is imported too since Django otherwise defers it to the first request.
+BOOT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app.wsgi
+import app.urls
+elapsed = time.perf_counter() - start
+from synthesis import server
+print(json.dumps({
+    "seconds": elapsed,
+    "clients_created": [name for name in ("openai_client", "embeds_client")
+                        if getattr(server, name) is not None],
+}))
+"""
+
+
+class Command(BaseCommand):
+    """Django command to benchmark worker boot time."""
+    help = 'Measure the time to load the WSGI app in a fresh process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        timings, clients_created = [], set()
+        for _ in range(options['repeat']):
+            output = subprocess.run(
+                [sys.executable, '-c', BOOT_SCRIPT],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            timings.append(result['seconds'] * 1000)
+            clients_created.update(result['clients_created'])
+
+        self.stdout.write(
+            f"worker boot: median {statistics.median(timings):.0f} ms, "
+            f"min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+            f"over {options['repeat']} runs")
+        if clients_created:
+            self.stdout.write(self.style.WARNING(
+                f"Clients created during boot: {sorted(clients_created)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'No synthesis clients were created during boot'))
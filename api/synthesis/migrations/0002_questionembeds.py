@@ -0,0 +1,28 @@
+# Generated by Django 4.1.10 on 2026-10-18 11:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0001_initial'),
+        ('synthesis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionEmbeds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.TextField(max_length=10000)),
+                ('embedding', models.BinaryField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='project.project')),
+            ],
+            options={
+                'verbose_name': 'Question Embeds',
+                'verbose_name_plural': 'Question Embeds',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.10 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthesis', '0002_questionembeds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalEmbeds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField(db_index=True)),
+                ('vector_id', models.CharField(max_length=255, unique=True)),
+                ('metadata', models.JSONField()),
+                ('embedding', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Local Embeds',
+                'verbose_name_plural': 'Local Embeds',
+            },
+        ),
+    ]
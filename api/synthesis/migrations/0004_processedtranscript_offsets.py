@@ -0,0 +1,30 @@
+# Generated by Django 4.1.10 on 2026-10-18 17:05
+
+from array import array
+from itertools import chain
+
+from django.db import migrations, models
+
+
+def pack_offsets(apps, schema_editor):
+    ProcessedTranscript = apps.get_model('synthesis', 'ProcessedTranscript')
+    for ptct in ProcessedTranscript.objects.iterator():
+        ptct.offsets = array('i', chain.from_iterable(
+            (line['start'], line['end']) for line in ptct.data)).tobytes()
+        ptct.save(update_fields=['offsets'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthesis', '0003_localembeds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedtranscript',
+            name='offsets',
+            field=models.BinaryField(editable=False, null=True),
+        ),
+        migrations.RunPython(pack_offsets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.10 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+def render_indexed_text(apps, schema_editor):
+    ProcessedTranscript = apps.get_model('synthesis', 'ProcessedTranscript')
+    for ptct in ProcessedTranscript.objects.iterator():
+        ptct.indexed_text = '\n'.join([
+            f"[{i}] {line['text']}" for i, line in enumerate(ptct.data)
+        ])
+        ptct.save(update_fields=['indexed_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthesis', '0004_processedtranscript_offsets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedtranscript',
+            name='indexed_text',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.RunPython(render_indexed_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.10 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+def delete_duplicate_question_embeds(apps, schema_editor):
+    QuestionEmbeds = apps.get_model('synthesis', 'QuestionEmbeds')
+    seen = set()
+    duplicates = []
+    for qembeds in QuestionEmbeds.objects.order_by('id').only(
+            'id', 'project_id', 'question').iterator():
+        key = (qembeds.project_id, qembeds.question)
+        if key in seen:
+            duplicates.append(qembeds.id)
+        seen.add(key)
+    QuestionEmbeds.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthesis', '0005_processedtranscript_indexed_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionembeds',
+            name='embeddings_model',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RunPython(delete_duplicate_question_embeds,
+                             migrations.RunPython.noop),
+    ]
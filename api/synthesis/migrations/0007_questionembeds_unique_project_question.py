@@ -0,0 +1,17 @@
+# Generated by Django 4.1.10 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthesis', '0006_questionembeds_embeddings_model'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='questionembeds',
+            constraint=models.UniqueConstraint(fields=('project', 'question'), name='unique_project_question'),
+        ),
+    ]
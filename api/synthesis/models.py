@@ -1,4 +1,24 @@
+from array import array
 from django.db import models
+from django.utils.functional import cached_property
+from itertools import chain
+import numpy as np
+from typing import List, Optional
+
+from .utils import indexed_line
+
+
+def pack_line_offsets(data: List[dict]) -> bytes:
+    """Pack the start and end offsets of transcript lines as C int pairs"""
+    return array('i', chain.from_iterable(
+        (line['start'], line['end']) for line in data)).tobytes()
+
+
+def render_indexed(data: List[dict]) -> str:
+    """Render transcript lines as indexed text, one line per entry"""
+    return '\n'.join([
+        indexed_line(i, line['text']) for i, line in enumerate(data)
+    ])
 
 
 class ProcessedTranscript(models.Model):
@@ -13,12 +33,91 @@ class ProcessedTranscript(models.Model):
         on_delete=models.CASCADE,
     )
     data = models.JSONField()
+    offsets = models.BinaryField(null=True, editable=False)  # int pairs
+    indexed_text = models.TextField(null=True, editable=False)
 
-    @property
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'data' in update_fields:
+            self.offsets = pack_line_offsets(self.data)
+            self.indexed_text = render_indexed(self.data)
+            self.__dict__.pop('line_offsets', None)
+            self.__dict__.pop('indexed', None)
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'offsets', 'indexed_text'}
+        super().save(*args, **kwargs)
+
+    @cached_property
     def indexed(self) -> str:
-        return '\n'.join([
-            f"[{i}] {self.data[i]['text']}" for i in range(len(self.data))
-        ])
+        """Indexed transcript text, rendered when the data was saved or
+        once per instance for rows saved before it was stored"""
+        if self.indexed_text is None:
+            return render_indexed(self.data)
+        return self.indexed_text
+
+    @property
+    def line_tokens(self) -> Optional[List[int]]:
+        """Token counts of the indexed lines, if stored when processed.
+        An empty transcript still renders as one empty line, so it has
+        no counts to match"""
+        if self.data and all('tokens' in line for line in self.data):
+            return [line['tokens'] for line in self.data]
+        return None
+
+    @cached_property
+    def line_offsets(self) -> np.ndarray:
+        """(start, end) offsets of the indexed lines as an n x 2 array.
+        Read from the binary column so `data` can be left deferred, or
+        from `data` for rows saved before offsets were stored"""
+        if self.offsets is None:
+            packed = pack_line_offsets(self.data)
+        else:
+            packed = bytes(self.offsets)
+        return np.frombuffer(packed, dtype=np.intc).reshape(-1, 2)
 
     def __str__(self):
         return f'[{self.transcript.project.title}] {self.transcript.title}'
+
+
+class QuestionEmbeds(models.Model):
+    """Model for storing precomputed embeddings of project questions"""
+
+    class Meta:
+        verbose_name = "Question Embeds"
+        verbose_name_plural = "Question Embeds"
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'question'],
+                                    name='unique_project_question'),
+        ]
+
+    project = models.ForeignKey(
+        'project.project',
+        on_delete=models.CASCADE,
+    )
+    question = models.TextField(max_length=10000)
+    embeddings_model = models.CharField(max_length=255, default='')
+    embedding = models.BinaryField()  # float32 bytes
+
+    @property
+    def vector(self) -> List[float]:
+        return array('f', bytes(self.embedding)).tolist()
+
+    def __str__(self):
+        return f'[{self.project.title}] {self.question}'
+
+
+class LocalEmbeds(models.Model):
+    """Model for storing vectors of the local embeds index"""
+
+    class Meta:
+        verbose_name = "Local Embeds"
+        verbose_name_plural = "Local Embeds"
+
+    object_id = models.BigIntegerField(db_index=True)
+    vector_id = models.CharField(max_length=255, unique=True)
+    metadata = models.JSONField()
+    embedding = models.BinaryField()  # normalized float32 bytes
+
+    def __str__(self):
+        return self.vector_id
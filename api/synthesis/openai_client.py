@@ -1,12 +1,21 @@
+from array import array
+from contextlib import contextmanager
 from enum import Enum
+import hashlib
+import json
 import logging
+import time
 import openai
+from openai import api_requestor
 from openai.error import Timeout, RateLimitError
 from retry import retry
-from typing import List, Dict
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 
 from .errors import OpenAITimeoutException, OpenAIRateLimitException
-from .interfaces import OpenAIClientInterface
+from .interfaces import (
+    CacheInterface, OpenAIClientInterface, RateLimiterInterface
+)
+from .utils import token_count, token_counts
 
 
 # Pricing
@@ -22,14 +31,23 @@ OPENAI_MODEL_EMBEDDING = "text-embedding-ada-002"
 
 # Model Params / TODO: Move to env vars
 DEFAULT_TEMPERATURE = 0.1
+# Batch pipelines (summaries, concise transcripts) are deterministic so
+# reruns and shared samples can be answered from the LLM cache
+BATCH_TEMPERATURE = 0
 DEFAULT_MAX_TOKENS = 600
 
 # Retry Params
 RETRY_TRIES = 3
 RETRY_DELAY_TIMEOUT = 5
-RETRY_DELAY_RATELIMIT = 5
+# The rate limiter waits out Retry-After before a retry is sent, so the
+# retry itself only needs a short, jittered delay
+RETRY_DELAY_RATELIMIT = 1
+RETRY_JITTER_RATELIMIT = (0, 1)
 RETRY_BACKOFF = 2
 
+# Tokens added per chat message for the role and formatting
+CHAT_MESSAGE_TOKENS = 4
+
 # API Types
 OPENAI_API_TYPE = "open_ai"
 AZURE_API_TYPE = "azure"
@@ -37,7 +55,54 @@ AZURE_API_TYPE = "azure"
 logger = logging.getLogger(__name__)
 
 
-class OpenAIClient(OpenAIClientInterface):
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    """Return the Retry-After header of a rate limit error in seconds"""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _float32(vector: List[float]) -> List[float]:
+    """Round a vector to float32, the precision embeddings are cached at,
+    so a vector is the same whether or not it came from the cache"""
+    return array('f', vector).tolist()
+
+
+# Attributes the legacy openai module keeps per thread for its session
+_SESSION_ATTRS = ("session", "session_create_time")
+
+
+@contextmanager
+def _using_session(session):
+    """Send the legacy openai module's requests on this thread through
+    session until the block exits. The module keeps one session per
+    thread, so the previous one is put back afterwards and other callers
+    of the module are left untouched."""
+    if session is None:
+        yield
+        return
+    context = api_requestor._thread_context
+    saved = {name: getattr(context, name) for name in _SESSION_ATTRS
+             if hasattr(context, name)}
+    context.session = session
+    # A fresh create time stops the module closing the pooled session
+    # as expired
+    context.session_create_time = time.time()
+    try:
+        yield
+    finally:
+        for name in _SESSION_ATTRS:
+            if name in saved:
+                setattr(context, name, saved[name])
+            elif hasattr(context, name):
+                delattr(context, name)
+
+
+class OpenAIClientBase:
+    """Settings and request/response helpers shared by OpenAIClient and
+    AsyncOpenAIClient. Sends no requests itself."""
     def __init__(self, **kwargs) -> None:
         self.completions_api_type = kwargs.get('completions_api_type')
         self.completions_api_key = kwargs.get('completions_api_key')
@@ -49,6 +114,15 @@ class OpenAIClient(OpenAIClientInterface):
         self.embeddings_api_base = kwargs.get('embeddings_api_base')
         self.embeddings_api_version = kwargs.get('embeddings_api_version')
         self.embeddings_model = kwargs.get('embeddings_model')
+        self.cache: CacheInterface = kwargs.get('cache')
+        self.chat_rate_limiter: RateLimiterInterface = \
+            kwargs.get('chat_rate_limiter')
+        self.embeds_rate_limiter: RateLimiterInterface = \
+            kwargs.get('embeds_rate_limiter')
+        self.request_timeout = kwargs.get('request_timeout')
+        # Keep-alive session for this client's requests, used instead of
+        # the openai module's own session per thread
+        self.session = kwargs.get('session')
 
         if self.completions_model is None:
             self.completions_model = OPENAI_MODEL_CHAT
@@ -78,20 +152,189 @@ class OpenAIClient(OpenAIClientInterface):
             "max_tokens": max_tokens,
             "temperature": temperature,
         }
+        if self.request_timeout is not None:
+            params["request_timeout"] = self.request_timeout
         if self.completions_api_type == AZURE_API_TYPE:
             params["engine"] = model
         else:
             params["model"] = model
         return params
 
+    def _chat_cache_key(self,
+                        messages: List[Dict[str, str]],
+                        params: dict) -> str:
+        """Build a content-addressed cache key for a chat request."""
+        request = {
+            "api_type": params["api_type"],
+            "model": params.get("engine", params.get("model")),
+            "temperature": params["temperature"],
+            "max_tokens": params["max_tokens"],
+            "messages": messages,
+        }
+        digest = hashlib.sha256(
+            json.dumps(request, sort_keys=True).encode()).hexdigest()
+        return f"openai-chat-{digest}"
+
+    def _chat_cacheable(self, params: dict, batch: bool) -> bool:
+        """Whether a chat answer can be reused. Only deterministic batch
+        pipeline requests are cached: interactive answers and sampled
+        (temperature above 0) answers are always requested fresh."""
+        return self.cache is not None and batch and params["temperature"] == 0
+
+    def _estimate_chat_tokens(self,
+                              messages: List[Dict[str, str]],
+                              params: dict) -> int:
+        """Estimate the tokens a chat request counts against the quota."""
+        return params["max_tokens"] + sum(
+            token_count(message["content"]) + CHAT_MESSAGE_TOKENS
+            for message in messages)
+
+    def _cached_chat_result(self, cached: dict) -> dict:
+        """Build the result of a chat request answered from the cache."""
+        return {
+            "output": cached["output"],
+            "tokens_used": 0,
+            "cost": 0,
+            "cached": True
+        }
+
+    def _chat_result(self, response: dict) -> dict:
+        """Build the result of a chat request from the API response."""
+        tokens_used = response["usage"]["total_tokens"]
+        return {
+            "output":
+                response["choices"][0]["message"]["content"].strip(" \n"),
+            "tokens_used": tokens_used,
+            "cost": self._calculate_cost(tokens_used, OpenAIPricing.CHAT),
+            "cached": False
+        }
+
+    def _build_embeddings_params(self) -> dict:
+        """Creates the parameters for the OpenAI API Embeddings request."""
+        params = {
+            "api_key": self.embeddings_api_key,
+            "api_type": self.embeddings_api_type,
+            "api_base": self.embeddings_api_base,
+            "api_version": self.embeddings_api_version,
+        }
+        if self.request_timeout is not None:
+            params["request_timeout"] = self.request_timeout
+        if self.completions_api_type == AZURE_API_TYPE:
+            params["engine"] = self.embeddings_model
+        else:
+            params["model"] = self.embeddings_model
+        return params
+
+    def _embeds_cache_key(self, text: str) -> str:
+        """Build a content-addressed cache key for an embedding."""
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return (f"openai-embeds-{self.embeddings_api_type}-"
+                f"{self.embeddings_model}-{digest}")
+
+    def _embeds_from_cache(self,
+                           keys: Dict[str, str],
+                           cached: dict) -> Dict[str, List[float]]:
+        """Decode the cached float32 vectors found for the keyed texts."""
+        return {text: array('f', cached[key]).tolist()
+                for text, key in keys.items() if key in cached}
+
+    def _embeds_to_cache(self,
+                         keys: Dict[str, str],
+                         embeds: Dict[str, List[float]],
+                         texts: List[str]) -> dict:
+        """Encode the vectors of texts as float32 bytes for the cache."""
+        return {keys[text]: array('f', embeds[text]).tobytes()
+                for text in texts}
+
+    def _embeds_batch_result(self,
+                             request_list: List[str],
+                             embeds: List[List[float]],
+                             tokens_used: int,
+                             object_id: int = None,
+                             object_desc: str = None,
+                             start_index: int = 0) -> dict:
+        """Pair each embedding with its vector id and metadata."""
+        meta = []
+        for line in request_list:
+            data = {'text': line}
+            if object_id is not None:
+                data['object_id'] = object_id
+            if object_desc is not None:
+                data['object_desc'] = object_desc
+            meta.append(data)
+
+        end_index = start_index + len(request_list)
+        request_ids = [f'{str(object_id)}-{str(n)}'
+                       for n in range(start_index, end_index)]
+        to_upsert = zip(request_ids, embeds, meta)
+
+        cost = self._calculate_cost(tokens_used, OpenAIPricing.EMBEDDINGS)
+
+        return {
+            "upsert_list": list(to_upsert),
+            "request_ids": request_ids,
+            "tokens_used": tokens_used,
+            "cost": cost
+        }
+
+
+class OpenAIClient(OpenAIClientBase, OpenAIClientInterface):
+    def _send(self,
+              rate_limiter: Optional[RateLimiterInterface],
+              estimate_tokens: Callable[[], int],
+              create: Callable, **kwargs) -> dict:
+        """Send an OpenAI request once the rate limiter allows it. Rate
+        limit errors pause every worker sharing the limiter."""
+        if rate_limiter is None:
+            with _using_session(self.session):
+                return create(**kwargs)
+        estimated_tokens = estimate_tokens()
+        rate_limiter.acquire(estimated_tokens)
+        try:
+            with _using_session(self.session):
+                response = create(**kwargs)
+        except RateLimitError as e:
+            rate_limiter.throttle(_retry_after(e))
+            raise
+        rate_limiter.record(estimated_tokens,
+                            response["usage"]["total_tokens"])
+        return response
+
+    def _create_chat(self,
+                     messages: List[Dict[str, str]],
+                     params: dict,
+                     batch: bool = False) -> dict:
+        """Run a chat request, answering batch requests from the cache when
+        possible. Cached responses are free, so they cost zero."""
+        key = None
+        if self._chat_cacheable(params, batch):
+            key = self._chat_cache_key(messages, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug(f"OpenAI chat cache hit: {key}")
+                return self._cached_chat_result(cached)
+
+        response = self._send(
+            self.chat_rate_limiter,
+            lambda: self._estimate_chat_tokens(messages, params),
+            openai.ChatCompletion.create,
+            messages=messages, **params)
+        ret_val = self._chat_result(response)
+
+        if key is not None:
+            self.cache.set(key, {"output": ret_val["output"],
+                                 "tokens_used": ret_val["tokens_used"]})
+        return ret_val
+
     @retry(OpenAIRateLimitException, tries=RETRY_TRIES,
-           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF)
+           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+           jitter=RETRY_JITTER_RATELIMIT)
     @retry(OpenAITimeoutException, tries=RETRY_TRIES,
            delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
     def execute_chat_completion(self,
                                 prompt: str,
                                 model: str = None,
-                                temperature: int = DEFAULT_TEMPERATURE,
+                                temperature: int = BATCH_TEMPERATURE,
                                 max_tokens: int = DEFAULT_MAX_TOKENS,
                                 ) -> dict:
         """Execute an OpenAI completion and return the response."""
@@ -100,19 +343,9 @@ class OpenAIClient(OpenAIClientInterface):
                 model=model, temperature=temperature, max_tokens=max_tokens)
 
             messages = [{"role": "user", "content": prompt}]
-            response = openai.ChatCompletion.create(
-                messages=messages, **params)
-            result = response["choices"][0]["message"]["content"].strip(
-                " \n")
-            tokens_used = response["usage"]["total_tokens"]
-            cost = self._calculate_cost(tokens_used,
-                                        OpenAIPricing.CHAT)
-
             ret_val = {
                 "prompt": prompt,
-                "output": result,
-                "tokens_used": tokens_used,
-                "cost": cost
+                **self._create_chat(messages, params, batch=True)
             }
         except Timeout as e:
             logger.exception("OpenAI Completion Timeout", exc_info=e)
@@ -126,7 +359,8 @@ class OpenAIClient(OpenAIClientInterface):
         return ret_val
 
     @retry(OpenAIRateLimitException, tries=RETRY_TRIES,
-           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF)
+           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+           jitter=RETRY_JITTER_RATELIMIT)
     @retry(OpenAITimeoutException, tries=RETRY_TRIES,
            delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
     def execute_chat(self, messages: List[Dict[str, str]],
@@ -138,17 +372,9 @@ class OpenAIClient(OpenAIClientInterface):
         try:
             params = self._build_completions_params(
                 model=model, temperature=temperature, max_tokens=max_tokens)
-            response = openai.ChatCompletion.create(
-                messages=messages, **params)
-            result = response["choices"][0]["message"]["content"].strip(" \n")
-            tokens_used = response["usage"]["total_tokens"]
-            cost = self._calculate_cost(tokens_used,
-                                        OpenAIPricing.CHAT)
             ret_val = {
                 "prompt": messages[-1]["content"],
-                "output": result,
-                "tokens_used": tokens_used,
-                "cost": cost
+                **self._create_chat(messages, params)
             }
         except Timeout as e:
             logger.exception("OpenAI Completion Timeout", exc_info=e)
@@ -161,35 +387,104 @@ class OpenAIClient(OpenAIClientInterface):
 
         return ret_val
 
-    def _build_embeddings_params(self) -> dict:
-        """Creates the parameters for the OpenAI API Embeddings request."""
-        params = {
-            "api_key": self.embeddings_api_key,
-            "api_type": self.embeddings_api_type,
-            "api_base": self.embeddings_api_base,
-            "api_version": self.embeddings_api_version,
+    def execute_chat_stream(self, messages: List[Dict[str, str]],
+                            model: str = None,
+                            temperature: int = DEFAULT_TEMPERATURE,
+                            max_tokens: int = DEFAULT_MAX_TOKENS,
+                            ) -> Iterator[dict]:
+        """Execute an OpenAI chat, yielding {"delta": text} as tokens arrive
+        and finally the full response with "done" set. Streamed responses
+        carry no usage, so tokens are counted locally. Tokens already sent
+        to the caller can't be taken back, so nothing is retried. Streams
+        answer interactive queries, so they are never cached."""
+        params = self._build_completions_params(
+            model=model, temperature=temperature, max_tokens=max_tokens)
+        prompt = messages[-1]["content"]
+
+        estimated_tokens = self._estimate_chat_tokens(messages, params)
+        parts = []
+        try:
+            if self.chat_rate_limiter is not None:
+                self.chat_rate_limiter.acquire(estimated_tokens)
+            with _using_session(self.session):
+                response = openai.ChatCompletion.create(
+                    messages=messages, stream=True, **params)
+            for chunk in response:
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield {"delta": delta}
+        except Timeout as e:
+            logger.exception("OpenAI Completion Timeout", exc_info=e)
+            raise OpenAITimeoutException(
+                detail="OpenAI could not complete the requests in time")
+        except RateLimitError as e:
+            logger.exception("OpenAI Completion hit Rate Limit", exc_info=e)
+            if self.chat_rate_limiter is not None:
+                self.chat_rate_limiter.throttle(_retry_after(e))
+            raise OpenAIRateLimitException(
+                detail="OpenAI rate limit exceeded, please try again later")
+
+        output = "".join(parts)
+        tokens_used = (estimated_tokens - params["max_tokens"]
+                       + token_count(output))
+        if self.chat_rate_limiter is not None:
+            self.chat_rate_limiter.record(estimated_tokens, tokens_used)
+        output = output.strip(" \n")
+        yield {
+            "done": True,
+            "prompt": prompt,
+            "output": output,
+            "tokens_used": tokens_used,
+            "cost": self._calculate_cost(tokens_used, OpenAIPricing.CHAT),
+            "cached": False
         }
-        if self.completions_api_type == AZURE_API_TYPE:
-            params["engine"] = self.embeddings_model
-        else:
-            params["model"] = self.embeddings_model
-        return params
+
+    def _create_embeddings(self,
+                           texts: List[str]) -> Tuple[List[List[float]], int]:
+        """Generate embeddings for texts, only sending texts missing from
+        the cache to OpenAI. Vectors are rounded to float32, which is how
+        the cache stores them.
+        Returns the embeddings in input order and the tokens used."""
+        embeds = {}
+        keys = {}
+        if self.cache is not None:
+            keys = {text: self._embeds_cache_key(text) for text in texts}
+            cached = self.cache.get_many(list(keys.values()))
+            embeds = self._embeds_from_cache(keys, cached)
+
+        misses = list(dict.fromkeys(
+            text for text in texts if text not in embeds))
+        tokens_used = 0
+        if misses:
+            params = self._build_embeddings_params()
+            result = self._send(self.embeds_rate_limiter,
+                                lambda: sum(token_counts(misses)),
+                                openai.Embedding.create,
+                                input=misses, **params)
+            tokens_used = result["usage"]["total_tokens"]
+            for record in result['data']:
+                embeds[misses[record['index']]] = _float32(
+                    record['embedding'])
+
+            if self.cache is not None:
+                self.cache.set_many(self._embeds_to_cache(keys, embeds,
+                                                          misses))
+        return [embeds[text] for text in texts], tokens_used
 
     @retry(OpenAIRateLimitException, tries=RETRY_TRIES,
-           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF)
+           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+           jitter=RETRY_JITTER_RATELIMIT)
     @retry(OpenAITimeoutException, tries=RETRY_TRIES,
            delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
     def execute_embeds(self, text: str) -> dict:
         """Generate embedding vector for the input text"""
         try:
-            params = self._build_embeddings_params()
-            result = openai.Embedding.create(input=text, **params)
-
-            tokens_used = result["usage"]["total_tokens"]
+            embeds, tokens_used = self._create_embeddings([text])
             cost = self._calculate_cost(tokens_used, OpenAIPricing.EMBEDDINGS)
 
             ret_val = {
-                "embedding": result['data'][0]['embedding'],
+                "embedding": embeds[0],
                 "tokens_used": tokens_used,
                 "cost": cost
             }
@@ -205,7 +500,8 @@ class OpenAIClient(OpenAIClientInterface):
         return ret_val
 
     @retry(OpenAIRateLimitException, tries=RETRY_TRIES,
-           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF)
+           delay=RETRY_DELAY_RATELIMIT, backoff=RETRY_BACKOFF,
+           jitter=RETRY_JITTER_RATELIMIT)
     @retry(OpenAITimeoutException, tries=RETRY_TRIES,
            delay=RETRY_DELAY_TIMEOUT, backoff=RETRY_BACKOFF)
     def execute_embeds_batch(self,
@@ -219,34 +515,10 @@ class OpenAIClient(OpenAIClientInterface):
         """
         try:
             if request_list:
-                params = self._build_embeddings_params()
-                result = openai.Embedding.create(input=request_list, **params)
-                embeds = [record['embedding'] for record in result['data']]
-
-                meta = []
-                for line in request_list:
-                    data = {'text': line}
-                    if object_id is not None:
-                        data['object_id'] = object_id
-                    if object_desc is not None:
-                        data['object_desc'] = object_desc
-                    meta.append(data)
-
-                end_index = start_index + len(request_list)
-                request_ids = [f'{str(object_id)}-{str(n)}'
-                               for n in range(start_index, end_index)]
-                to_upsert = zip(request_ids, embeds, meta)
-
-                tokens_used = result["usage"]["total_tokens"]
-                cost = self._calculate_cost(tokens_used,
-                                            OpenAIPricing.EMBEDDINGS)
-
-                ret_val = {
-                    "upsert_list": list(to_upsert),
-                    "request_ids": request_ids,
-                    "tokens_used": tokens_used,
-                    "cost": cost
-                }
+                embeds, tokens_used = self._create_embeddings(request_list)
+                ret_val = self._embeds_batch_result(
+                    request_list, embeds, tokens_used,
+                    object_id, object_desc, start_index)
         except Timeout as e:
             logger.exception("OpenAI Embedding Batch Timeout", exc_info=e)
             raise OpenAITimeoutException(
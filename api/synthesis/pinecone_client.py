@@ -11,6 +11,9 @@ RETRY_TRIES = 3
 RETRY_DELAY = 5
 RETRY_BACKOFF = 2
 
+# Pinecone recommends upserting at most 100 vectors per request
+UPSERT_BATCH_SIZE = 100
+
 logger = logging.getLogger(__name__)
 
 
@@ -53,7 +56,9 @@ class PineconeClient(EmbedsClientInterface):
     def upsert(self, vectors: List[dict]):
         """Upsert the vectors into the index."""
         logger.info(f"Upserting to Pinecone: {len(vectors)} vectors")
-        self.index.upsert(vectors=vectors, namespace=self.namespace)
+        for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            self.index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE],
+                              namespace=self.namespace)
 
     def search(self, id: int, embedding: List[int], limit: int = 5) -> dict:
         """Retrieve the closest embeds for the input embedding"""
@@ -67,6 +72,24 @@ class PineconeClient(EmbedsClientInterface):
         )
         return query_result
 
+    def search_many(self, id: int, embeddings: List[List[float]],
+                    limit: int = 5) -> List[dict]:
+        """Retrieve the closest embeds for each of the input embeddings
+        using a single multi-query request"""
+        if not embeddings:
+            return []
+        logger.info(f"Executing Pinecone multi-query search of "
+                    f"{len(embeddings)} queries for object with ID {id}")
+        query_result = self.index.query(
+            queries=embeddings,
+            filter={"object_id": {"$eq": id}},
+            top_k=limit,
+            include_metadata=True,
+            namespace=self.namespace,
+        )
+        return [{"matches": result["matches"], "namespace": self.namespace}
+                for result in query_result["results"]]
+
     def delete(self, id: int):
         """Delete all embeds for the input id."""
         logger.info(f"Deleting Pinecone object with ID {id}")
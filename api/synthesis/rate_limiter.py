@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from .interfaces import RateLimiterInterface
+
+
+# Seconds of quota that may be spent in a burst. OpenAI enforces its per
+# minute limits over shorter windows, so a full minute is never sent at once
+BURST_SECONDS = 10
+# Used when a rate limit error does not carry a Retry-After header
+DEFAULT_RETRY_AFTER = 5
+# Longest single sleep, so waiting callers recheck the shared state
+MAX_WAIT = 5
+# The sending rate halves on each rate limit error and recovers by this
+# fraction of the quota on each success
+MIN_RATE = 0.1
+RATE_RECOVERY = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+class FileRateLimiter(RateLimiterInterface):
+    """Token buckets for requests and tokens per minute. The buckets live
+    in a small JSON file locked with flock, so every worker process on the
+    host schedules against the same quota."""
+
+    def __init__(self,
+                 path: str,
+                 requests_per_minute: int,
+                 tokens_per_minute: int):
+        self.path = path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_requests = max(1.0, requests_per_minute * BURST_SECONDS / 60)
+        self.max_tokens = max(1.0, tokens_per_minute * BURST_SECONDS / 60)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @contextmanager
+    def _state(self):
+        """Yield the shared state, refilled up to now, holding the file
+        lock until the block exits and the state is written back"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                raw = f.read()
+                now = time.time()
+                state = json.loads(raw) if raw else {
+                    "requests": self.max_requests,
+                    "tokens": self.max_tokens,
+                    "rate": 1.0,
+                    "blocked_until": 0,
+                    "updated": now,
+                }
+                elapsed = max(0.0, now - state["updated"])
+                rate = state["rate"] / 60
+                state["requests"] = min(
+                    self.max_requests,
+                    state["requests"] + elapsed * self.requests_per_minute
+                    * rate)
+                state["tokens"] = min(
+                    self.max_tokens,
+                    state["tokens"] + elapsed * self.tokens_per_minute * rate)
+                state["updated"] = now
+
+                yield state
+
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _wait_time(self, state: dict, tokens: int) -> float:
+        """Seconds until the buckets can cover the request. A request
+        larger than the burst only waits for full buckets, and the
+        overdraft is paid back by the requests after it."""
+        rate = state["rate"] / 60
+        tokens = min(tokens, self.max_tokens)
+        waits = [state["blocked_until"] - state["updated"]]
+        if state["requests"] < 1:
+            waits.append((1 - state["requests"])
+                         / (self.requests_per_minute * rate))
+        if state["tokens"] < tokens:
+            waits.append((tokens - state["tokens"])
+                         / (self.tokens_per_minute * rate))
+        return max(waits)
+
+    def acquire(self, tokens: int):
+        """Block until a request using `tokens` tokens may be sent"""
+        while True:
+            with self._state() as state:
+                wait = self._wait_time(state, tokens)
+                if wait <= 0:
+                    state["requests"] -= 1
+                    state["tokens"] -= tokens
+                    return
+            logger.debug(f"Rate limiter waiting {wait:.2f}s: {self.path}")
+            time.sleep(min(wait, MAX_WAIT))
+
+    def record(self, estimated_tokens: int, tokens_used: int):
+        """Refund the overestimate and recover the sending rate"""
+        with self._state() as state:
+            state["tokens"] = min(
+                self.max_tokens,
+                state["tokens"] + estimated_tokens - tokens_used)
+            state["rate"] = min(1.0, state["rate"] + RATE_RECOVERY)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Pause all workers until Retry-After and halve the rate"""
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        with self._state() as state:
+            state["blocked_until"] = max(state["blocked_until"],
+                                         state["updated"] + retry_after)
+            state["rate"] = max(MIN_RATE, state["rate"] / 2)
+        logger.warning(f"Rate limited for {retry_after}s: {self.path}")
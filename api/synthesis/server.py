@@ -1,41 +1,124 @@
+from django.core.cache import caches
 import logging
+import os
+import threading
 
+from .async_openai_client import AsyncOpenAIClient
+from .async_synthesis import AsyncSynthesis
+from .cache import DjangoCache
 from .interfaces import (
-    OpenAIClientInterface, EmbedsClientInterface, SynthesisInterface
+    AsyncOpenAIClientInterface,
+    AsyncSynthesisInterface,
+    CacheInterface,
+    OpenAIClientInterface,
+    EmbedsClientInterface,
+    RateLimiterInterface,
+    SynthesisInterface
 )
-from .openai_client import OpenAIClient
+from .local_embeds_client import LocalEmbedsClient
+from .openai_client import OpenAIClient, OpenAIClientBase
 from .pinecone_client import PineconeClient
+from .rate_limiter import FileRateLimiter
 from .synthesis import Synthesis
 from app import settings
+from core.http import get_session
 
 
 logger = logging.getLogger(__name__)
 
+# Clients are created on first use rather than at import, so importing the
+# synthesis app (e.g. while a uwsgi worker boots) does no network I/O.
+# The lock keeps concurrent first uses from building a client twice.
+_clients_lock = threading.Lock()
 openai_client = None
+async_openai_client = None
 embeds_client = None
 
 
+def get_llm_cache() -> CacheInterface:
+    """LLM response cache provider"""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return DjangoCache(caches['llm'])
+
+
+def get_rate_limiter(name: str,
+                     requests_per_minute: int,
+                     tokens_per_minute: int) -> RateLimiterInterface:
+    """Rate limiter provider, shared across worker processes by name"""
+    if not settings.OPENAI_RATE_LIMIT_ENABLED:
+        return None
+    return FileRateLimiter(
+        path=os.path.join(settings.OPENAI_RATE_LIMIT_DIR, f"{name}.json"),
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute
+    )
+
+
 def get_openai_client() -> OpenAIClientInterface:
     """OpenAI client provider"""
     global openai_client
-    if openai_client is None:
-        openai_client = OpenAIClient(
-            completions_api_type=settings.OPENAI_COMPLETIONS_API_TYPE,
-            completions_api_key=settings.OPENAI_COMPLETIONS_API_KEY,
-            completions_api_base=settings.OPENAI_COMPLETIONS_API_BASE,
-            completions_api_version=settings.OPENAI_COMPLETIONS_API_VERSION,
-            completions_model=settings.OPENAI_COMPLETIONS_MODEL,
-            embeddings_api_type=settings.OPENAI_EMBEDDINGS_API_TYPE,
-            embeddings_api_key=settings.OPENAI_EMBEDDINGS_API_KEY,
-            embeddings_api_base=settings.OPENAI_EMBEDDINGS_API_BASE,
-            embeddings_api_version=settings.OPENAI_EMBEDDINGS_API_VERSION,
-            embeddings_model=settings.OPENAI_EMBEDDINGS_MODEL
-        )
+    if openai_client is not None:
+        return openai_client
+    with _clients_lock:
+        if openai_client is None:
+            openai_client = _create_openai_client()
     return openai_client
 
 
+def get_async_openai_client() -> AsyncOpenAIClientInterface:
+    """asyncio OpenAI client provider"""
+    global async_openai_client
+    if async_openai_client is not None:
+        return async_openai_client
+    with _clients_lock:
+        if async_openai_client is None:
+            async_openai_client = _create_openai_client(AsyncOpenAIClient)
+    return async_openai_client
+
+
+def _create_openai_client(
+        client_class: type = OpenAIClient) -> OpenAIClientBase:
+    return client_class(
+        completions_api_type=settings.OPENAI_COMPLETIONS_API_TYPE,
+        completions_api_key=settings.OPENAI_COMPLETIONS_API_KEY,
+        completions_api_base=settings.OPENAI_COMPLETIONS_API_BASE,
+        completions_api_version=settings.OPENAI_COMPLETIONS_API_VERSION,
+        completions_model=settings.OPENAI_COMPLETIONS_MODEL,
+        embeddings_api_type=settings.OPENAI_EMBEDDINGS_API_TYPE,
+        embeddings_api_key=settings.OPENAI_EMBEDDINGS_API_KEY,
+        embeddings_api_base=settings.OPENAI_EMBEDDINGS_API_BASE,
+        embeddings_api_version=settings.OPENAI_EMBEDDINGS_API_VERSION,
+        embeddings_model=settings.OPENAI_EMBEDDINGS_MODEL,
+        cache=get_llm_cache(),
+        chat_rate_limiter=get_rate_limiter(
+            f"chat-{settings.OPENAI_COMPLETIONS_API_TYPE}",
+            settings.OPENAI_CHAT_RPM,
+            settings.OPENAI_CHAT_TPM),
+        embeds_rate_limiter=get_rate_limiter(
+            f"embeddings-{settings.OPENAI_EMBEDDINGS_API_TYPE}",
+            settings.OPENAI_EMBEDDINGS_RPM,
+            settings.OPENAI_EMBEDDINGS_TPM),
+        session=get_session('openai', settings.OPENAI_READ_TIMEOUT),
+        request_timeout=(settings.HTTP_CONNECT_TIMEOUT,
+                         settings.OPENAI_READ_TIMEOUT)
+    )
+
+
 def get_embeds_client() -> EmbedsClientInterface:
     """Embeds client provider"""
+    global embeds_client
+    if embeds_client is not None:
+        return embeds_client
+    with _clients_lock:
+        if embeds_client is None:
+            embeds_client = _create_embeds_client()
+    return embeds_client
+
+
+def _create_embeds_client() -> EmbedsClientInterface:
+    if settings.EMBEDS_CLIENT == 'local':
+        return LocalEmbedsClient()
 
     # TODO: This is annoying. Currently all our prod & dev users
     #       are using a namespace starting with "dev-"
@@ -44,24 +127,34 @@ def get_embeds_client() -> EmbedsClientInterface:
     else:
         namespace = 'dev'
 
-    global embeds_client
-    if embeds_client is None:
-        embeds_client = PineconeClient(
-            api_key=settings.PINECONE_API_KEY,
-            index_name=settings.PINECONE_INDEX,
-            region=settings.PINECONE_REGION,
-            dimensions=settings.PINECONE_DIMENSIONS,
-            namespace=namespace
-        )
-    return embeds_client
+    return PineconeClient(
+        api_key=settings.PINECONE_API_KEY,
+        index_name=settings.PINECONE_INDEX,
+        region=settings.PINECONE_REGION,
+        dimensions=settings.PINECONE_DIMENSIONS,
+        namespace=namespace
+    )
 
 
 def get_synthesis(
-    openai_client: OpenAIClientInterface = get_openai_client(),
-    embeds_client: EmbedsClientInterface = get_embeds_client()
+    openai_client: OpenAIClientInterface = None,
+    embeds_client: EmbedsClientInterface = None
 ) -> SynthesisInterface:
-    """Synthesis instance provider"""
+    """Synthesis instance provider. Clients not passed in are taken from
+    their providers, creating them on first use"""
     return Synthesis(
-        openai_client=openai_client,
-        embeds_client=embeds_client
+        openai_client=openai_client or get_openai_client(),
+        embeds_client=embeds_client or get_embeds_client()
+    )
+
+
+def get_async_synthesis(
+    openai_client: AsyncOpenAIClientInterface = None,
+    embeds_client: EmbedsClientInterface = None
+) -> AsyncSynthesisInterface:
+    """asyncio Synthesis instance provider, for use from async views served
+    by the ASGI application"""
+    return AsyncSynthesis(
+        openai_client=openai_client or get_async_openai_client(),
+        embeds_client=embeds_client or get_embeds_client()
     )
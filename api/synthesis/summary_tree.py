@@ -0,0 +1,117 @@
+import logging
+import math
+from typing import List
+
+from .citations import CitationMatrix
+from .domains import SynthesisResult, SynthesisResultOutput
+from .utils import indexed_line, split_and_extract_indices, token_counts
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on reduce levels. Each level must also use fewer requests
+# than the one before, so this only caps very deep trees.
+SUMMARY_MAX_LEVELS = 8
+
+
+class SummaryTree:
+    """Reduces notes to a summary with a tree of summary requests.
+
+    Each level packs the current notes, as indexed lines, into requests of
+    up to `max_input_tokens` tokens, so the fan-in of a request follows the
+    token budget. The requests of a level are independent and can run in
+    parallel. Their output becomes the notes of the next level until a
+    single request covers every note.
+
+    The citations of every level, from its notes to the notes of the level
+    before, are kept in `citations` as CitationMatrix. `references` maps
+    the current notes to transcript lines and is composed with each new
+    level, so no per-note loops are needed. The kept levels can also be
+    composed to trace how a citation drifted between levels.
+
+    Usage:
+        tree = SummaryTree(notes, max_input_tokens)
+        while tree.chunks:
+            tree.reduce([summarize(chunk) for chunk in tree.chunks])
+        result = tree.result()
+    """
+
+    def __init__(self, notes: List[SynthesisResultOutput],
+                 max_input_tokens: int):
+        self.max_input_tokens = max(1, max_input_tokens)
+        self.texts = [note['text'] for note in notes]
+        references = [note['references'] for note in notes]
+        self.references = CitationMatrix.from_lists(
+            references,
+            max((max(refs) for refs in references if refs), default=-1) + 1)
+        self.citations: List[CitationMatrix] = []
+        self.cost = 0
+        self.prompt = ""
+        self.levels = 0
+        self.chunks = self._pack()
+
+    def _pack(self) -> List[str]:
+        """Pack the notes into requests of at most max_input_tokens tokens,
+        spread evenly so the requests of a level take similar time. A note
+        over the budget on its own gets a request to itself."""
+        lines = [indexed_line(i, text) for i, text in enumerate(self.texts)]
+        # Joining adds a newline token per line
+        tokens = [count + 1 for count in token_counts(lines)]
+        total = sum(tokens)
+        if total == 0:
+            return []
+        target = total / math.ceil(total / self.max_input_tokens)
+
+        chunks, cur_lines, cur_tokens = [], [], 0
+        for line, count in zip(lines, tokens):
+            if cur_lines and (cur_tokens + count > self.max_input_tokens
+                              or cur_tokens >= target):
+                chunks.append("\n".join(cur_lines))
+                cur_lines, cur_tokens = [], 0
+            cur_lines.append(line)
+            cur_tokens += count
+        chunks.append("\n".join(cur_lines))
+        return chunks
+
+    def reduce(self, chunk_results: List[dict]):
+        """Replace the notes with the summaries of the current chunks and
+        pack the next level. `chunks` is left empty once the tree is done,
+        either because one request covered every note or because a level
+        did not need fewer requests than the last."""
+        texts, cited = [], []
+        for result in chunk_results:
+            self.cost += result["cost"]
+            self.prompt = result["prompt"]
+            for item in split_and_extract_indices(result["output"],
+                                                  len(self.texts)):
+                texts.append(item['text'])
+                cited.append(item['references'])
+        level = CitationMatrix.from_lists(cited, len(self.texts))
+        self.citations.append(level)
+        self.references = level.compose(self.references)
+        self.texts = texts
+        self.levels += 1
+
+        if len(self.chunks) <= 1:
+            self.chunks = []
+            return
+        chunks = self._pack()
+        if len(chunks) >= len(self.chunks) or \
+                self.levels >= SUMMARY_MAX_LEVELS:
+            logger.warning(
+                f"Summary did not converge after {self.levels} levels "
+                f"({len(self.chunks)} requests, then {len(chunks)}), "
+                f"returning the notes of the last level")
+            chunks = []
+        self.chunks = chunks
+
+    def result(self) -> SynthesisResult:
+        """Return the summary once the tree is reduced"""
+        data: SynthesisResult = {
+            "output": [{'text': text, 'references': references}
+                       for text, references in zip(
+                           self.texts, self.references.to_lists())],
+            "prompt": self.prompt,
+            "cost": self.cost
+        }
+        return data
@@ -1,12 +1,18 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import copy
+from functools import partial, wraps
 import json
 import logging
-from typing import List
+import time
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 from .domains import (
     SynthesisResult,
     SynthesisResultOutput,
     EmbedsResult,
-    MetadataResult
+    MetadataResult,
+    QueryEmbedsResult,
+    StreamEvent
 )
 from .interfaces import (
     OpenAIClientInterface, EmbedsClientInterface, SynthesisInterface
@@ -19,27 +25,58 @@ from .prompts import (
     CONCISE_PROMPT_TEMPLATE,
     QUERY_MESSAGE_TEMPLATE,
 )
+from .summary_tree import SummaryTree
 from .utils import (
     token_count,
+    token_counts,
+    split_text_by_tokens,
     split_indexed_lines_into_chunks,
     split_indexed_transcript_lines_into_chunks,
-    split_and_extract_indices
+    split_and_extract_indices,
+    CitationStreamParser
 )
 from core.models import AppSettings
+from django.db import connections
 
 
 logger = logging.getLogger(__name__)
 
+# OpenAI embeddings API limits: tokens per input, and tokens and inputs
+# summed across a single request
+EMBEDS_MAX_INPUT_TOKENS = 8191
+EMBEDS_MAX_REQUEST_TOKENS = 300000
+EMBEDS_MAX_REQUEST_INPUTS = 2048
+# Embedding requests kept in flight while earlier batches are upserted
+EMBEDS_PIPELINE_DEPTH = 2
+
+
+def _closing_connections(func: Callable) -> Callable:
+    """Wrap func to run on a worker thread, closing the DB connections it
+    opened there, e.g. through a database cache, which Django would
+    otherwise leave open once the thread is gone"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return wrapper
 
-# TODO: Split into separate components for Summary, Concise and Embeds
-class Synthesis(SynthesisInterface):
 
-    def __init__(self,
-                 openai_client: OpenAIClientInterface,
-                 embeds_client: EmbedsClientInterface):
-        self.openai_client = openai_client
-        self.embeds_client = embeds_client
+def _map_in_order(func: Callable, items: list, max_workers: int) -> list:
+    """Apply func to every item using up to max_workers threads and
+    return the results in the same order as items"""
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(_closing_connections(func), items))
+
 
+# TODO: Split into separate components for Summary, Concise and Embeds
+class SynthesisBase:
+    """Pipeline steps that send no requests, shared by Synthesis and
+    AsyncSynthesis"""
     def _get_empty_transcript_metadata(
             self,
             cost: float,
@@ -53,6 +90,150 @@ class Synthesis(SynthesisInterface):
             "message": message
         }
 
+    def _fits_single_call(self, indexed_transcript: str,
+                          line_tokens: Optional[List[int]],
+                          app_settings: AppSettings) -> bool:
+        """Whether the transcript is short enough to summarize with a
+        single request instead of summarizing chunks first"""
+        max_tokens = app_settings.single_call_max_tokens_summary
+        if max_tokens <= 0:
+            return False
+        if line_tokens is not None:
+            tokens = sum(line_tokens)
+        else:
+            tokens = token_count(indexed_transcript)
+        return tokens <= max_tokens
+
+    def _single_call_summary(self, result: dict,
+                             n_lines: Optional[int] = None
+                             ) -> SynthesisResult:
+        """Build the summary of a transcript summarized in one request.
+        References already index the transcript lines, so nothing needs
+        to be composed."""
+        results, cost, _ = self._collect_chunk_results([result], n_lines)
+        data: SynthesisResult = {
+            "output": results,
+            "prompt": result["prompt"],
+            "cost": cost,
+            "metadata": self._get_empty_transcript_metadata(
+                cost=0, message='')
+        }
+        return data
+
+    def _collect_chunk_results(
+        self, chunk_results: List[dict], n_lines: Optional[int] = None
+    ) -> Tuple[List[SynthesisResultOutput], float, List[str]]:
+        """Split every chunk output into sentences with their references,
+        dropping references past the n_lines transcript lines.
+        Returns the sentences in order, the total cost and the prompts."""
+        results = []
+        prompts = []
+        cost = 0
+        for result in chunk_results:
+            cost += result["cost"]
+            prompts.append(result["prompt"])
+            results.extend(
+                split_and_extract_indices(result["output"], n_lines))
+        return results, cost, prompts
+
+    def _create_batches_for_embeds(self,
+                                   content_list: List[str],
+                                   max_input_tokens: int,
+                                   max_request_tokens: int,
+                                   max_request_inputs: int
+                                   ) -> List[List[str]]:
+        """
+        Split the content_list into the fewest batches that fit the OpenAI
+        Embeddings API limits. Content longer than max_input_tokens is
+        split into several inputs rather than rejected by the API.
+        """
+        inputs = []
+        for content, tokens in zip(content_list, token_counts(content_list)):
+            if tokens <= max_input_tokens:
+                inputs.append((content, tokens))
+                continue
+            pieces = split_text_by_tokens(content, max_input_tokens)
+            inputs.extend(zip(pieces, token_counts(pieces)))
+
+        batches = []
+        request_list = []
+        request_tokens = 0
+        for content, tokens in inputs:
+            if request_list and (
+                request_tokens + tokens > max_request_tokens
+                or len(request_list) == max_request_inputs
+            ):
+                batches.append(request_list)
+                request_list = []
+                request_tokens = 0
+
+            request_list.append(content)
+            request_tokens += tokens
+
+        if request_list:
+            batches.append(request_list)
+
+        return batches
+
+    def embeddings_model(self) -> str:
+        """Name of the model embed_queries uses"""
+        return self.openai_client.embeddings_model or ""
+
+    def _query_results(self,
+                       query_results: List[Union[dict, Exception]],
+                       costs: List[float]
+                       ) -> List[Union[SynthesisResult, Exception]]:
+        """Split each answer into cited sentences, adding the embed cost.
+        Failed answers are passed through."""
+        results: List[Union[SynthesisResult, Exception]] = []
+        for query_result, cost in zip(query_results, costs):
+            if isinstance(query_result, Exception):
+                results.append(query_result)
+                continue
+            results.append({
+                "output": split_and_extract_indices(query_result["output"]),
+                "prompt": query_result["prompt"],
+                "cost": cost + query_result["cost"]
+            })
+        return results
+
+    def _query_messages(self,
+                        query: str,
+                        search_results: dict,
+                        max_input_tokens: int) -> List[dict]:
+        """Build the chat messages for a query, adding matched sections
+        of the transcript as context up to max_input_tokens."""
+        base_prompt = "".join(message["content"]
+                              for message in QUERY_MESSAGE_TEMPLATE)
+        total_tokens = token_count(base_prompt)
+        total_tokens += token_count(query.strip())
+
+        # Build the context string, but ensure OpenAI Completion
+        # input token count doesn't exceed max_input_tokens_query
+        context = ""
+        separator = "-" * 4
+        for match in search_results['matches']:
+            section = match['metadata']['text']
+            total_tokens += token_count(section)
+            if total_tokens < max_input_tokens:
+                context = f"{context}\n{separator}\n{section.strip()}"
+        context = f"{context}\n{separator}"
+
+        messages = copy.deepcopy(QUERY_MESSAGE_TEMPLATE)
+        messages[-1]["content"] = messages[-1]["content"].format(
+            query=query.strip(),
+            context=context)
+        return messages
+
+
+class Synthesis(SynthesisBase, SynthesisInterface):
+
+    def __init__(self,
+                 openai_client: OpenAIClientInterface,
+                 embeds_client: EmbedsClientInterface):
+        self.openai_client = openai_client
+        self.embeds_client = embeds_client
+
     def _openai_transcript_metadata(
             self,
             synthesis_result: List[SynthesisResultOutput]
@@ -93,7 +274,8 @@ class Synthesis(SynthesisInterface):
             return self._get_empty_transcript_metadata(cost, str(e))
 
     def summarize_transcript(
-            self, indexed_transcript: str, interviewee: str
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> SynthesisResult:
         """
         Summarize an indexed transcript and return reference indices
@@ -103,33 +285,32 @@ class Synthesis(SynthesisInterface):
             [{"text": "The quick brown fox jumps", "references": [(16, 19)]},
              {"text": "over the lazy dog", "references": [(4, 9), (14)]}]
         """
+        app_settings = AppSettings.get()
+        if self._fits_single_call(indexed_transcript, line_tokens,
+                                  app_settings):
+            return self._single_call_summary(self._openai_summarize_full(
+                indexed_transcript, app_settings.llm_summary_final),
+                indexed_transcript.count("\n") + 1)
+
         chunks = split_indexed_lines_into_chunks(
-            indexed_transcript, AppSettings.get().chunk_min_tokens_summary)
-        results = []
-        cost = 0
-        for chunk in chunks:
-            chunk_str = "\n".join(chunk)
-            result = self._openai_summarize_chunk(chunk_str)
-            summary = result["output"]
-            cost += result["cost"]
-            summary_sentences_and_indices = split_and_extract_indices(summary)
-            results.extend(summary_sentences_and_indices)
-        n = len(results)
-        indexed_transcript = "\n".join([f"[{i}] {results[i]['text']}"
-                                        for i in range(n)])
-        temp_result = self._summarize_text(indexed_transcript)
-        summary_results, summary_cost = temp_result['output'],\
-            temp_result['cost']
-        cost += summary_cost
-        final_results: list[SynthesisResultOutput] = []
-        for i in range(len(summary_results)):
-            item = summary_results[i]
-            temp = set()
-            for num in item['references']:
-                temp.update(results[num]['references'])
-            final_results.append({
-                'text': item['text'],
-                'references': list(temp)})
+            indexed_transcript, app_settings.chunk_min_tokens_summary,
+            line_tokens)
+
+        # Chunk summaries are independent so request them concurrently.
+        # Settings are read up front so workers only touch the DB through
+        # the LLM cache, and close those connections when done.
+        summarize_chunk = partial(self._openai_summarize_chunk,
+                                  model=app_settings.llm_summary_chunk)
+        chunk_results = _map_in_order(
+            summarize_chunk,
+            ["\n".join(chunk) for chunk in chunks],
+            app_settings.max_concurrency_summary)
+
+        results, cost, _ = self._collect_chunk_results(
+            chunk_results, indexed_transcript.count("\n") + 1)
+        temp_result = self._summarize_text(results, app_settings)
+        cost += temp_result['cost']
+        final_results = temp_result['output']
 
         # metadata = self._openai_transcript_metadata(final_results)
         metadata = self._get_empty_transcript_metadata(cost=0, message='')
@@ -142,72 +323,33 @@ class Synthesis(SynthesisInterface):
         return data
 
     def _summarize_text(
-        self, text: str
+        self, notes: List[SynthesisResultOutput], app_settings: AppSettings
     ) -> SynthesisResult:
-        """Summarize indexed notes and return reference indices
-        for phrases and sentences in the final summary"""
-        chunks = split_indexed_lines_into_chunks(
-            text, AppSettings.get().chunk_min_tokens_summary)
-        last_prompt = ""
-        results = []
-        cost = 0
-        for chunk in chunks:
-            result = self._openai_summarize_full("\n".join(chunk))
-            summary = result["output"]
-            cost += result["cost"]
-            last_prompt = result["prompt"]
-            summary_sentences_and_indices = split_and_extract_indices(summary)
-            results.extend(summary_sentences_and_indices)
-        n = len(results)
-        word_count = 0
-        for item in results:
-            word_count += len(item['text'].split())
-
-        if len(chunks) == 1:
-            # If we've only had to summarize a single chunk, we're done
-            data: SynthesisResult = {
-                "output": results,
-                "prompt": last_prompt,
-                "cost": cost
-            }
-        else:
-            # Solve recursively
-            text = "\n".join([f"[{i}] {results[i]['text']}" for i in range(n)])
-            temp_result = self._summarize_text(text)
-            summary_results, summary_cost = temp_result['output'],\
-                temp_result['cost']
-            cost += summary_cost
-            final_results: list[SynthesisResultOutput] = []
-            for i in range(len(summary_results)):
-                item = summary_results[i]
-                temp = set()
-                for num in item['references']:
-                    temp.update(results[num]['references'])
-                final_results.append({
-                    'text': item['text'],
-                    'references': list(temp)
-                })
-            data: SynthesisResult = {
-                "output": final_results,
-                "prompt": temp_result['prompt'],
-                "cost": cost
-            }
-        return data
-
-    def _openai_summarize_chunk(self, text: str) -> dict:
+        """Reduce notes to a final summary with reference indices into the
+        transcript, summarizing the requests of each level concurrently"""
+        summarize_full = partial(self._openai_summarize_full,
+                                 model=app_settings.llm_summary_final)
+        tree = SummaryTree(notes, app_settings.max_input_tokens_summary)
+        while tree.chunks:
+            tree.reduce(_map_in_order(summarize_full, tree.chunks,
+                                      app_settings.max_concurrency_summary))
+        return tree.result()
+
+    def _openai_summarize_chunk(self, text: str, model: str) -> dict:
         """Generate a summary for a chunk of the transcript."""
         prompt = SUMMARY_CHUNK_PROMPT_TEMPLATE.format(text=text.strip())
         return self.openai_client.execute_chat_completion(
-            prompt, model=AppSettings.get().llm_summary_chunk)
+            prompt, model=model)
 
-    def _openai_summarize_full(self, text: str) -> dict:
+    def _openai_summarize_full(self, text: str, model: str) -> dict:
         """Generate a summary from a combined transcript summary."""
         prompt = SUMMARY_PROMPT_TEMPLATE.format(text=text.strip())
         return self.openai_client.execute_chat_completion(
-            prompt, model=AppSettings.get().llm_summary_final)
+            prompt, model=model)
 
     def concise_transcript(
-            self, indexed_transcript: str, interviewee: str
+            self, indexed_transcript: str, interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> SynthesisResult:
         """
         Convert transcript to concise version and return reference indices
@@ -217,21 +359,25 @@ class Synthesis(SynthesisInterface):
             [{"text": "Andy: Life is good.", "references": [(16, 19)]},
              {"text": "John: It sure is!", "references": [(4, 9), (14)]}]
         """
+        app_settings = AppSettings.get()
         chunks = split_indexed_transcript_lines_into_chunks(
             indexed_transcript,
             interviewee,
-            AppSettings.get().chunk_min_tokens_concise
+            app_settings.chunk_min_tokens_concise,
+            line_tokens
         )
-        results = []
-        prompts = []
-        cost = 0
-        for chunk in chunks:
-            result = self._openai_concise_chunk("\n".join(chunk))
-            concise = result["output"]
-            cost += result["cost"]
-            prompts.append(result["prompt"])
-            sentences_and_indices = split_and_extract_indices(concise)
-            results.extend(sentences_and_indices)
+
+        # The pool is scoped to this transcript so the cap bounds how much
+        # of the shared OpenAI quota a single long transcript can take
+        concise_chunk = partial(self._openai_concise_chunk,
+                                model=app_settings.llm_concise)
+        chunk_results = _map_in_order(
+            concise_chunk,
+            ["\n".join(chunk) for chunk in chunks],
+            app_settings.max_concurrency_concise)
+
+        results, cost, prompts = self._collect_chunk_results(
+            chunk_results, indexed_transcript.count("\n") + 1)
 
         separator = f"\n\n{'-' * 50}\n\n"
         data: SynthesisResult = {
@@ -241,24 +387,26 @@ class Synthesis(SynthesisInterface):
         }
         return data
 
-    def _openai_concise_chunk(self, text: str) -> dict:
+    def _openai_concise_chunk(self, text: str, model: str) -> dict:
         """Generate a concise transcript for a chunk of the transcript."""
         prompt = CONCISE_PROMPT_TEMPLATE.format(text=text.strip())
         return self.openai_client.execute_chat_completion(
-            prompt, model=AppSettings.get().llm_concise)
+            prompt, model=model)
 
     def embed_transcript(
             self,
             transcript_id: int,
             transcript_title: str,
             indexed_transcript: str,
-            interviewee: str
+            interviewee: str,
+            line_tokens: Optional[List[int]] = None
     ) -> EmbedsResult:
         """Generate embeds for the transcript"""
         chunks = split_indexed_transcript_lines_into_chunks(
             indexed_transcript,
             interviewee,
-            AppSettings.get().chunk_min_tokens_query
+            AppSettings.get().chunk_min_tokens_query,
+            line_tokens
         )
 
         content_list = []
@@ -274,72 +422,98 @@ class Synthesis(SynthesisInterface):
                                  transcript_title: str,
                                  content_list: List[str]) -> dict:
         """Generate embeds for the input strings using Open AI."""
-
-        # TODO: OpenAI only allows max 8192 tokens per API call
-        # For now we'll limit to 20000 characters per API call
-        # But in the future use tiktoken to get exact token count
-        MAX_CHAR_LENGTH = 20000
-
         batches = self._create_batches_for_embeds(
-            content_list, MAX_CHAR_LENGTH
+            content_list,
+            EMBEDS_MAX_INPUT_TOKENS,
+            EMBEDS_MAX_REQUEST_TOKENS,
+            EMBEDS_MAX_REQUEST_INPUTS
         )
+
+        # Ids are assigned from each batch's position up front, so they do
+        # not depend on the order in which embedding requests complete
+        start_indices = []
         start_index = 0
-        cost = 0
         for batch in batches:
+            start_indices.append(start_index)
+            start_index += len(batch)
+
+        @_closing_connections
+        def embed_batch(batch_and_start_index: tuple) -> tuple:
+            batch, start_index = batch_and_start_index
+            started = time.perf_counter()
             result = self.openai_client.execute_embeds_batch(
                 request_list=batch,
                 object_id=transcript_id,
                 object_desc=transcript_title,
                 start_index=start_index
             )
-            upsert_list = result['upsert_list']
-            cost += result['cost']
-            start_index += len(batch)
-
-            self.embeds_client.upsert(vectors=upsert_list)
+            return result, time.perf_counter() - started
 
+        # Embedding requests for the next batches run on worker threads
+        # while this thread upserts the previous batch
+        cost = 0
+        embed_time = upsert_time = 0.0
+        started = time.perf_counter()
+        pending_batches = iter(zip(batches, start_indices))
+        with ThreadPoolExecutor(
+                max_workers=EMBEDS_PIPELINE_DEPTH) as executor:
+            in_flight = deque()
+            for item in pending_batches:
+                in_flight.append(executor.submit(embed_batch, item))
+                if len(in_flight) == EMBEDS_PIPELINE_DEPTH:
+                    break
+            while in_flight:
+                result, elapsed = in_flight.popleft().result()
+                next_item = next(pending_batches, None)
+                if next_item is not None:
+                    in_flight.append(executor.submit(embed_batch, next_item))
+                embed_time += elapsed
+                cost += result['cost']
+
+                upsert_started = time.perf_counter()
+                self.embeds_client.upsert(vectors=result['upsert_list'])
+                upsert_time += time.perf_counter() - upsert_started
+
+        logger.info(f"Embeds pipeline for transcript {transcript_id}: "
+                    f"{len(batches)} batches, {start_index} inputs, "
+                    f"embed {embed_time:.2f}s, upsert {upsert_time:.2f}s, "
+                    f"total {time.perf_counter() - started:.2f}s")
         return {'cost': cost}
 
-    def _create_batches_for_embeds(self,
-                                   content_list: List[str],
-                                   max_length: int
-                                   ) -> List[List[str]]:
-        """
-        Split the content_list into batches of the appropriate
-        size for sending to the OpenAI Embeddings API.
-        """
-        batches = []
-        request_list = []
-        request_length = 0
-        for content in content_list:
-
-            # TODO: This assumes no 'content' string is longer than
-            # max_length. Chunking algorithm needs to factor this limit in
-            if len(content) + request_length > max_length:
-                batches.append(request_list)
-                request_list = []
-                request_length = 0
-
-            request_list.append(content)
-            request_length += len(content)
-
-        if request_list:
-            batches.append(request_list)
-
-        return batches
+    def embed_queries(self, queries: List[str]) -> QueryEmbedsResult:
+        """Generate embeds for the queries"""
+        if not queries:
+            return {"embeddings": [], "cost": 0}
+        result = self.openai_client.execute_embeds_batch(
+            request_list=queries)
+        return {
+            "embeddings": [item[1] for item in result["upsert_list"]],
+            "cost": result["cost"]
+        }
 
     def query_transcript(
-            self, transcript_id: int, query: str) -> SynthesisResult:
+            self,
+            transcript_id: int,
+            query: str,
+            query_embedding: Optional[List[float]] = None
+    ) -> SynthesisResult:
         """Run query against the transcript"""
-        embed_result = self.openai_client.execute_embeds(query)
+        cost = 0
+        if query_embedding is None:
+            embed_result = self.openai_client.execute_embeds(query)
+            query_embedding = embed_result['embedding']
+            cost += embed_result["cost"]
         search_results = self.embeds_client.search(
-            transcript_id, embed_result['embedding']
+            transcript_id, query_embedding
         )
-        query_results = self._openai_query(query, search_results)
+        app_settings = AppSettings.get()
+        query_results = self._openai_query(
+            query, search_results,
+            app_settings.max_input_tokens_query, app_settings.llm_query)
 
         query_output = query_results["output"]
         sentences_and_indices = split_and_extract_indices(query_output)
-        cost = embed_result["cost"] + query_results["cost"]
+        cost += query_results["cost"]
         results: SynthesisResult = {
             "output": sentences_and_indices,
             "prompt": query_results["prompt"],
@@ -347,28 +521,104 @@ class Synthesis(SynthesisInterface):
         }
         return results
 
-    def _openai_query(self, query: str, search_results: dict) -> dict:
-        """Run a query against chosen sections of a transcript."""
-        base_prompt = "".join(message["content"]
-                              for message in QUERY_MESSAGE_TEMPLATE)
-        total_tokens = token_count(base_prompt)
-        total_tokens += token_count(query.strip())
-
-        # Build the context string, but ensure OpenAI Completion
-        # input token count doesn't exceed max_input_tokens_query
-        context = ""
-        separator = "-" * 4
-        for match in search_results['matches']:
-            section = match['metadata']['text']
-            total_tokens += token_count(section)
-            if total_tokens < AppSettings.get().max_input_tokens_query:
-                context = f"{context}\n{separator}\n{section.strip()}"
-        context = f"{context}\n{separator}"
-
-        messages = copy.deepcopy(QUERY_MESSAGE_TEMPLATE)
-        messages[-1]["content"] = messages[-1]["content"].format(
-            query=query.strip(),
-            context=context)
+    def stream_query_transcript(
+            self,
+            transcript_id: int,
+            query: str,
+            query_embedding: Optional[List[float]] = None
+    ) -> Iterator[StreamEvent]:
+        """Run query against the transcript, yielding answer tokens as they
+        arrive and each sentence once its references are complete, then
+        the same result query_transcript returns"""
+        cost = 0
+        if query_embedding is None:
+            embed_result = self.openai_client.execute_embeds(query)
+            query_embedding = embed_result['embedding']
+            cost += embed_result["cost"]
+        search_results = self.embeds_client.search(
+            transcript_id, query_embedding
+        )
+        app_settings = AppSettings.get()
+        messages = self._query_messages(
+            query, search_results, app_settings.max_input_tokens_query)
+
+        parser = CitationStreamParser()
+        sentences_and_indices = []
+        query_results = None
+        for chunk in self.openai_client.execute_chat_stream(
+                messages, model=app_settings.llm_query):
+            if chunk.get("done"):
+                query_results = chunk
+                continue
+            yield {"event": "token", "data": chunk["delta"]}
+            for sentence in parser.feed(chunk["delta"]):
+                sentences_and_indices.append(sentence)
+                yield {"event": "sentence", "data": sentence}
+        for sentence in parser.close():
+            sentences_and_indices.append(sentence)
+            yield {"event": "sentence", "data": sentence}
+
+        cost += query_results["cost"]
+        results: SynthesisResult = {
+            "output": sentences_and_indices,
+            "prompt": query_results["prompt"],
+            "cost": cost
+        }
+        yield {"event": "result", "data": results}
 
-        return self.openai_client.execute_chat(
-            messages, model=AppSettings.get().llm_query)
+    def query_transcript_batch(
+            self,
+            transcript_id: int,
+            queries: List[str],
+            query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Union[SynthesisResult, Exception]]:
+        """Run several queries against the transcript. Missing embeddings
+        are generated in one batch, searched in one multi-query request,
+        and the LLM answers are requested concurrently. A query whose
+        answer fails gets its exception in place of a result."""
+        if query_embeddings is None:
+            query_embeddings = [None] * len(queries)
+        embeddings = list(query_embeddings)
+        costs = [0] * len(queries)
+
+        missing = [i for i in range(len(queries)) if embeddings[i] is None]
+        if missing:
+            embed_result = self.embed_queries([queries[i] for i in missing])
+            for i, embedding in zip(missing, embed_result['embeddings']):
+                embeddings[i] = embedding
+                costs[i] += embed_result['cost'] / len(missing)
+
+        search_results = self.embeds_client.search_many(
+            transcript_id, embeddings)
+
+        app_settings = AppSettings.get()
+
+        def answer(query_and_search_result: tuple
+                   ) -> Union[dict, Exception]:
+            query, search_result = query_and_search_result
+            try:
+                return self._openai_query(
+                    query, search_result,
+                    app_settings.max_input_tokens_query,
+                    app_settings.llm_query)
+            except Exception as e:
+                # One failed answer must not lose the others
+                logger.exception(f"Query '{query}' failed", exc_info=e)
+                return e
+
+        query_results = _map_in_order(
+            answer,
+            list(zip(queries, search_results)),
+            app_settings.max_concurrency_query)
+
+        return self._query_results(query_results, costs)
+
+    def _openai_query(self,
+                      query: str,
+                      search_results: dict,
+                      max_input_tokens: int,
+                      model: str) -> dict:
+        """Run a query against chosen sections of a transcript."""
+        messages = self._query_messages(query, search_results,
+                                        max_input_tokens)
+        return self.openai_client.execute_chat(messages, model=model)
@@ -0,0 +1,143 @@
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import AsyncMock, patch
+from typing import List, Dict
+
+from synthesis.async_openai_client import AsyncOpenAIClient
+from synthesis.async_synthesis import AsyncSynthesis
+from synthesis.cache import DjangoCache
+from synthesis.interfaces import AsyncOpenAIClientInterface
+from synthesis.synthesis import Synthesis
+from synthesis.tests.test_usecases import (
+    MockOpenAIClient, EchoOpenAIClient, MockEmbedsClient, SAMPLE_TRANSCRIPT
+)
+from synthesis.utils import split_text_into_multiple_lines_for_speaker
+from core.models import AppSettings
+
+
+class AsyncMockOpenAIClient(AsyncOpenAIClientInterface):
+    """Awaitable wrapper around a synchronous mock OpenAI client"""
+
+    def __init__(self, client: MockOpenAIClient):
+        self.client = client
+
+    async def execute_chat_completion(self, prompt: str, **kwargs) -> dict:
+        return self.client.execute_chat_completion(prompt, **kwargs)
+
+    async def execute_chat(self, messages: List[Dict[str, str]],
+                           **kwargs) -> dict:
+        return self.client.execute_chat(messages, **kwargs)
+
+    async def execute_embeds(self, text: str) -> dict:
+        return self.client.execute_embeds(text)
+
+    async def execute_embeds_batch(self, request_list: List[str],
+                                   **kwargs) -> dict:
+        return self.client.execute_embeds_batch(request_list, **kwargs)
+
+
+class AsyncSynthesisTests(TestCase):
+    """Test the asyncio Synthesis matches the synchronous pipeline"""
+
+    def setUp(self):
+        lines = split_text_into_multiple_lines_for_speaker(
+            SAMPLE_TRANSCRIPT, 90)
+        self.indexed = "\n".join(f"[{i}] {line['text']}"
+                                 for i, line in enumerate(lines))
+        app_settings = AppSettings.get()
+        app_settings.chunk_min_tokens_summary = 200
+        app_settings.chunk_min_tokens_concise = 200
+        app_settings.single_call_max_tokens_summary = 0
+        app_settings.save()
+
+    def _synthesis(self, client_class=EchoOpenAIClient):
+        client = client_class()
+        return (
+            Synthesis(openai_client=client,
+                      embeds_client=MockEmbedsClient()),
+            AsyncSynthesis(openai_client=AsyncMockOpenAIClient(client),
+                           embeds_client=MockEmbedsClient())
+        )
+
+    async def test_summarize_matches_sync(self):
+        """Test the async summary equals the synchronous one"""
+        synthesis, async_synthesis = self._synthesis(MockOpenAIClient)
+        expected = await sync_to_async(synthesis.summarize_transcript)(
+            self.indexed, "Jason")
+        result = await async_synthesis.summarize_transcript(
+            self.indexed, "Jason")
+        self.assertEqual(result, expected)
+
+    async def test_concise_matches_sync(self):
+        """Test the async concise transcript equals the synchronous one"""
+        synthesis, async_synthesis = self._synthesis()
+        expected = await sync_to_async(synthesis.concise_transcript)(
+            self.indexed, "Jason")
+        result = await async_synthesis.concise_transcript(
+            self.indexed, "Jason")
+        self.assertTrue(len(result['output']) > 1)
+        self.assertEqual(result, expected)
+
+    async def test_query_batch_matches_sync(self):
+        """Test async batched queries equal the synchronous ones"""
+        synthesis, async_synthesis = self._synthesis(MockOpenAIClient)
+        queries = ["What is good?", "What is bad?"]
+        expected = await sync_to_async(synthesis.query_transcript_batch)(
+            1, queries)
+        result = await async_synthesis.query_transcript_batch(1, queries)
+        self.assertEqual(result, expected)
+
+    def test_no_sync_methods(self):
+        """Test the async classes expose no synchronous pipeline methods
+        that would call their coroutines without awaiting them"""
+        for name in ('stream_query_transcript', '_openai_query',
+                     '_openai_concise_chunk', '_openai_embed_and_upsert'):
+            self.assertFalse(hasattr(AsyncSynthesis, name), name)
+        for name in ('execute_chat_stream', '_send', '_create_chat',
+                     '_create_embeddings'):
+            self.assertFalse(hasattr(AsyncOpenAIClient, name), name)
+
+    @patch('synthesis.async_synthesis.EMBEDS_MAX_REQUEST_INPUTS', 2)
+    async def test_embed_transcript_upserts_in_order(self):
+        """Test embedded batches are upserted in order with stable ids"""
+        _, async_synthesis = self._synthesis(MockOpenAIClient)
+        upserted = []
+        with patch.object(MockEmbedsClient, 'upsert',
+                          lambda _, vectors: upserted.extend(vectors)):
+            await async_synthesis.embed_transcript(
+                7, "Title", self.indexed, "Jason")
+        ids = [vector[0] for vector in upserted]
+        self.assertTrue(len(ids) > 0)
+        self.assertEqual(ids, [f"7-{i}" for i in range(len(ids))])
+
+
+CHAT_RESPONSE = {
+    "choices": [{"message": {"content": "Some text (0)"}}],
+    "usage": {"total_tokens": 1000},
+}
+
+
+@patch('synthesis.async_openai_client.openai.ChatCompletion.acreate',
+       new_callable=AsyncMock, return_value=CHAT_RESPONSE)
+class AsyncOpenAIClientTests(SimpleTestCase):
+    """Test the asyncio OpenAI client"""
+
+    def setUp(self):
+        self.client = AsyncOpenAIClient(
+            completions_api_type="open_ai",
+            cache=DjangoCache(LocMemCache(self.id(), {}))
+        )
+
+    async def test_chat_completion(self, patched_acreate):
+        """Test a completion is awaited and answered from the cache after"""
+        first = await self.client.execute_chat_completion(
+            "prompt", model="gpt")
+        second = await self.client.execute_chat_completion(
+            "prompt", model="gpt")
+
+        patched_acreate.assert_awaited_once()
+        self.assertEqual(first['output'], "Some text (0)")
+        self.assertTrue(first['cost'] > 0)
+        self.assertEqual(second['cost'], 0)
+        self.assertEqual(second['prompt'], "prompt")
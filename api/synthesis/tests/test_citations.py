@@ -0,0 +1,45 @@
+import random
+
+from django.test import SimpleTestCase
+
+from synthesis.citations import CitationMatrix
+
+
+def _compose_lists(rows: list, cited_rows: list) -> list:
+    """Reference implementation of the boolean product with sets"""
+    return [sorted(set(col for num in row for col in cited_rows[num]))
+            for row in rows]
+
+
+class CitationMatrixTests(SimpleTestCase):
+    """Test sparse citation matrices"""
+
+    def test_from_lists_sorted_unique(self):
+        matrix = CitationMatrix.from_lists([[3, 1, 3], [], None, [0]], 4)
+        self.assertEqual(matrix.to_lists(), [[1, 3], [], [], [0]])
+        self.assertEqual(matrix.nnz, 3)
+        self.assertEqual(matrix.n_rows, 4)
+
+    def test_from_lists_out_of_range(self):
+        with self.assertRaises(IndexError):
+            CitationMatrix.from_lists([[0, 2]], 2)
+
+    def test_compose_matches_sets(self):
+        rng = random.Random(0)
+        sizes = [60, 25, 10, 4]
+        levels = []
+        for n_rows, n_cols in zip(sizes[1:], sizes):
+            levels.append([rng.sample(range(n_cols), rng.randint(0, 5))
+                           for _ in range(n_rows)])
+
+        expected = levels[0]
+        matrix = CitationMatrix.from_lists(levels[0], sizes[0])
+        for rows, n_cols in zip(levels[1:], sizes[1:]):
+            expected = _compose_lists(rows, expected)
+            matrix = CitationMatrix.from_lists(rows, n_cols).compose(matrix)
+        self.assertEqual(matrix.to_lists(), expected)
+
+    def test_compose_empty(self):
+        empty = CitationMatrix.from_lists([], 0)
+        matrix = CitationMatrix.from_lists([[], []], 0).compose(empty)
+        self.assertEqual(matrix.to_lists(), [[], []])
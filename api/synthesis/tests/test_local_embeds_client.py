@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from synthesis.local_embeds_client import LocalEmbedsClient
+
+
+class LocalEmbedsClientTests(TestCase):
+    """Test the in-process embeds index"""
+
+    def setUp(self):
+        self.client = LocalEmbedsClient()
+        self.client.upsert([
+            ('1-0', [1.0, 0.0], {'text': 'east', 'object_id': 1}),
+            ('1-1', [0.0, 1.0], {'text': 'north', 'object_id': 1}),
+            ('1-2', [1.0, 1.0], {'text': 'north east', 'object_id': 1}),
+            ('2-0', [1.0, 0.0], {'text': 'other', 'object_id': 2}),
+        ])
+
+    def test_search(self):
+        """Test results are ordered by cosine similarity per object"""
+        result = self.client.search(1, [2.0, 0.1], limit=2)
+        self.assertEqual([match['id'] for match in result['matches']],
+                         ['1-0', '1-2'])
+        self.assertEqual(result['matches'][0]['metadata']['text'], 'east')
+
+    def test_search_many(self):
+        """Test several queries are answered together"""
+        results = self.client.search_many(1, [[1.0, 0.0], [0.0, 1.0]],
+                                          limit=1)
+        self.assertEqual([result['matches'][0]['id'] for result in results],
+                         ['1-0', '1-1'])
+
+    def test_upsert_replaces_and_delete(self):
+        """Test upserting an existing id replaces it and delete clears it"""
+        self.client.upsert([
+            ('1-0', [0.0, -1.0], {'text': 'south', 'object_id': 1})])
+        result = self.client.search(1, [0.0, -1.0], limit=1)
+        self.assertEqual(result['matches'][0]['metadata']['text'], 'south')
+
+        self.client.delete(1)
+        self.assertEqual(self.client.search(1, [1.0, 0.0])['matches'], [])
+        self.assertEqual(len(self.client.search(2, [1.0, 0.0])['matches']),
+                         1)
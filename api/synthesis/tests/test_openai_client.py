@@ -0,0 +1,248 @@
+from array import array
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase
+import openai
+from openai import api_requestor
+from openai.error import RateLimitError
+from unittest.mock import MagicMock, patch
+
+from synthesis.cache import DjangoCache
+from synthesis.errors import OpenAIRateLimitException
+from synthesis.openai_client import OpenAIClient
+from synthesis.synthesis import Synthesis
+
+
+def _embeds_response(input, **kwargs):
+    """Fake OpenAI embeddings response with one vector per input"""
+    return {
+        "data": [{"index": i, "embedding": [float(len(text)), 0.5]}
+                 for i, text in enumerate(input)],
+        "usage": {"total_tokens": 10 * len(input)},
+    }
+
+
+CHAT_RESPONSE = {
+    "choices": [{"message": {"content": "Some text (0)"}}],
+    "usage": {"total_tokens": 1000},
+}
+
+
+@patch('synthesis.openai_client.openai.ChatCompletion.create')
+class OpenAIClientSessionTests(SimpleTestCase):
+    """Test the client's session is only used for its own requests"""
+
+    def test_session_scoped_to_client_calls(self, patched_create):
+        """Test requests use the client's session and the openai module
+        is left as it was afterwards"""
+        session = MagicMock()
+        seen = []
+
+        def create(**kwargs):
+            seen.append(getattr(api_requestor._thread_context,
+                                'session', None))
+            return CHAT_RESPONSE
+
+        patched_create.side_effect = create
+        client = OpenAIClient(completions_api_type="open_ai",
+                              session=session)
+        client.execute_chat_completion("prompt", model="gpt")
+
+        self.assertEqual(seen, [session])
+        self.assertIsNot(openai.requestssession, session)
+        self.assertIsNot(getattr(api_requestor._thread_context,
+                                 'session', None), session)
+
+
+@patch('synthesis.openai_client.openai.ChatCompletion.create',
+       return_value=CHAT_RESPONSE)
+class OpenAIClientPipelineCacheTests(TestCase):
+    """Test batch pipelines are answered from the cache when rerun"""
+
+    def test_concise_rerun_answered_from_cache(self, patched_create):
+        """Test rerunning a concise transcript sends no requests"""
+        synthesis = Synthesis(
+            openai_client=OpenAIClient(
+                completions_api_type="open_ai",
+                cache=DjangoCache(LocMemCache(self.id(), {}))),
+            embeds_client=None)
+        indexed = "[0] Jason: I live in Boise\n[1] Interviewer: Why?"
+
+        first = synthesis.concise_transcript(indexed, "Jason")
+        calls = patched_create.call_count
+        second = synthesis.concise_transcript(indexed, "Jason")
+
+        self.assertTrue(calls > 0)
+        self.assertEqual(patched_create.call_count, calls)
+        self.assertEqual(second['cost'], 0)
+        self.assertEqual(second['output'], first['output'])
+
+
+@patch('synthesis.openai_client.openai.ChatCompletion.create',
+       return_value=CHAT_RESPONSE)
+class OpenAIClientCacheTests(SimpleTestCase):
+    """Test the LLM response cache in front of the OpenAI client"""
+
+    def setUp(self):
+        self.client = OpenAIClient(
+            completions_api_type="open_ai",
+            cache=DjangoCache(LocMemCache(self.id(), {}))
+        )
+
+    def test_chat_completion_cache_hit(self, patched_create):
+        """Test a repeated prompt is answered from the cache at no cost"""
+        first = self.client.execute_chat_completion("prompt", model="gpt")
+        second = self.client.execute_chat_completion("prompt", model="gpt")
+
+        patched_create.assert_called_once()
+        self.assertTrue(first['cost'] > 0)
+        self.assertEqual(second['cost'], 0)
+        self.assertEqual(second['output'], first['output'])
+        self.assertEqual(second['prompt'], "prompt")
+
+    def test_chat_cache_keyed_on_params(self, patched_create):
+        """Test changing the model or max tokens misses the cache"""
+        for model, max_tokens in [("gpt", 100), ("gpt-4", 100),
+                                  ("gpt", 200), ("gpt", 100)]:
+            self.client.execute_chat_completion(
+                "prompt", model=model, temperature=0, max_tokens=max_tokens)
+
+        self.assertEqual(patched_create.call_count, 3)
+
+    def test_chat_cache_skips_sampled_and_interactive(self, patched_create):
+        """Test sampled completions and interactive chats are not cached"""
+        messages = [{"role": "user", "content": "prompt"}]
+        for _ in range(2):
+            self.client.execute_chat_completion(
+                "prompt", model="gpt", temperature=0.5)
+            self.client.execute_chat(messages, model="gpt", temperature=0)
+
+        self.assertEqual(patched_create.call_count, 4)
+
+
+@patch('synthesis.openai_client.openai.Embedding.create',
+       side_effect=_embeds_response)
+class OpenAIClientEmbedsCacheTests(SimpleTestCase):
+    """Test the embeddings cache in front of the OpenAI client"""
+
+    def setUp(self):
+        self.client = OpenAIClient(
+            embeddings_api_type="open_ai",
+            cache=DjangoCache(LocMemCache(self.id(), {}))
+        )
+
+    def test_embeds_cache_hit(self, patched_create):
+        """Test a repeated query is embedded once"""
+        first = self.client.execute_embeds("question")
+        second = self.client.execute_embeds("question")
+
+        patched_create.assert_called_once()
+        self.assertEqual(second['embedding'], first['embedding'])
+        self.assertEqual(second['cost'], 0)
+
+    def test_embeds_cached_and_fresh_vectors_match(self, patched_create):
+        """Test a vector is the same float32 value on a miss and a hit"""
+        patched_create.side_effect = lambda input, **kwargs: {
+            "data": [{"index": 0, "embedding": [0.1, 1 / 3]}],
+            "usage": {"total_tokens": 10},
+        }
+        first = self.client.execute_embeds("question")
+        second = self.client.execute_embeds("question")
+
+        patched_create.assert_called_once()
+        self.assertEqual(first['embedding'], second['embedding'])
+        self.assertEqual(first['embedding'],
+                         array('f', [0.1, 1 / 3]).tolist())
+
+    def test_embeds_batch_only_sends_misses(self, patched_create):
+        """Test only uncached texts are sent upstream, in input order"""
+        self.client.execute_embeds("b")
+        result = self.client.execute_embeds_batch(
+            ["a", "b", "cc"], object_id=1)
+
+        self.assertEqual(patched_create.call_args.kwargs['input'],
+                         ["a", "cc"])
+        self.assertEqual([item[1][0] for item in result['upsert_list']],
+                         [1.0, 1.0, 2.0])
+        self.assertEqual(result['request_ids'], ['1-0', '1-1', '1-2'])
+        self.assertEqual(result['tokens_used'], 20)
+
+
+@patch('retry.api.time.sleep')
+@patch('synthesis.openai_client.token_count', return_value=10)
+class OpenAIClientRateLimiterTests(SimpleTestCase):
+    """Test the OpenAI client schedules requests through the rate limiter"""
+
+    def setUp(self):
+        self.rate_limiter = MagicMock()
+        self.client = OpenAIClient(
+            completions_api_type="open_ai",
+            chat_rate_limiter=self.rate_limiter
+        )
+
+    @patch('synthesis.openai_client.openai.ChatCompletion.create',
+           return_value=CHAT_RESPONSE)
+    def test_chat_acquires_and_records(self, patched_create, *_):
+        """Test the estimate is reserved before sending and settled after"""
+        self.client.execute_chat_completion("prompt", max_tokens=100)
+
+        # 100 max tokens, 10 prompt tokens and 4 for the message
+        self.rate_limiter.acquire.assert_called_once_with(114)
+        self.rate_limiter.record.assert_called_once_with(114, 1000)
+
+    @patch('synthesis.openai_client.openai.ChatCompletion.create',
+           side_effect=RateLimitError("limit", headers={"retry-after": "7"}))
+    def test_chat_rate_limit_throttles(self, patched_create, *_):
+        """Test a rate limit error passes Retry-After to the limiter"""
+        with self.assertRaises(OpenAIRateLimitException):
+            self.client.execute_chat_completion("prompt")
+
+        self.rate_limiter.throttle.assert_called_with(7.0)
+        self.rate_limiter.record.assert_not_called()
+
+
+def _chat_stream(**kwargs):
+    """Fake OpenAI streamed chat response"""
+    return iter([{"choices": [{"delta": {"role": "assistant"}}]}] + [
+        {"choices": [{"delta": {"content": part}}]}
+        for part in ["Some ", "text", " (0)", "\n"]
+    ] + [{"choices": [{"delta": {}}]}])
+
+
+@patch('synthesis.openai_client.token_count', return_value=10)
+@patch('synthesis.openai_client.openai.ChatCompletion.create',
+       side_effect=_chat_stream)
+class OpenAIClientStreamTests(SimpleTestCase):
+    """Test streamed chat requests"""
+
+    def setUp(self):
+        self.rate_limiter = MagicMock()
+        self.client = OpenAIClient(
+            completions_api_type="open_ai",
+            cache=DjangoCache(LocMemCache(self.id(), {})),
+            chat_rate_limiter=self.rate_limiter
+        )
+        self.messages = [{"role": "user", "content": "prompt"}]
+
+    def test_chat_stream(self, patched_create, _):
+        """Test deltas are relayed and the full response comes last"""
+        chunks = list(self.client.execute_chat_stream(
+            self.messages, model="gpt", max_tokens=100))
+
+        self.assertTrue(patched_create.call_args.kwargs['stream'])
+        self.assertEqual([chunk['delta'] for chunk in chunks[:-1]],
+                         ["Some ", "text", " (0)", "\n"])
+        self.assertEqual(chunks[-1]['output'], "Some text (0)")
+        self.assertEqual(chunks[-1]['prompt'], "prompt")
+        self.assertTrue(chunks[-1]['done'])
+        # 10 prompt tokens, 4 for the message and 10 output tokens
+        self.rate_limiter.acquire.assert_called_once_with(114)
+        self.rate_limiter.record.assert_called_once_with(114, 24)
+
+    def test_chat_stream_not_cached(self, patched_create, _):
+        """Test a repeated stream is requested again"""
+        for _ in range(2):
+            chunks = list(self.client.execute_chat_stream(
+                self.messages, model="gpt", temperature=0))
+
+        self.assertEqual(patched_create.call_count, 2)
+        self.assertFalse(chunks[-1]['cached'])
@@ -0,0 +1,70 @@
+import os
+import tempfile
+from django.test import SimpleTestCase
+from unittest.mock import patch
+
+from synthesis.rate_limiter import FileRateLimiter
+
+
+@patch('synthesis.rate_limiter.time')
+class FileRateLimiterTests(SimpleTestCase):
+    """Test the shared requests and tokens per minute limiter"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'chat.json')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _limiter(self, rpm=60, tpm=600):
+        # Bursts allow 10 seconds of quota: 10 requests and 100 tokens
+        return FileRateLimiter(self.path, rpm, tpm)
+
+    def test_acquire_within_burst(self, patched_time):
+        """Test requests within the burst are sent without waiting"""
+        patched_time.time.return_value = 1000.0
+        limiter = self._limiter()
+        for _ in range(10):
+            limiter.acquire(10)
+        patched_time.sleep.assert_not_called()
+
+    def test_acquire_waits_for_tokens(self, patched_time):
+        """Test a request waits until the token bucket refills"""
+        now = [1000.0]
+        patched_time.time.side_effect = lambda: now[0]
+        patched_time.sleep.side_effect = \
+            lambda seconds: now.__setitem__(0, now[0] + seconds)
+        limiter = self._limiter()
+        limiter.acquire(100)
+        limiter.acquire(50)
+        # 50 tokens at 10 tokens per second
+        self.assertAlmostEqual(now[0], 1005.0)
+
+    def test_state_shared_between_limiters(self, patched_time):
+        """Test limiters on the same file spend the same quota"""
+        patched_time.time.return_value = 1000.0
+        self._limiter().acquire(100)
+        patched_time.sleep.side_effect = StopIteration
+        with self.assertRaises(StopIteration):
+            self._limiter().acquire(100)
+
+    def test_record_refunds_estimate(self, patched_time):
+        """Test unused estimated tokens are returned to the bucket"""
+        patched_time.time.return_value = 1000.0
+        limiter = self._limiter()
+        limiter.acquire(100)
+        limiter.record(estimated_tokens=100, tokens_used=20)
+        limiter.acquire(80)
+        patched_time.sleep.assert_not_called()
+
+    def test_throttle_honors_retry_after(self, patched_time):
+        """Test requests pause until Retry-After has passed"""
+        now = [1000.0]
+        patched_time.time.side_effect = lambda: now[0]
+        patched_time.sleep.side_effect = \
+            lambda seconds: now.__setitem__(0, now[0] + seconds)
+        limiter = self._limiter()
+        limiter.throttle(retry_after=12)
+        limiter.acquire(1)
+        self.assertTrue(now[0] >= 1012.0)
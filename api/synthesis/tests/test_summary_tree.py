@@ -0,0 +1,89 @@
+from django.test import SimpleTestCase
+
+from synthesis.summary_tree import SummaryTree, SUMMARY_MAX_LEVELS
+from synthesis.utils import token_count
+
+
+def _notes(count: int) -> list:
+    return [{'text': f'Note {i} about the interview', 'references': [i, i]}
+            for i in range(count)]
+
+
+def _line_indices(chunk: str) -> list:
+    return [int(line.split(']')[0][1:]) for line in chunk.split('\n')]
+
+
+def _summarize_range(chunk: str) -> dict:
+    """Summarize a chunk as one sentence citing its first and last note"""
+    indices = _line_indices(chunk)
+    return {'output': f'Summary ({indices[0]}-{indices[-1]})',
+            'prompt': chunk, 'cost': 1}
+
+
+def _echo(chunk: str) -> dict:
+    """Return every note of the chunk, so nothing is compressed"""
+    output = ' '.join(f"{line.split('] ', 1)[1]} ({index})"
+                      for line, index in zip(chunk.split('\n'),
+                                             _line_indices(chunk)))
+    return {'output': output, 'prompt': chunk, 'cost': 1}
+
+
+class SummaryTreeTests(SimpleTestCase):
+    """Test reducing notes with a tree of summary requests"""
+
+    def test_chunks_follow_token_budget(self):
+        tree = SummaryTree(_notes(40), max_input_tokens=100)
+        self.assertTrue(len(tree.chunks) > 1)
+        for chunk in tree.chunks:
+            self.assertTrue(token_count(chunk) <= 100)
+        sizes = [len(chunk.split('\n')) for chunk in tree.chunks]
+        self.assertTrue(min(sizes) * 2 >= max(sizes))
+        self.assertEqual(
+            [i for chunk in tree.chunks for i in _line_indices(chunk)],
+            list(range(40)))
+
+    def test_reduce_composes_references(self):
+        tree = SummaryTree(_notes(40), max_input_tokens=100)
+        while tree.chunks:
+            tree.reduce([_summarize_range(chunk) for chunk in tree.chunks])
+        result = tree.result()
+
+        self.assertEqual(tree.levels, 2)
+        self.assertEqual(len(tree.citations), 2)
+        # The final summary cites every summary of the first level
+        first_level = tree.citations[0]
+        self.assertEqual(tree.citations[1].to_lists(),
+                         [list(range(first_level.n_rows))])
+        self.assertEqual(result['output'],
+                         [{'text': 'Summary', 'references': list(range(40))}])
+        self.assertTrue(result['cost'] > 2)
+
+    def test_single_chunk_single_level(self):
+        tree = SummaryTree(_notes(3), max_input_tokens=1000)
+        self.assertEqual(len(tree.chunks), 1)
+        tree.reduce([_summarize_range(tree.chunks[0])])
+
+        self.assertEqual(tree.chunks, [])
+        self.assertEqual(tree.result()['output'][0]['references'], [0, 1, 2])
+
+    def test_references_past_notes_dropped(self):
+        tree = SummaryTree(_notes(3), max_input_tokens=1000)
+        tree.reduce([{'output': 'Summary (1-99)', 'prompt': '', 'cost': 1}])
+        self.assertEqual(tree.result()['output'][0]['references'], [1, 2])
+
+    def test_non_converging_stops(self):
+        tree = SummaryTree(_notes(40), max_input_tokens=100)
+        with self.assertLogs('synthesis.summary_tree', level='WARNING'):
+            while tree.chunks:
+                tree.reduce([_echo(chunk) for chunk in tree.chunks])
+
+        self.assertTrue(tree.levels < SUMMARY_MAX_LEVELS)
+        output = tree.result()['output']
+        self.assertEqual(len(output), 40)
+        self.assertEqual(output[5]['references'], [5])
+
+    def test_empty_notes(self):
+        tree = SummaryTree([], max_input_tokens=100)
+        self.assertEqual(tree.chunks, [])
+        self.assertEqual(tree.result(),
+                         {'output': [], 'prompt': '', 'cost': 0})
@@ -1,5 +1,7 @@
 from django.test import TestCase
-from typing import List, Dict
+import time
+from unittest.mock import patch
+from typing import Iterator, List, Dict
 
 from transcript.tests.utils import (
     create_transcript, create_project, create_user
@@ -10,9 +12,15 @@ from synthesis.interfaces import (
 from synthesis.errors import (
     ObjectNotFoundException, ObjectAlreadyPresentException
 )
-from synthesis.models import ProcessedTranscript
+from synthesis.models import ProcessedTranscript, QuestionEmbeds
 from synthesis import usecases
-from synthesis.synthesis import Synthesis
+from synthesis.synthesis import Synthesis, _map_in_order
+from synthesis.utils import (
+    token_counts,
+    split_indexed_lines_into_chunks,
+    split_indexed_transcript_lines_into_chunks,
+)
+from core.models import AppSettings
 
 
 class MockOpenAIClient(OpenAIClientInterface):
@@ -58,14 +66,44 @@ class MockOpenAIClient(OpenAIClientInterface):
                              object_desc: str = None,
                              start_index: int = 0,
                              ) -> dict:
+        request_ids = [f'{object_id}-{n}' for n in range(
+            start_index, start_index + len(request_list))]
         return {
-            "upsert_list": [],
-            "request_ids": [],
+            "upsert_list": [(request_id, [0.1, 0.2], {'text': text})
+                            for request_id, text in zip(request_ids,
+                                                        request_list)],
+            "request_ids": request_ids,
             "tokens_used": 10,
             "cost": 0.1
         }
 
 
+class EchoOpenAIClient(MockOpenAIClient):
+    """Mock OpenAI client whose output depends on the prompt"""
+
+    def execute_chat_completion(self, prompt: str,
+                                model: str = '',
+                                temperature: int = 0,
+                                max_tokens: int = 100,
+                                ) -> dict:
+        result = super().execute_chat_completion(
+            prompt, model, temperature, max_tokens)
+        result['prompt'] = prompt
+        result['output'] = f'Chunk of {len(prompt)} chars (0)'
+        return result
+
+
+class StreamingOpenAIClient(MockOpenAIClient):
+    """Mock OpenAI client streaming its chat output a few chars at a time"""
+
+    def execute_chat_stream(self, messages: List[Dict[str, str]],
+                            **kwargs) -> Iterator[dict]:
+        result = self.execute_chat(messages, **kwargs)
+        for i in range(0, len(result['output']), 3):
+            yield {'delta': result['output'][i:i + 3]}
+        yield {'done': True, **result}
+
+
 class MockEmbedsClient(EmbedsClientInterface):
     """Mock class for Embeddings Client"""
 
@@ -91,6 +129,11 @@ class MockEmbedsClient(EmbedsClientInterface):
             "namespace": "string"
         }
 
+    def search_many(self, id: int, embeddings: List[List[float]],
+                    limit: int = 5) -> List[dict]:
+        return [self.search(id, embedding, limit)
+                for embedding in embeddings]
+
     def delete(self, id: int):
         pass
 
@@ -128,6 +171,87 @@ class SynthesisMockTests(TestCase):
             usecases.process_transcript(self.transcript)
         ptct.delete()
 
+    def test_process_transcript_stores_line_tokens(self):
+        """Test token counts of the indexed lines are stored with the data"""
+        usecases.process_transcript(self.transcript)
+        ptct = ProcessedTranscript.objects.get(transcript=self.transcript)
+        self.assertEqual(ptct.line_tokens,
+                         token_counts(ptct.indexed.split("\n")))
+
+    def test_empty_transcript_chunks(self):
+        """Test an empty transcript has no stored token counts and still
+        splits into chunks"""
+        ptct = ProcessedTranscript(transcript=self.transcript, data=[])
+        self.assertIsNone(ptct.line_tokens)
+        self.assertEqual(split_indexed_lines_into_chunks(
+            ptct.indexed, 100, ptct.line_tokens), [[""]])
+        self.assertEqual(split_indexed_transcript_lines_into_chunks(
+            ptct.indexed, "Jason", 100, []), [[""]])
+
+    def test_process_transcript_stores_line_offsets(self):
+        """Test line offsets are stored alongside the data, and are
+        rebuilt from the data for rows saved without them"""
+        usecases.process_transcript(self.transcript)
+        ptct = usecases._get_transcript(self.transcript, with_data=False)
+        self.assertIn('data', ptct.get_deferred_fields())
+        ProcessedTranscript.objects.filter(pk=ptct.pk).update(offsets=None)
+        legacy = ProcessedTranscript.objects.get(pk=ptct.pk)
+        expected = [[line['start'], line['end']] for line in legacy.data]
+        self.assertEqual(ptct.line_offsets.tolist(), expected)
+        self.assertEqual(legacy.line_offsets.tolist(), expected)
+
+    def test_process_transcript_stores_indexed_text(self):
+        """Test the indexed text is rendered once when the data is saved
+        and re-rendered when the data changes"""
+        usecases.process_transcript(self.transcript)
+        ptct = ProcessedTranscript.objects.get(transcript=self.transcript)
+        self.assertEqual(ptct.indexed_text, "\n".join(
+            f"[{i}] {line['text']}" for i, line in enumerate(ptct.data)))
+        self.assertEqual(ptct.indexed, ptct.indexed_text)
+
+        ptct.data = ptct.data[:1]
+        ptct.save()
+        self.assertEqual(ptct.indexed, f"[0] {ptct.data[0]['text']}")
+
+        ProcessedTranscript.objects.filter(pk=ptct.pk).update(
+            indexed_text=None)
+        legacy = ProcessedTranscript.objects.get(pk=ptct.pk)
+        self.assertEqual(legacy.indexed, ptct.indexed)
+
+    def test_save_data_update_fields_stores_derived_columns(self):
+        """Test saving only the data also writes the offsets and indexed
+        text rebuilt from it"""
+        usecases.process_transcript(self.transcript)
+        ptct = ProcessedTranscript.objects.get(transcript=self.transcript)
+        ptct.data = ptct.data[1:2]
+        ptct.save(update_fields=['data'])
+
+        reloaded = ProcessedTranscript.objects.get(pk=ptct.pk)
+        line = ptct.data[0]
+        self.assertEqual(reloaded.line_offsets.tolist(),
+                         [[line['start'], line['end']]])
+        self.assertEqual(reloaded.indexed_text, f"[0] {line['text']}")
+
+    def test_citations_skip_out_of_range_references(self):
+        """Test references outside the transcript lines are dropped"""
+        usecases.process_transcript(self.transcript)
+        ptct = ProcessedTranscript.objects.get(transcript=self.transcript)
+        n_lines = len(ptct.data)
+        result = usecases._synthesis_to_citation_result({
+            'output': [
+                {'text': 'a', 'references': [n_lines - 1, n_lines, -1]},
+                {'text': 'b', 'references': None},
+                {'text': 'c', 'references': [0, 10**9]},
+            ],
+            'prompt': '',
+            'cost': 0
+        }, ptct.line_offsets)
+        last, first = ptct.data[n_lines - 1], ptct.data[0]
+        self.assertEqual(
+            [item['references'] for item in result['output']],
+            [[[last['start'], last['end']]], [],
+             [[first['start'], first['end']]]])
+
     def test_get_summary(self):
         """Test get transcript summary method"""
         with self.assertRaises(ObjectNotFoundException):
@@ -139,6 +263,48 @@ class SynthesisMockTests(TestCase):
         self.assertTrue(summary['cost'] > 0)
         self.assertTrue(len(summary['output']) > 0)
 
+    def test_get_summary_single_call(self):
+        """Test a short transcript is summarized with one request and the
+        references map to the processed transcript lines"""
+        usecases.process_transcript(self.transcript)
+        ptct = ProcessedTranscript.objects.get(transcript=self.transcript)
+        with patch.object(MockOpenAIClient, 'execute_chat_completion',
+                          return_value={
+                              'prompt': 'Have some fun',
+                              'output': 'Summary one (0, 2). Summary two (3)',
+                              'cost': 0.1,
+                              'tokens_used': 100
+                          }) as completion:
+            summary = usecases.get_transcript_summary(
+                self.transcript, self.synthesis)
+
+        completion.assert_called_once()
+        self.assertIn(ptct.indexed, completion.call_args.args[0])
+        data = ptct.data
+        self.assertEqual(summary['output'], [
+            {'text': 'Summary one',
+             'references': [[data[0]['start'], data[0]['end']],
+                            [data[2]['start'], data[2]['end']]]},
+            {'text': '. Summary two',
+             'references': [[data[3]['start'], data[3]['end']]]},
+        ])
+        self.assertEqual(summary['cost'], 0.1)
+
+    def test_get_summary_chunked_above_single_call_limit(self):
+        """Test transcripts over the single call limit are chunked first"""
+        app_settings = AppSettings.get()
+        app_settings.single_call_max_tokens_summary = 10
+        app_settings.save()
+        usecases.process_transcript(self.transcript)
+        with patch.object(MockOpenAIClient, 'execute_chat_completion',
+                          wraps=self.synthesis.openai_client.
+                          execute_chat_completion) as completion:
+            summary = usecases.get_transcript_summary(
+                self.transcript, self.synthesis)
+
+        self.assertTrue(completion.call_count > 1)
+        self.assertTrue(len(summary['output']) > 0)
+
     def test_get_concise(self):
         """Test get transcript concise method"""
         with self.assertRaises(ObjectNotFoundException):
@@ -150,6 +316,26 @@ class SynthesisMockTests(TestCase):
         self.assertTrue(concise['cost'] > 0)
         self.assertTrue(len(concise['output']) > 0)
 
+    def test_get_concise_parallel_matches_serial(self):
+        """Test parallel concise generation matches the serial output"""
+        app_settings = AppSettings.get()
+        app_settings.chunk_min_tokens_concise = 20
+        app_settings.max_concurrency_concise = 1
+        app_settings.save()
+        synthesis = Synthesis(
+            openai_client=EchoOpenAIClient(),
+            embeds_client=MockEmbedsClient()
+        )
+        usecases.process_transcript(self.transcript)
+        serial = usecases.get_transcript_concise(self.transcript, synthesis)
+
+        app_settings.max_concurrency_concise = 4
+        app_settings.save()
+        parallel = usecases.get_transcript_concise(
+            self.transcript, synthesis)
+        self.assertTrue(len(serial['output']) > 1)
+        self.assertEqual(serial, parallel)
+
     def test_create_embeds(self):
         """Test create embeds method"""
         with self.assertRaises(ObjectNotFoundException):
@@ -172,3 +358,184 @@ class SynthesisMockTests(TestCase):
             self.transcript, "test", self.synthesis)
         self.assertTrue(result['cost'] > 0)
         self.assertTrue(len(result['output']) > 0)
+
+    def test_create_question_embeds(self):
+        """Test question embeds are stored once and pruned with questions"""
+        self.project.questions = ['Why?', 'How?']
+        self.project.save()
+        result = usecases.create_question_embeds(
+            self.project, self.synthesis)
+        self.assertTrue(result['cost'] > 0)
+        result = usecases.create_question_embeds(
+            self.project, self.synthesis)
+        self.assertEqual(result['cost'], 0)
+
+        self.project.questions = ['Why?']
+        self.project.save()
+        usecases.create_question_embeds(self.project, self.synthesis)
+        qembeds = QuestionEmbeds.objects.filter(project=self.project)
+        self.assertEqual([q.question for q in qembeds], ['Why?'])
+        self.assertAlmostEqual(qembeds[0].vector[0], 0.1, places=5)
+
+    def test_question_embeds_follow_embeddings_model(self):
+        """Test embeds of another model are ignored and replaced"""
+        self.project.questions = ['Why?']
+        self.project.save()
+        usecases.create_question_embeds(self.project, self.synthesis)
+        self.synthesis.openai_client.embeddings_model = 'new-model'
+        self.assertIsNone(usecases._get_question_embedding(
+            self.transcript, 'Why?', 'new-model'))
+
+        result = usecases.create_question_embeds(
+            self.project, self.synthesis)
+        self.assertTrue(result['cost'] > 0)
+        qembeds = QuestionEmbeds.objects.get(project=self.project)
+        self.assertEqual(qembeds.embeddings_model, 'new-model')
+
+    def test_run_query_uses_question_embeds(self):
+        """Test project questions are not embedded again when queried"""
+        self.project.questions = ['Why?']
+        self.project.save()
+        usecases.create_question_embeds(self.project, self.synthesis)
+        usecases.process_transcript(self.transcript)
+        with patch.object(MockOpenAIClient, 'execute_embeds') as embeds:
+            result = usecases.run_transcript_query(
+                self.transcript, 'Why?', self.synthesis)
+        embeds.assert_not_called()
+        self.assertTrue(len(result['output']) > 0)
+
+    def test_run_queries(self):
+        """Test batched queries embed only the questions not precomputed"""
+        self.project.questions = ['Why?']
+        self.project.save()
+        usecases.create_question_embeds(self.project, self.synthesis)
+        usecases.process_transcript(self.transcript)
+        with patch.object(MockOpenAIClient, 'execute_embeds_batch',
+                          wraps=self.synthesis.openai_client.
+                          execute_embeds_batch) as embeds:
+            results = usecases.run_transcript_queries(
+                self.transcript, ['Why?', 'How?', 'What?'], self.synthesis)
+        embeds.assert_called_once()
+        self.assertEqual(embeds.call_args.kwargs['request_list'],
+                         ['How?', 'What?'])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(len(result['output']) > 0
+                            for result in results))
+
+    def test_run_queries_keeps_answers_when_one_fails(self):
+        """Test a failed answer only replaces its own result"""
+        usecases.process_transcript(self.transcript)
+        execute_chat = MockOpenAIClient.execute_chat
+
+        def flaky_chat(client, messages, **kwargs):
+            if 'How?' in messages[-1]['content']:
+                raise RuntimeError('LLM failed')
+            return execute_chat(client, messages, **kwargs)
+
+        with patch.object(MockOpenAIClient, 'execute_chat', flaky_chat), \
+                self.assertLogs('synthesis.synthesis', level='ERROR'):
+            results = usecases.run_transcript_queries(
+                self.transcript, ['Why?', 'How?', 'What?'], self.synthesis)
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertTrue(results[0]['cost'] > 0)
+        self.assertTrue(len(results[2]['output']) > 0)
+
+    def test_stream_query_matches_run_query(self):
+        """Test streamed sentences and result match the unstreamed query"""
+        synthesis = Synthesis(
+            openai_client=StreamingOpenAIClient(),
+            embeds_client=MockEmbedsClient()
+        )
+        usecases.process_transcript(self.transcript)
+        expected = usecases.run_transcript_query(
+            self.transcript, "test", synthesis)
+        events = list(usecases.stream_transcript_query(
+            self.transcript, "test", synthesis))
+
+        tokens = [e['data'] for e in events if e['event'] == 'token']
+        sentences = [e['data'] for e in events if e['event'] == 'sentence']
+        self.assertTrue(len(tokens) > 1)
+        self.assertEqual(''.join(tokens),
+                         'Some text (0). Some other text (1)')
+        self.assertEqual(events[-1], {'event': 'result', 'data': expected})
+        self.assertEqual(sentences, expected['output'])
+        self.assertEqual(len(sentences), 2)
+
+    def test_stream_query_missing_transcript_raises_up_front(self):
+        """Test a transcript never processed fails before streaming"""
+        synthesis = Synthesis(
+            openai_client=StreamingOpenAIClient(),
+            embeds_client=MockEmbedsClient()
+        )
+        with self.assertRaises(ObjectNotFoundException):
+            usecases.stream_transcript_query(
+                self.transcript, "test", synthesis)
+
+
+class SynthesisConcurrencyTests(TestCase):
+    """Test class for concurrent execution helpers"""
+
+    def test_map_in_order_preserves_order(self):
+        """Test results are returned in input order when run in parallel"""
+        def slow_identity(n):
+            time.sleep((5 - n) * 0.01)
+            return n
+
+        result = _map_in_order(slow_identity, list(range(5)), max_workers=5)
+        self.assertEqual(result, [0, 1, 2, 3, 4])
+
+    def test_map_in_order_serial(self):
+        """Test a single worker falls back to serial execution"""
+        result = _map_in_order(lambda n: n * 2, [1, 2, 3], max_workers=1)
+        self.assertEqual(result, [2, 4, 6])
+
+
+class SynthesisEmbedsBatchTests(TestCase):
+    """Test class for token-budgeted embedding batches"""
+
+    def setUp(self):
+        self.synthesis = Synthesis(
+            openai_client=MockOpenAIClient(),
+            embeds_client=MockEmbedsClient()
+        )
+
+    def test_batches_fit_request_budget(self):
+        """Test inputs are packed into the fewest batches within budget"""
+        content_list = ["Some text " * 10] * 6
+        tokens = token_counts(content_list)[0]
+        batches = self.synthesis._create_batches_for_embeds(
+            content_list, max_input_tokens=100,
+            max_request_tokens=tokens * 4, max_request_inputs=100)
+        self.assertEqual([len(batch) for batch in batches], [4, 2])
+
+    def test_batches_respect_input_count(self):
+        """Test a batch never holds more than the max number of inputs"""
+        batches = self.synthesis._create_batches_for_embeds(
+            ["Some text"] * 5, max_input_tokens=100,
+            max_request_tokens=1000, max_request_inputs=2)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+
+    def test_oversize_content_split(self):
+        """Test content over the per-input limit is split, not dropped"""
+        content = "Some text " * 50
+        batches = self.synthesis._create_batches_for_embeds(
+            [content], max_input_tokens=16,
+            max_request_tokens=1000, max_request_inputs=100)
+        inputs = [text for batch in batches for text in batch]
+        self.assertTrue(len(inputs) > 1)
+        self.assertEqual("".join(inputs), content)
+        self.assertTrue(all(count <= 16 for count in token_counts(inputs)))
+
+    @patch('synthesis.synthesis.EMBEDS_MAX_REQUEST_INPUTS', 2)
+    def test_embed_and_upsert_pipeline_ids(self):
+        """Test pipelined batches are upserted in order with stable ids"""
+        upserted = []
+        with patch.object(MockEmbedsClient, 'upsert',
+                          lambda _, vectors: upserted.extend(vectors)):
+            result = self.synthesis._openai_embed_and_upsert(
+                7, "Title", [f"Some text {i}" for i in range(5)])
+        self.assertEqual([vector[0] for vector in upserted],
+                         [f"7-{i}" for i in range(5)])
+        self.assertEqual([vector[2]['text'] for vector in upserted],
+                         [f"Some text {i}" for i in range(5)])
+        self.assertAlmostEqual(result['cost'], 0.3)
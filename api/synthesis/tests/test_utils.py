@@ -1,9 +1,14 @@
 from django.test import TestCase
 from synthesis.utils import (
+    CitationParser,
+    CitationStreamParser,
     split_text_into_multiple_lines_for_speaker,
     split_indexed_transcript_lines_into_chunks,
     split_and_extract_indices,
-    split_indexed_lines_into_chunks
+    split_indexed_lines_into_chunks,
+    split_text_by_tokens,
+    token_count,
+    token_counts
 )
 
 text = """Jason: "Some Text Some text"
@@ -79,12 +84,36 @@ class SynthesisUtilsTests(TestCase):
             text, line_min_size=2)
         self.assertEqual(result, multiple_line_split_text_for_speaker_results)
 
+    def test_split_text_into_multiple_lines_for_speaker_offsets(self):
+        with open('synthesis/tests/samples/transcript_short.txt') as f:
+            transcript = f.read()
+        for line_min_size in [2, 25, 90]:
+            result = split_text_into_multiple_lines_for_speaker(
+                transcript, line_min_size)
+            for line in result:
+                sentence = line['text'].split(': ', 1)[1]
+                self.assertEqual(
+                    transcript[line['start']:line['end']], sentence)
+
     def test_split_indexed_lines_into_chunks(self):
         result = split_indexed_lines_into_chunks(
             indexed_notes, chunk_min_tokens=28)
         self.assertEqual(
             result, indexed_lines_into_chunks_indexed_chunks_results)
 
+    def test_token_counts(self):
+        lines = indexed_notes.split("\n")
+        self.assertEqual(token_counts(lines),
+                         [token_count(line) for line in lines])
+        self.assertEqual(token_counts([]), [])
+
+    def test_split_indexed_lines_into_chunks_with_line_tokens(self):
+        line_tokens = token_counts(indexed_notes.split("\n"))
+        result = split_indexed_lines_into_chunks(
+            indexed_notes, chunk_min_tokens=28, line_tokens=line_tokens)
+        self.assertEqual(
+            result, indexed_lines_into_chunks_indexed_chunks_results)
+
     def test_split_indexed_transcript_lines_into_chunks(self):
         result = split_indexed_transcript_lines_into_chunks(
             indexed_transcript, interviewee="Jason", chunk_min_tokens=14)
@@ -94,3 +123,60 @@ class SynthesisUtilsTests(TestCase):
     def test_split_and_extract_indices(self):
         result = split_and_extract_indices(notes_with_references)
         self.assertEqual(result, notes_indices_references)
+
+    def test_split_and_extract_indices_caps_ranges(self):
+        result = split_and_extract_indices(
+            "Text (2-1000000000). More (3, 8,9). Last (99999999999)", 9)
+        self.assertEqual([item['references'] for item in result],
+                         [[2, 3, 4, 5, 6, 7, 8], [3, 8], []])
+
+    def test_split_and_extract_indices_malformed_references(self):
+        result = split_and_extract_indices(
+            "One (1 2). Two (,3-). Three ( ). Four (4-2)")
+        self.assertEqual(result, [
+            {'text': 'One', 'references': [1, 2]},
+            {'text': '. Two', 'references': [3]},
+            {'text': '. Three', 'references': []},
+            {'text': '. Four', 'references': []}])
+
+    def test_citation_parser_unclosed_parenthesis(self):
+        text = "Some text (1, 2" + " more" * 2000
+        parser = CitationParser()
+        for i in range(0, len(text), 7):
+            self.assertEqual(parser.feed(text[i:i + 7]), [])
+        self.assertEqual(parser.close(),
+                         [{'text': text, 'references': []}])
+
+    def test_citation_stream_parser(self):
+        parser = CitationStreamParser()
+        result = []
+        for char in notes_with_references:
+            result.extend(parser.feed(char))
+        result.extend(parser.close())
+        self.assertEqual(result, notes_indices_references)
+
+    def test_citation_stream_parser_emits_closed_references(self):
+        parser = CitationStreamParser()
+        self.assertEqual(parser.feed("  Some text (2,"), [])
+        self.assertEqual(parser.feed("3). More"),
+                         [{'text': 'Some text', 'references': [2, 3]}])
+        self.assertEqual(parser.feed(" text\nNext line"),
+                         [{'text': '. More text', 'references': []}])
+        self.assertEqual(parser.feed("\n\n"), [])
+        self.assertEqual(parser.close(),
+                         [{'text': 'Next line', 'references': []}])
+
+    def test_split_text_by_tokens_between_lines(self):
+        result = split_text_by_tokens(indexed_notes, max_tokens=30)
+        self.assertTrue(len(result) > 1)
+        self.assertEqual("\n".join(result), indexed_notes)
+        for piece in result:
+            self.assertTrue(token_count(piece) <= 30)
+
+    def test_split_text_by_tokens_long_line(self):
+        line = "Some text " * 50
+        result = split_text_by_tokens(line, max_tokens=16)
+        self.assertTrue(len(result) > 1)
+        self.assertEqual("".join(result), line)
+        for piece in result:
+            self.assertTrue(token_count(piece) <= 16)
@@ -1,24 +1,41 @@
+from array import array
+from asgiref.sync import sync_to_async
+from itertools import chain
 import logging
-from typing import List
+import numpy as np
+from typing import Iterator, List, Optional, Tuple, Union
 from .domains import (
-    CitationResult, SynthesisResult, EmbedsResult, SynthesisResponse
+    CitationResult,
+    CitationResultOutput,
+    SynthesisResult,
+    SynthesisResultOutput,
+    EmbedsResult,
+    SynthesisResponse,
+    StreamEvent
 )
 from .errors import ObjectNotFoundException, ObjectAlreadyPresentException
-from .interfaces import SynthesisInterface
-from .models import ProcessedTranscript
-from .server import get_synthesis
+from .interfaces import AsyncSynthesisInterface, SynthesisInterface
+from .models import ProcessedTranscript, QuestionEmbeds
+from .server import get_async_synthesis, get_synthesis
 from .utils import split_text_into_multiple_lines_for_speaker
 from core.models import AppSettings
+from project.models import Project
 from transcript.models import Transcript
 
 
 logger = logging.getLogger(__name__)
 
 
-def _get_transcript(tct: Transcript) -> ProcessedTranscript:
-    """Return the transcript from storage"""
+def _get_transcript(tct: Transcript,
+                    with_data: bool = True) -> ProcessedTranscript:
+    """Return the transcript from storage. Citation lookups only need the
+    line offsets, so queries skip loading the JSON `data` and the indexed
+    text with_data=False"""
+    ptranscripts = ProcessedTranscript.objects.filter(transcript=tct)
+    if not with_data:
+        ptranscripts = ptranscripts.defer('data', 'indexed_text')
     try:
-        ptranscript = ProcessedTranscript.objects.get(transcript=tct)
+        ptranscript = ptranscripts.get()
     except ProcessedTranscript.DoesNotExist:
         raise ObjectNotFoundException(
             detail=f"Transcript for id = {id} not found")
@@ -32,7 +49,8 @@ def process_transcript(tct: Transcript) -> None:
     ptranscripts = ProcessedTranscript.objects.filter(transcript=tct)
     if len(ptranscripts) == 0:
         data = split_text_into_multiple_lines_for_speaker(
-            tct.transcript, AppSettings.get().indexed_line_min_chars)
+            tct.transcript, AppSettings.get().indexed_line_min_chars,
+            count_tokens=True)
         ProcessedTranscript.objects.create(transcript=tct, data=data)
     else:
         raise ObjectAlreadyPresentException(
@@ -40,20 +58,49 @@ def process_transcript(tct: Transcript) -> None:
             "present in storage")
 
 
+def _resolve_references(references: List[Optional[List[int]]],
+                        line_offsets: np.ndarray) -> List[List[List[int]]]:
+    """Map the line indices cited by each output to [start, end] offsets
+    with a single gather. Indices outside the transcript are dropped."""
+    references = [refs or () for refs in references]
+    lengths = np.fromiter(map(len, references), dtype=np.int64,
+                          count=len(references))
+    lines = np.fromiter(chain.from_iterable(references), dtype=np.int64,
+                        count=int(lengths.sum()))
+    valid = (lines >= 0) & (lines < len(line_offsets))
+    if not valid.all():
+        logger.warning(
+            f"Synthesis: dropped {int((~valid).sum())} references outside "
+            f"the {len(line_offsets)} transcript lines")
+        row_ids = np.repeat(np.arange(len(references)), lengths)
+        lengths = np.bincount(row_ids[valid], minlength=len(references))
+        lines = lines[valid]
+    offsets = line_offsets[lines].tolist()
+    ends = np.cumsum(lengths).tolist()
+    return [offsets[end - length:end]
+            for end, length in zip(ends, lengths.tolist())]
+
+
+def _synthesis_to_citation_output(text_reference: SynthesisResultOutput,
+                                  line_offsets: np.ndarray
+                                  ) -> CitationResultOutput:
+    return {
+        'text': text_reference["text"],
+        'references': _resolve_references(
+            [text_reference['references']], line_offsets)[0]
+    }
+
+
 def _synthesis_to_citation_result(sresults: SynthesisResult,
-                                  transcript_data: List[dict]
+                                  line_offsets: np.ndarray
                                   ) -> CitationResult:
-    citations = []
-    for text_reference in sresults["output"]:
-        text = text_reference["text"]
-        references = []
-        for num in text_reference['references']:
-            references.append([transcript_data[num]["start"],
-                               transcript_data[num]["end"]])
-        citations.append({
-            'text': text,
-            'references': references
-        })
+    references = _resolve_references(
+        [output['references'] for output in sresults["output"]],
+        line_offsets)
+    citations: List[CitationResultOutput] = [
+        {'text': text_reference["text"], 'references': refs}
+        for text_reference, refs in zip(sresults["output"], references)
+    ]
     retval: CitationResult = {
         'output': citations,
         'prompt': sresults['prompt'],
@@ -63,35 +110,39 @@ def _synthesis_to_citation_result(sresults: SynthesisResult,
 
 
 def get_transcript_summary(
-        tct: Transcript, synthesis: SynthesisInterface = get_synthesis()
+        tct: Transcript, synthesis: SynthesisInterface = None
 ) -> SynthesisResponse:
     """Generate a summary from the transcript"""
+    synthesis = synthesis or get_synthesis()
     logger.info(f"Synthesis: getting summary with transcript id={tct.id}")
     ptct = _get_transcript(tct)
     # TODO: add support for multiple interviewees
     results = synthesis.summarize_transcript(
-        ptct.indexed, tct.interviewee_names[0])
-    synthesis_results = _synthesis_to_citation_result(results, ptct.data)
+        ptct.indexed, tct.interviewee_names[0], ptct.line_tokens)
+    synthesis_results = _synthesis_to_citation_result(
+        results, ptct.line_offsets)
     synthesis_results['metadata'] = results['metadata']
     return synthesis_results
 
 
 def get_transcript_concise(
-        tct: Transcript, synthesis: SynthesisInterface = get_synthesis()
+        tct: Transcript, synthesis: SynthesisInterface = None
 ) -> CitationResult:
     """Generate a concise transcript from the transcript"""
+    synthesis = synthesis or get_synthesis()
     logger.info(f"Synthesis: getting concise with transcript id={tct.id}")
     ptct = _get_transcript(tct)
     # TODO: add support for multiple interviewees
     results = synthesis.concise_transcript(
-        ptct.indexed, tct.interviewee_names[0])
-    return _synthesis_to_citation_result(results, ptct.data)
+        ptct.indexed, tct.interviewee_names[0], ptct.line_tokens)
+    return _synthesis_to_citation_result(results, ptct.line_offsets)
 
 
 def create_transcript_embeds(
-        tct: Transcript, synthesis: SynthesisInterface = get_synthesis()
+        tct: Transcript, synthesis: SynthesisInterface = None
 ) -> EmbedsResult:
     """Generate embeds from the transcript"""
+    synthesis = synthesis or get_synthesis()
     logger.info(f"Synthesis: creating embeds with transcript id={tct.id}")
     ptct = _get_transcript(tct)
     # TODO: add support for multiple interviewees
@@ -99,16 +150,154 @@ def create_transcript_embeds(
         transcript_id=tct.id,
         transcript_title=tct.title,
         indexed_transcript=ptct.indexed,
-        interviewee=tct.interviewee_names[0])
+        interviewee=tct.interviewee_names[0],
+        line_tokens=ptct.line_tokens)
+
+
+def create_question_embeds(
+        pjt: Project, synthesis: SynthesisInterface = None
+) -> EmbedsResult:
+    """Generate and store embeds for the project questions that don't
+    have them yet, removing embeds of questions no longer in the project
+    and those made with another embeddings model"""
+    synthesis = synthesis or get_synthesis()
+    logger.info(f"Synthesis: creating question embeds for project={pjt.id}")
+    model = synthesis.embeddings_model()
+    questions = list(dict.fromkeys(pjt.questions or []))
+    QuestionEmbeds.objects.filter(project=pjt).exclude(
+        question__in=questions, embeddings_model=model).delete()
+    existing = set(QuestionEmbeds.objects.filter(
+        project=pjt).values_list('question', flat=True))
+    missing = [question for question in questions
+               if question not in existing]
+
+    results = synthesis.embed_queries(missing)
+    # Tasks for the same project may overlap, and the first insert wins
+    QuestionEmbeds.objects.bulk_create([
+        QuestionEmbeds(
+            project=pjt,
+            question=question,
+            embeddings_model=model,
+            embedding=array('f', embedding).tobytes())
+        for question, embedding in zip(missing, results['embeddings'])
+    ], ignore_conflicts=True)
+    logger.info(f"Synthesis: embedded {len(missing)} questions for "
+                f"project={pjt.id}, cost={results['cost']}")
+    return {'cost': results['cost']}
+
+
+def _get_question_embeddings(
+        tct: Transcript,
+        queries: List[str],
+        model: str) -> List[Optional[List[float]]]:
+    """Return the precomputed embeddings for queries that are project
+    questions, with None for the others and those of another model"""
+    qembeds = QuestionEmbeds.objects.filter(
+        project=tct.project_id, question__in=queries,
+        embeddings_model=model)
+    vectors = {qembed.question: qembed.vector for qembed in qembeds}
+    return [vectors.get(query) for query in queries]
+
+
+def _get_question_embedding(tct: Transcript,
+                            query: str,
+                            model: str) -> Optional[List[float]]:
+    """Return the precomputed embedding if query is a project question
+    embedded with the current model"""
+    qembeds = QuestionEmbeds.objects.filter(
+        project=tct.project_id, question=query,
+        embeddings_model=model).first()
+    return qembeds.vector if qembeds else None
 
 
 def run_transcript_query(
         tct: Transcript,
         query: str,
-        synthesis: SynthesisInterface = get_synthesis()
+        synthesis: SynthesisInterface = None
 ) -> CitationResult:
     """Run query against the transcript"""
+    synthesis = synthesis or get_synthesis()
     logger.info(f"Synthesis: running query with transcript id={tct.id}")
-    ptct = _get_transcript(tct)
-    results = synthesis.query_transcript(tct.id, query)
-    return _synthesis_to_citation_result(results, ptct.data)
+    ptct = _get_transcript(tct, with_data=False)
+    results = synthesis.query_transcript(
+        tct.id, query, _get_question_embedding(
+            tct, query, synthesis.embeddings_model()))
+    return _synthesis_to_citation_result(results, ptct.line_offsets)
+
+
+def _query_context(tct: Transcript,
+                   query: str,
+                   model: str) -> Tuple[np.ndarray, Optional[List[float]]]:
+    """Load what answering a query needs from the database: the line
+    offsets for citations and any precomputed embedding of the query"""
+    ptct = _get_transcript(tct, with_data=False)
+    return ptct.line_offsets, _get_question_embedding(tct, query, model)
+
+
+async def arun_transcript_query(
+        tct: Transcript,
+        query: str,
+        synthesis: AsyncSynthesisInterface = None
+) -> CitationResult:
+    """Run query against the transcript with the asyncio pipeline, for
+    async views served by the ASGI application"""
+    synthesis = synthesis or get_async_synthesis()
+    logger.info(f"Synthesis: running async query with transcript id={tct.id}")
+    line_offsets, query_embedding = await sync_to_async(_query_context)(
+        tct, query, synthesis.embeddings_model())
+    results = await synthesis.query_transcript(
+        tct.id, query, query_embedding)
+    return _synthesis_to_citation_result(results, line_offsets)
+
+
+def stream_transcript_query(
+        tct: Transcript,
+        query: str,
+        synthesis: SynthesisInterface = None
+) -> Iterator[StreamEvent]:
+    """Run query against the transcript, yielding answer tokens and cited
+    sentences as they stream in and the CitationResult last. The processed
+    transcript is loaded before this returns, so a missing one raises
+    ObjectNotFoundException here rather than once streaming has begun"""
+    synthesis = synthesis or get_synthesis()
+    logger.info(f"Synthesis: streaming query with transcript id={tct.id}")
+    ptct = _get_transcript(tct, with_data=False)
+    events = synthesis.stream_query_transcript(
+        tct.id, query, _get_question_embedding(
+            tct, query, synthesis.embeddings_model()))
+    return _cite_stream_events(events, ptct.line_offsets)
+
+
+def _cite_stream_events(events: Iterator[StreamEvent],
+                        line_offsets: np.ndarray) -> Iterator[StreamEvent]:
+    """Resolve the references of streamed sentences and the final result
+    into citations"""
+    for event in events:
+        if event["event"] == "sentence":
+            event = {"event": "sentence",
+                     "data": _synthesis_to_citation_output(
+                         event["data"], line_offsets)}
+        elif event["event"] == "result":
+            event = {"event": "result",
+                     "data": _synthesis_to_citation_result(
+                         event["data"], line_offsets)}
+        yield event
+
+
+def run_transcript_queries(
+        tct: Transcript,
+        queries: List[str],
+        synthesis: SynthesisInterface = None
+) -> List[Union[CitationResult, Exception]]:
+    """Run several queries against the transcript in one batch. Failed
+    queries get their exception in place of a result"""
+    synthesis = synthesis or get_synthesis()
+    logger.info(f"Synthesis: running {len(queries)} queries "
+                f"with transcript id={tct.id}")
+    ptct = _get_transcript(tct, with_data=False)
+    results = synthesis.query_transcript_batch(
+        tct.id, queries, _get_question_embeddings(
+            tct, queries, synthesis.embeddings_model()))
+    return [result if isinstance(result, Exception)
+            else _synthesis_to_citation_result(result, ptct.line_offsets)
+            for result in results]
@@ -1,22 +1,91 @@
+from functools import lru_cache
 import re
 import tiktoken
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+
+TOKEN_ENCODING = "cl100k_base"
+
+PARAGRAPH_PATTERN = re.compile(r"[^\r\n]+")
+SENTENCE_END_PATTERN = re.compile(r"[.?!]")
+# Longest number read as a line index. Ranges are capped below
+# 10 ** MAX_INDEX_DIGITS when the line count is not known.
+MAX_INDEX_DIGITS = 6
+
+
+@lru_cache(maxsize=None)
+def get_token_encoding() -> tiktoken.Encoding:
+    """Return the shared tiktoken encoder, loading it on first use"""
+    return tiktoken.get_encoding(TOKEN_ENCODING)
 
 
 def token_count(input: str) -> int:
-    token_encoding = tiktoken.get_encoding("cl100k_base")
-    return len(token_encoding.encode(input))
+    return len(get_token_encoding().encode(input))
+
+
+def token_counts(lines: List[str]) -> List[int]:
+    """Return the token count of every string in lines, encoded as a batch"""
+    if not lines:
+        return []
+    return [len(tokens) for tokens in get_token_encoding().encode_batch(lines)]
+
+
+def split_text_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """Split text into pieces of at most `max_tokens` tokens. Pieces break
+    between lines, and a single line is only cut mid-way when it exceeds
+    `max_tokens` on its own."""
+    encoding = get_token_encoding()
+    lines = text.split("\n")
+    pieces, cur_lines, cur_tokens = [], [], 0
+    for line, tokens in zip(lines, token_counts(lines)):
+        # Newlines are their own token so joining adds one per line
+        if cur_lines and cur_tokens + 1 + tokens > max_tokens:
+            pieces.append("\n".join(cur_lines))
+            cur_lines, cur_tokens = [], 0
+        if tokens > max_tokens:
+            encoded = encoding.encode(line)
+            for i in range(0, len(encoded), max_tokens):
+                pieces.append(encoding.decode(encoded[i:i + max_tokens]))
+            continue
+        cur_tokens += tokens + (1 if cur_lines else 0)
+        cur_lines.append(line)
+    if cur_lines:
+        pieces.append("\n".join(cur_lines))
+    return pieces
+
+
+def indexed_line(index: int, text: str) -> str:
+    """Render a single line of an indexed transcript"""
+    return f"[{index}] {text}"
+
+
+def _append_speaker_line(results: List[dict],
+                         speaker: str,
+                         line: str,
+                         offset: int) -> None:
+    """Append `line`, found at `offset` in the source text, to results
+    with surrounding whitespace removed. Blank lines are skipped."""
+    sentence = line.strip()
+    if sentence:
+        start = offset + len(line) - len(line.lstrip())
+        results.append({
+            "text": f"{speaker}: {sentence}",
+            "start": start,
+            "end": start + len(sentence),
+        })
 
 
 def split_text_into_multiple_lines_for_speaker(
         text: str,
-        line_min_size: int
+        line_min_size: int,
+        count_tokens: bool = False
 ) -> List[dict]:
     """
     Takes in a string `text` and splits it into multiple lines where each
     line is at least `LINE_MIN_SIZE` characters long and ends with a period
     (.),question mark (?) or exclamation mark (!). Each line starts with the
-    name of the speaker.
+    name of the speaker. If `count_tokens` is set, each line also stores
+    the token count of its indexed form under "tokens".
 
     Example input:
         text: "Speaker A: This is a long piece of text that needs \
@@ -36,50 +105,49 @@ def split_text_into_multiple_lines_for_speaker(
             "end": 104
         }]
     """
-    paras = [txt for txt in re.split(r"\r?\n+|\r+", text.strip()) if txt]
-    start_loc, results = 0, []
-    for para in paras:
-        if len(para.split(": ")) <= 1:
+    # Offsets are tracked from match positions in the original text, so
+    # every line is located in a single pass without searching for it
+    text_start = len(text) - len(text.lstrip())
+    results = []
+    for para in PARAGRAPH_PATTERN.finditer(text.strip()):
+        speaker, separator, speech = para.group().partition(": ")
+        if not separator:
             continue
-        speech_parts = para.split(": ", 1)
-        speaker = speech_parts[0]
-        speech_text_words = re.split(r"(\W)", speech_parts[1].strip('"'))
-        start_loc += len(speaker)
-        temp_words, line_length = [], 0
-        n = len(speech_text_words)
-        for i in range(n):
-            string = speech_text_words[i]
-            temp_words.append(string)
-            line_length += len(string)
-            if (
-                line_length >= line_min_size and temp_words[-1] in
-                    [".", "?", "!"]
-            ) or i == n - 1:
-                sentence = ("".join(temp_words)).strip()
-                if len(sentence):
-                    start_loc = text.find(sentence, start_loc)
-                    results.append(
-                        {
-                            "text": f"{speaker}: {sentence}",
-                            "start": start_loc,
-                            "end": start_loc + len(sentence),
-                        }
-                    )
-                start_loc += line_length
-                temp_words, line_length = [], 0
+        speech_start = text_start + para.start() + len(speaker) + 2
+        speech_start += len(speech) - len(speech.lstrip('"'))
+        speech = speech.strip('"')
+        line_start = 0
+        for match in SENTENCE_END_PATTERN.finditer(speech):
+            if match.end() - line_start >= line_min_size:
+                _append_speaker_line(
+                    results, speaker, speech[line_start:match.end()],
+                    speech_start + line_start)
+                line_start = match.end()
+        _append_speaker_line(
+            results, speaker, speech[line_start:], speech_start + line_start)
+    if count_tokens:
+        counts = token_counts([indexed_line(i, results[i]["text"])
+                               for i in range(len(results))])
+        for result, count in zip(results, counts):
+            result["tokens"] = count
     return results
 
 
 def split_indexed_lines_into_chunks(
         text: str,
-        chunk_min_tokens: int) -> List[List[str]]:
-    """Split indexed lines into chunks"""
+        chunk_min_tokens: int,
+        line_tokens: Optional[List[int]] = None) -> List[List[str]]:
+    """Split indexed lines into chunks. `line_tokens` holds the token count
+    of each line and is computed in a single batch when not provided or
+    not one per line"""
     results, cur_results, lines, chunk_size = [], [], text.split("\n"), 0
+    if line_tokens is None or len(line_tokens) != len(lines):
+        line_tokens = token_counts(lines)
     n = len(lines)
     for i in range(n):
         line = lines[i]
         cur_results.append(line)
-        chunk_size += token_count(line)
+        chunk_size += line_tokens[i]
         if chunk_size > chunk_min_tokens or i == n - 1:
             results.append(cur_results)
             cur_results, chunk_size = [], 0
@@ -87,17 +155,22 @@ def split_indexed_lines_into_chunks(
 
 
 def split_indexed_transcript_lines_into_chunks(
-    text: str, interviewee: str, chunk_min_tokens: int
+    text: str, interviewee: str, chunk_min_tokens: int,
+    line_tokens: Optional[List[int]] = None
 ) -> List[List[str]]:
     """Split indexed lines into chunks. No chunk (except the first) should
-    start with 'interviewee' name"""
+    start with 'interviewee' name. `line_tokens` holds the token count
+    of each line and is computed in a single batch when not provided or
+    not one per line"""
     interviewee = interviewee.lower()
     results, cur_results, lines, chunk_size = [], [], text.split("\n"), 0
+    if line_tokens is None or len(line_tokens) != len(lines):
+        line_tokens = token_counts(lines)
     n = len(lines)
     for i in range(n):
         line = lines[i]
         cur_results.append(line)
-        chunk_size += token_count(line)
+        chunk_size += line_tokens[i]
         if i == n - 1 or (
             chunk_size > chunk_min_tokens
             and not (lines[i + 1].split(" ", 1))[1].
@@ -109,10 +182,12 @@ def split_indexed_transcript_lines_into_chunks(
 
 
 def split_and_extract_indices(
-        input_string: str
+        input_string: str,
+        n_lines: Optional[int] = None
 ) -> List[Tuple[str, List[int]]]:
     """Split the lines into sentences and extract indices
-    from parenthesis mentioned at the end of indices
+    from parenthesis mentioned at the end of indices. Indices of
+    n_lines or more are dropped when n_lines is given.
     input_string: "Some text (2-3), some more text (10,13).
                    Some more new text (1,4-5,15). And more."
     output: [{'text': "Some text", 'references': [2,3]},
@@ -120,37 +195,197 @@ def split_and_extract_indices(
              {'text': ". Some more new text", 'references': [1, 4, 5, 15]},
              {'text': ". And more", 'references': []}]
     """
-    pattern = re.compile(r"(.+?)\s*\(([\d\s,-]+)\)|(.+)")
-    matches = pattern.findall(input_string)
-    results = []
-    for match in matches:
-        if match[0]:
-            results.append({'text': match[0],
-                            'references': _parse_indices(match[1])})
-        elif match[2]:
-            results.append({'text': match[2],
-                            'references': []})
-    return results
+    parser = CitationParser(n_lines)
+    return parser.feed(input_string) + parser.close()
+
+
+def _is_reference_char(char: str) -> bool:
+    """Whether the character can appear inside reference parentheses"""
+    return char.isdecimal() or char.isspace() or char in ",-"
+
+
+class CitationParser:
+    """Single pass tokenizer splitting LLM output into sentences and the
+    line indices cited in parentheses after them.
+
+    A sentence runs within a line up to the first complete reference
+    parentheses, which may follow on a later line after blank space, or
+    to the end of its line. Text can be fed in chunks: `feed` returns the
+    sentences that later text can no longer change and `close` the rest.
+    Every character is looked at a bounded number of times, so there is no
+    backtracking on long lines or unclosed parentheses."""
 
+    def __init__(self, n_lines: Optional[int] = None):
+        self.n_lines = n_lines
+        self.buffer = ""
+        # Parentheses before this buffer position hold no references
+        self._resume = 0
+        # Scan progress kept between feeds, as (start, end) positions
+        self._group_scan = (-1, -1)
+        self._space_run = (-1, -1)
 
-def _parse_indices(input_string: str) -> List[int]:
+    def feed(self, text: str) -> List[dict]:
+        """Add text and return the sentences it completed"""
+        self.buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List[dict]:
+        """Return the sentences left once the text has ended"""
+        return self._parse(final=True)
+
+    def _parse(self, final: bool) -> List[dict]:
+        buffer = self.buffer
+        results = []
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] == "\n":
+                pos += 1
+            if pos == len(buffer):
+                break
+            sentence = self._next_sentence(pos, final)
+            if sentence is None:
+                break
+            text, references, pos = sentence
+            results.append({'text': text, 'references': references})
+        self.buffer = buffer[pos:]
+        self._resume = max(0, self._resume - pos)
+        self._group_scan = self._shift(self._group_scan, pos)
+        self._space_run = self._shift(self._space_run, pos)
+        return results
+
+    @staticmethod
+    def _shift(span: Tuple[int, int], offset: int) -> Tuple[int, int]:
+        """Move a span of buffer positions after dropping offset chars"""
+        if span[0] < offset:
+            return (-1, -1)
+        return (span[0] - offset, span[1] - offset)
+
+    def _next_sentence(self, pos: int,
+                       final: bool) -> Optional[Tuple[str, List[int], int]]:
+        """Return the sentence starting at pos with its references and the
+        position after it, or None if it depends on text not fed yet"""
+        buffer = self.buffer
+        # No newline falls between pos and the resume point
+        line_end = buffer.find("\n", max(pos, self._resume))
+        if line_end == -1:
+            line_end = len(buffer)
+
+        paren = buffer.find("(", max(pos + 1, self._resume), line_end)
+        while paren != -1:
+            close = self._group_end(paren, final)
+            if close is None:
+                return None
+            if close != -1:
+                return self._cited(pos, paren, close)
+            self._resume = paren + 1
+            paren = buffer.find("(", paren + 1, line_end)
+        self._resume = max(self._resume, line_end)
+
+        if line_end == len(buffer):
+            return (buffer[pos:], [], line_end) if final else None
+
+        # References may open after blank space on the following lines
+        paren = self._skip_space(line_end)
+        if paren == len(buffer) and not final:
+            return None
+        if paren < len(buffer) and buffer[paren] == "(":
+            close = self._group_end(paren, final)
+            if close is None:
+                return None
+            if close != -1:
+                return self._cited(pos, paren, close)
+        return buffer[pos:line_end], [], line_end
+
+    def _group_end(self, paren: int, final: bool) -> Optional[int]:
+        """Position of the parenthesis closing references opened at paren,
+        -1 if they are not references or None if they are not complete"""
+        buffer = self.buffer
+        scan_start, scan_end = self._group_scan
+        end = min(scan_end, len(buffer)) if scan_start == paren else paren + 1
+        while end < len(buffer) and _is_reference_char(buffer[end]):
+            end += 1
+        if end == len(buffer):
+            self._group_scan = (paren, end)
+            return -1 if final else None
+        return end if buffer[end] == ")" and end > paren + 1 else -1
+
+    def _skip_space(self, start: int) -> int:
+        """Position of the first non-space character from start. The last
+        run is remembered, so blank lines are not scanned once per line."""
+        run_start, run_end = self._space_run
+        end = start
+        if run_start <= start <= run_end:
+            end = min(run_end, len(self.buffer))
+        while end < len(self.buffer) and self.buffer[end].isspace():
+            end += 1
+        self._space_run = (start, end)
+        return end
+
+    def _cited(self, pos: int, paren: int,
+               close: int) -> Tuple[str, List[int], int]:
+        """Sentence from pos to the space before the references at paren"""
+        end = paren
+        while end > pos + 1 and self.buffer[end - 1].isspace():
+            end -= 1
+        return (self.buffer[pos:end],
+                _parse_indices(self.buffer[paren + 1:close], self.n_lines),
+                close + 1)
+
+
+class CitationStreamParser(CitationParser):
+    """CitationParser for streamed answers. Feeding a whole text then
+    closing gives split_and_extract_indices of the text with surrounding
+    spaces and newlines stripped"""
+
+    def __init__(self, n_lines: Optional[int] = None):
+        super().__init__(n_lines)
+        self.started = False
+
+    def feed(self, text: str) -> List[dict]:
+        if not self.started:
+            text = text.lstrip(" \n")
+            self.started = bool(text)
+        return super().feed(text)
+
+    def close(self) -> List[dict]:
+        self.buffer = self.buffer.rstrip(" \n")
+        return super().close()
+
+
+def _parse_indices(input_string: str,
+                   n_lines: Optional[int] = None) -> List[int]:
     """Parse the indices string and generate an equivalent
-    integer list representation
+    integer list representation, dropping indices of n_lines or more.
+    Stray separators and overlong numbers are skipped rather than rejected.
     input_string: 1,3-5,9
     output: [1,3,4,5,9]
     """
-    pattern = re.compile(
-        r"(\s*(\d+)-(\d+)|\s*(\d+))(,(\s*(\d+)-(\d+)|\s*(\d+)))*")
-    if not pattern.match(input_string):
-        return None
+    limit = 10 ** MAX_INDEX_DIGITS if n_lines is None else n_lines
+    tokens = []
+    start = None
+    for i, char in enumerate(input_string + ","):
+        if char.isdecimal():
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            # Longer numbers are out of range, and int() may reject them
+            tokens.append(int(input_string[start:i])
+                          if i - start <= MAX_INDEX_DIGITS else limit)
+            start = None
+        if char in ",-":
+            tokens.append(char)
+
     results = set()
-    indices = input_string.split(",")
-    for index in indices:
-        if "-" in index:
-            start, end = tuple(map(int, index.split("-")))
-            for i in range(start, end + 1):
-                results.add(i)
-        else:
-            results.add(int(index))
-    results = sorted(list(results))
-    return results
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if i + 2 < len(tokens) and tokens[i + 1] == "-" and \
+                isinstance(token, int) and isinstance(tokens[i + 2], int):
+            results.update(range(token, min(tokens[i + 2], limit - 1) + 1))
+            i += 3
+            continue
+        if isinstance(token, int) and token < limit:
+            results.add(token)
+        i += 1
+    return sorted(results)
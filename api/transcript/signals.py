@@ -4,7 +4,7 @@ from django.urls import reverse
 
 from .models import Transcript
 from app import settings
-from core.gcloud_client import client
+from core.gcloud_client import get_client
 
 
 @receiver(post_save, sender=Transcript)
@@ -16,7 +16,7 @@ def run_generate_synthesis(sender, instance, created, **kwargs):
 def _run_generate_synthesis(sender, instance, created, **kwargs):
     """Generate AI Synthesis for the transcript object"""
     if created and not settings.TESTING:  # HACK to prevent trigger in tests
-        client.create_task(
+        get_client().create_task(
             path=reverse('transcript:initiate-synthesis',
                          args=[instance.id]),
             payload=''
@@ -1,7 +1,8 @@
+from asgiref.sync import sync_to_async
 from decimal import Decimal
 import logging
 from rest_framework import status
-from typing import List
+from typing import Iterator, List, Optional
 from .models import (
     Transcript, SynthesisType, Query, Embeds, Synthesis, SynthesisStatus
 )
@@ -165,36 +166,66 @@ def generate_embeds(tct: Transcript) -> dict:
 def generate_answers(tct: Transcript) -> List[dict]:
     """Generate project-level answers for the transcript."""
     questions = tct.project.questions
-    query_objects = []
-    for question in questions:
-        try:
-            query_obj = run_openai_query(
-                tct, question,
-                Query.QueryLevelChoices.PROJECT)
-            data = {
-                    'query': question,
-                    'output': query_obj.output
-                }
-            query_objects.append(data)
-        except Exception as e:
-            logger.exception(f"Query : {question}", exc_info=e)
-    return query_objects
+    if not questions:
+        return []
+    try:
+        results = usecases.run_transcript_queries(tct, questions)
+        # A failed question is skipped without losing the other answers
+        answered = [(question, result)
+                    for question, result in zip(questions, results)
+                    if not isinstance(result, Exception)]
+        if len(answered) < len(questions):
+            logger.error(
+                (f"{len(questions) - len(answered)} of {len(questions)} "
+                 f"answers failed on Transcript={tct.id} and were skipped."))
+        query_objs = Query.objects.bulk_create([
+            Query(
+                transcript=tct,
+                query=question,
+                output=result['output'],
+                prompt=result['prompt'],
+                cost=Decimal(result['cost']),
+                query_level=Query.QueryLevelChoices.PROJECT
+            )
+            for question, result in answered
+        ])
+        tct.cost += sum(query_obj.cost for query_obj in query_objs)
+        tct.save()
+    except ObjectNotFoundException:
+        logger.error(
+            (f"Processed Transcript for Transcript={tct.id} doesn't exist. "
+             f"Answers will be skipped."))
+        return []
+    except Exception as e:
+        logger.exception(
+            (f"Exception on Transcript={tct.id}. "
+             f"Answers generation will be skipped."), exc_info=e)
+        return []
+    return [{'query': query_obj.query, 'output': query_obj.output}
+            for query_obj in query_objs]
+
+
+def _create_query(tct: Transcript, query: str, result: dict,
+                  level: str) -> Query:
+    """Save a query result and add its cost to the transcript."""
+    query_obj = Query.objects.create(
+        transcript=tct,
+        query=query,
+        output=result['output'],
+        prompt=result["prompt"],
+        cost=Decimal(result['cost']),
+        query_level=level
+    )
+    tct.cost += query_obj.cost
+    tct.save()
+    return query_obj
 
 
 def run_openai_query(tct: Transcript, query: str, level: str) -> Query:
     """Run the OpenAI query on the given transcript."""
     try:
         result = usecases.run_transcript_query(tct, query)
-        query_obj = Query.objects.create(
-            transcript=tct,
-            query=query,
-            output=result['output'],
-            prompt=result["prompt"],
-            cost=Decimal(result['cost']),
-            query_level=level
-        )
-        tct.cost += query_obj.cost
-        tct.save()
+        query_obj = _create_query(tct, query, result, level)
     except ObjectNotFoundException:
         logger.error(
             (f"Processed Transcript for Transcript={tct.id} doesn't exist. "
@@ -206,3 +237,52 @@ def run_openai_query(tct: Transcript, query: str, level: str) -> Query:
              f"Query generation will be skipped."), exc_info=e)
         result = _create_result(status.HTTP_500_INTERNAL_SERVER_ERROR)
     return query_obj
+
+
+async def arun_openai_query(tct: Transcript, query: str,
+                            level: str) -> Optional[Query]:
+    """Run the OpenAI query on the given transcript with the asyncio
+    pipeline. Returns None if the query could not be answered."""
+    try:
+        result = await usecases.arun_transcript_query(tct, query)
+    except ObjectNotFoundException:
+        logger.error(
+            (f"Processed Transcript for Transcript={tct.id} doesn't exist. "
+             f"Query will be skipped."))
+        return None
+    except Exception as e:
+        logger.exception(
+            (f"Exception on Transcript={tct.id} for query='{query}'"
+             f"Query generation will be skipped."), exc_info=e)
+        return None
+    return await sync_to_async(_create_query)(tct, query, result, level)
+
+
+def stream_openai_query(tct: Transcript, query: str,
+                        level: str) -> Iterator[dict]:
+    """Run the OpenAI query on the given transcript, yielding the answer
+    as it streams in and saving the query once it is complete. Raises
+    ObjectNotFoundException before streaming if the transcript was never
+    processed."""
+    events = usecases.stream_transcript_query(tct, query)
+    return _relay_query_events(tct, query, level, events)
+
+
+def _relay_query_events(tct: Transcript, query: str, level: str,
+                        events: Iterator[dict]) -> Iterator[dict]:
+    """Relay the streamed query events, saving the query from the result
+    and ending with an error event if the answer fails mid-stream."""
+    try:
+        for event in events:
+            if event["event"] == "result":
+                query_obj = _create_query(tct, query, event["data"], level)
+                event = {"event": "result",
+                         "data": {"query": query,
+                                  "output": query_obj.output}}
+            yield event
+    except Exception as e:
+        logger.exception(
+            (f"Exception on Transcript={tct.id} for query='{query}'"
+             f"Query generation will be skipped."), exc_info=e)
+        yield {"event": "error",
+               "data": _create_result(status.HTTP_500_INTERNAL_SERVER_ERROR)}
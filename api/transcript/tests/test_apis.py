@@ -2,13 +2,14 @@
 Tests for the creation and upload of transcripts via the API.
 """
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 from rest_framework import status
 from unittest import skip
 from unittest.mock import patch
 
 from transcript.models import (
-    Transcript, SynthesisType, SynthesisStatus, Synthesis, Embeds
+    Transcript, SynthesisType, SynthesisStatus, Synthesis, Embeds, Query
 )
 from transcript.serializers import TranscriptSerializer
 from transcript.tasks import generate_embeds
@@ -19,6 +20,7 @@ from transcript.tests.utils import (
     default_transcript_payload,
 )
 from project.models import Project
+from synthesis.errors import ObjectNotFoundException
 
 
 TRANSCRIPT_URL = reverse('transcript:transcript-list')
@@ -44,6 +46,16 @@ def query_url(transcript_id):
     return reverse('transcript:query-detail', args=[transcript_id])
 
 
+def query_stream_url(transcript_id):
+    """Create and return a streaming query posting URL."""
+    return reverse('transcript:query-stream', args=[transcript_id])
+
+
+def query_async_url(transcript_id):
+    """Create and return an async query posting URL."""
+    return reverse('transcript:query-async', args=[transcript_id])
+
+
 def synthesis_url(transcript_id):
     """Create and return a generate-synthesis posting URL."""
     return reverse('transcript:generate-synthesis', args=[transcript_id])
@@ -483,6 +495,128 @@ class TranscriptAPITests(APITestCase):
         res = self.client.get(url)
         self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
 
+    @patch('synthesis.usecases.stream_transcript_query')
+    def test_query_stream_success(self, patched_query, patched_signal):
+        """Test streaming a query sends events and saves the query."""
+        tpt = create_transcript(project=self.project)
+        embeds = Embeds.objects.get(transcript=tpt)
+        embeds.status = SynthesisStatus.COMPLETED
+        embeds.save()
+
+        query = "Where does Jason live?"
+        sentence = {'text': 'Jason lives in Boise', 'references': [[0, 5]]}
+        patched_query.return_value = iter([
+            {'event': 'token', 'data': 'Jason lives in Boise (0)'},
+            {'event': 'sentence', 'data': sentence},
+            {'event': 'result', 'data': {
+                'output': [sentence], 'prompt': 'Test prompt', 'cost': 0.3}},
+        ])
+
+        url = query_stream_url(tpt.id)
+        res = self.client.post(url, {'query': query})
+        content = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        events = [block.split('\n')[0] for block in content.split('\n\n')
+                  if block]
+        self.assertEqual(events, ['event: token', 'event: sentence',
+                                  'event: result'])
+        query_obj = Query.objects.get(transcript=tpt)
+        self.assertEqual(query_obj.query, query)
+        self.assertEqual(query_obj.output, [sentence])
+
+    @patch('synthesis.usecases.stream_transcript_query',
+           side_effect=ObjectNotFoundException(detail='not found'))
+    def test_query_stream_not_processed(self, patched_query, patched_signal):
+        """Test streaming fails with 404 before any event is sent when the
+        transcript was never processed."""
+        tpt = create_transcript(project=self.project)
+        embeds = Embeds.objects.get(transcript=tpt)
+        embeds.status = SynthesisStatus.COMPLETED
+        embeds.save()
+
+        res = self.client.post(query_stream_url(tpt.id), {'query': 'empty?'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Query.objects.filter(transcript=tpt).exists())
+
+    def test_query_stream_missing_transcript(self, patched_signal):
+        """Test streaming fails with 404 if the transcript doesn't exist."""
+        res = self.client.post(query_stream_url(10000000), {'query': ''})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_stream_alt_user(self, patched_signal):
+        """Test that streaming a query fails when user is not the owner."""
+        other_user = create_user(email='other@example.com', password='test123')
+        other_project = create_project(user=other_user)
+        tpt = create_transcript(project=other_project)
+
+        url = query_stream_url(tpt.id)
+        res = self.client.post(url, {'query': 'empty?'})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def _use_token(self, user):
+        """Authenticate with a token, which the async view checks itself."""
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @patch('synthesis.usecases.arun_transcript_query')
+    def test_query_async_success(self, patched_query, patched_signal):
+        """Test querying a transcript with the async pipeline."""
+        tpt = create_transcript(project=self.project)
+        embeds = Embeds.objects.get(transcript=tpt)
+        embeds.status = SynthesisStatus.COMPLETED
+        embeds.save()
+
+        query = "Where does Jason live?"
+        query_output = {
+            'output': 'Jason lives in Boise',
+            'prompt': 'Test prompt',
+            'cost': 0.3,
+        }
+        patched_query.return_value = query_output
+        self._use_token(self.user)
+
+        res = self.client.post(query_async_url(tpt.id), {'query': query})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json(), {'query': query,
+                                      'output': query_output['output']})
+        patched_query.assert_awaited_once()
+        self.assertTrue(Query.objects.filter(transcript=tpt).exists())
+
+    def test_query_async_auth_required(self, patched_signal):
+        """Test the async query view requires a token."""
+        tpt = create_transcript(project=self.project)
+
+        res = self.client.post(query_async_url(tpt.id), {'query': 'empty?'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_query_async_alt_user(self, patched_signal):
+        """Test the async query fails when user is not the owner."""
+        other_user = create_user(email='other@example.com', password='test123')
+        other_project = create_project(user=other_user)
+        tpt = create_transcript(project=other_project)
+        self._use_token(self.user)
+
+        res = self.client.post(query_async_url(tpt.id), {'query': 'empty?'})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.post(query_async_url(10000000), {'query': 'q'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('synthesis.usecases.arun_transcript_query')
+    def test_query_async_requires_query(self, patched_query, patched_signal):
+        """Test the async query view rejects a missing or blank query."""
+        tpt = create_transcript(project=self.project)
+        self._use_token(self.user)
+
+        for data in ({}, {'query': '  '}):
+            res = self.client.post(query_async_url(tpt.id), data)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        patched_query.assert_not_awaited()
+
 
 @skip("OpenAI Costs: Run only when testing AI Synthesis changes")
 @patch('transcript.signals._run_generate_synthesis')
@@ -26,5 +26,9 @@ urlpatterns = [
     path('<int:pk>/concise/',
          views.ConciseView.as_view(), name='concise-detail'),
     path('<int:pk>/query/',
-         views.QueryView.as_view(), name='query-detail')
+         views.QueryView.as_view(), name='query-detail'),
+    path('<int:pk>/query/stream/',
+         views.QueryStreamView.as_view(), name='query-stream'),
+    path('<int:pk>/query/async/',
+         views.AsyncQueryView.as_view(), name='query-async')
 ]
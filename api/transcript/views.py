@@ -1,10 +1,13 @@
 """
 Views for the transcript API.
 """
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.db.models import Min, Max
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
+from django.views import View
 from drf_spectacular.utils import (
     extend_schema, inline_serializer, OpenApiParameter, OpenApiTypes
 )
@@ -16,10 +19,13 @@ from rest_framework import (
     status,
     serializers,
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import (
+    AuthenticationFailed, ValidationError, PermissionDenied
+)
 
 from . import tasks
 from .models import (
@@ -31,8 +37,10 @@ from .serializers import (
 )
 from .repository import create_synthesis_entry
 from app.settings import SYNTHESIS_TASK_TIMEOUT
-from core.gcloud_client import client
+from core.gcloud_client import get_client
+from core.streaming import EventStreamRenderer, event_stream_response
 from project.models import Project
+from synthesis.errors import ObjectNotFoundException
 
 
 logger = logging.getLogger(__name__)
@@ -211,17 +219,17 @@ class InitiateSynthesizerView(BaseSynthesizerView):
             result = tasks.initiate_synthesis(tct)
             status_code = result['status_code']
             if status.is_success(status_code):
-                client.create_task(
+                get_client().create_task(
                     path=reverse('transcript:generate-summary', args=[pk]),
                     payload='',
                     timeout_minutes=SYNTHESIS_TASK_TIMEOUT
                 )
-                client.create_task(
+                get_client().create_task(
                     path=reverse('transcript:generate-embeds', args=[pk]),
                     payload='',
                     timeout_minutes=SYNTHESIS_TASK_TIMEOUT
                 )
-                client.create_task(
+                get_client().create_task(
                     path=reverse('transcript:generate-concise', args=[pk]),
                     payload='',
                     timeout_minutes=SYNTHESIS_TASK_TIMEOUT
@@ -319,7 +327,7 @@ class GenerateEmbedsView(BaseSynthesizerView):
             if run_generation:
                 result = tasks.generate_embeds(tct)
                 if status.is_success(result['status_code']):
-                    client.create_task(
+                    get_client().create_task(
                         path=reverse('transcript:generate-answers', args=[pk]),
                         payload='',
                         timeout_minutes=SYNTHESIS_TASK_TIMEOUT
@@ -412,7 +420,8 @@ class QueryView(APIView):
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
-    def _check_embeds(self, embeds):
+    @staticmethod
+    def _check_embeds(embeds):
         if embeds.status == SynthesisStatus.FAILED:
             return status.HTTP_500_INTERNAL_SERVER_ERROR
 
@@ -538,3 +547,102 @@ class QueryView(APIView):
             response = Response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return response
+
+
+class QueryStreamView(QueryView):
+    """View for executing a query and streaming the answer as server-sent
+    events. `token` events relay the answer as it is generated, `sentence`
+    events carry each sentence once its citations are complete, and a
+    final `result` event carries the saved query."""
+    http_method_names = ['post', 'options']
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    @extend_schema(
+        request=inline_serializer(
+            name="StreamQuerySerializer",
+            fields={"query": serializers.CharField()}
+        ),
+        responses={(200, 'text/event-stream'): OpenApiTypes.STR},
+    )
+    def post(self, request, pk):
+        query = request.data.get('query')
+        try:
+            tct = Transcript.objects.get(pk=pk)
+            project = Project.objects.get(pk=tct.project.id)
+            if project.user == request.user:
+                embeds = Embeds.objects.get(transcript=pk)
+                embeds_status = self._check_embeds(embeds)
+                if embeds_status != status.HTTP_201_CREATED:
+                    return Response(status=embeds_status)
+
+                # Started before responding so a transcript that was
+                # never processed is a 404 rather than an error event
+                events = tasks.stream_openai_query(
+                    tct, query, Query.QueryLevelChoices.TRANSCRIPT)
+                response = event_stream_response(events)
+            else:
+                response = Response(status=status.HTTP_403_FORBIDDEN)
+        except (Transcript.DoesNotExist, ObjectNotFoundException):
+            response = Response(status=status.HTTP_404_NOT_FOUND)
+        except Embeds.DoesNotExist:
+            response = Response(status=status.HTTP_202_ACCEPTED)
+
+        return response
+
+
+class AsyncQueryView(View):
+    """View for executing a query with the asyncio synthesis pipeline.
+    Under the ASGI application the LLM requests are awaited without
+    holding a worker thread. DRF views are synchronous, so the token is
+    checked here with the same authentication class."""
+    http_method_names = ['post']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated like the DRF views, so no CSRF check
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request, pk):
+        auth = authentication.TokenAuthentication()
+        try:
+            user_auth = await sync_to_async(auth.authenticate)(request)
+        except AuthenticationFailed as e:
+            user_auth = None
+            detail = e.detail
+        else:
+            detail = 'Authentication credentials were not provided.'
+        if user_auth is None:
+            response = JsonResponse({'detail': detail},
+                                    status=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = auth.authenticate_header(request)
+            return response
+        user = user_auth[0]
+
+        query = request.POST.get('query')
+        if not query or not query.strip():
+            return JsonResponse({'query': ['This field is required.']},
+                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tct = await Transcript.objects.select_related('project') \
+                .aget(pk=pk)
+        except Transcript.DoesNotExist:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        if tct.project.user_id != user.id:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        try:
+            embeds = await Embeds.objects.aget(transcript=pk)
+        except Embeds.DoesNotExist:
+            return HttpResponse(status=status.HTTP_202_ACCEPTED)
+        embeds_status = QueryView._check_embeds(embeds)
+        if embeds_status != status.HTTP_201_CREATED:
+            return HttpResponse(status=embeds_status)
+
+        query_obj = await tasks.arun_openai_query(
+            tct, query, Query.QueryLevelChoices.TRANSCRIPT)
+        if query_obj is None:
+            return HttpResponse(
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({'query': query, 'output': query_obj.output},
+                            status=status.HTTP_201_CREATED)